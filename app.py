@@ -1,88 +1,274 @@
-from flask import Flask, request, jsonify, session, redirect
+from flask import Flask, Blueprint, request, jsonify, session, redirect, Response, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-import boto3
 import os
+import json
+import logging
+import threading
+import types
+from contextlib import contextmanager
 from datetime import datetime
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
 from bson.objectid import ObjectId
-from botocore.config import Config
 from flask_cors import CORS
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from flask_session import Session
-import json
-import base64
-import re
-from email.utils import parsedate_to_datetime
-import openai
-
-app = Flask(__name__)
-CORS(app, resources={
-    r"/api/*": {
-        "origins": ["http://localhost:5173"],
-        "methods": ["GET", "POST", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type"],
-        "supports_credentials": True
-    }
-})
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
-app.config['SESSION_TYPE'] = 'filesystem'
-
-# Initialize Flask-Session
-Session(app)
-
-# Initialize OpenAI client
-openai_api_key = os.getenv('OPENAI_API_KEY')
-if openai_api_key:
-    openai_client = openai.OpenAI(api_key=openai_api_key)
-else:
-    print("WARNING: OPENAI_API_KEY not set. OpenAI features will not work.")
-    openai_client = None
-
-# Initialize MongoDB
-try:
+from services import LazyProxy, LazyService, ServiceRegistry
+from sync_checkpoints import load_checkpoint, save_checkpoint, clear_checkpoint
+from classification_cache import ClassificationCache
+from classification_pipeline import RateLimiter
+from applications_store import save_synced_applications
+from db_indexes import IndexBootstrap
+from sync_jobs import SyncJobQueue, serialize_job
+from presigned_urls import PresignedUrlCache
+from dashboard_queries import page_applications, page_resumes
+from application_stats import get_metrics, record_applications, reset_stats, stats_version
+from response_cache import ResponseCache, bump_data_version, cached_json, get_data_version
+from user_cache import UserCache
+from mongo_session import MongoSessionInterface
+from gmail_credentials import GmailCredentialStore, load_keys
+from resume_storage import ResumeStorage
+from resume_text import MAX_SEARCH_LIMIT, SEARCH_LIMIT, ResumeIndexer
+from instrumentation import CONTENT_TYPE, SYNC_STAGE_SECONDS, SYNCS, instrument_app, metrics as prometheus_metrics
+from structured_logging import configure_logging, init_request_ids
+
+# JSON logs through a background writer; set up before anything here logs
+# and before Flask() would add its own stderr handler
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Routes live on this blueprint; create_app() builds the Flask app around it
+api = Blueprint('api', __name__)
+
+SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
+BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
+GMAIL_SCOPES = ['https://www.googleapis.com/auth/gmail.readonly', 'https://www.googleapis.com/auth/gmail.send']
+
+# External services are created on first use, not at import, so a worker
+# boots even while MongoDB is unreachable; /healthz reports on each of them
+services = ServiceRegistry()
+
+def _connect_mongo():
     mongo_uri = os.getenv('MONGO_URI', 'mongodb+srv://<username>:<password>@<cluster>.mongodb.net/resume_tracker?retryWrites=true&w=majority')
-    print(f"Connecting to MongoDB at: {mongo_uri}")
-    client = MongoClient(
+    # The URI can carry a password, so it isn't logged
+    logger.info("Connecting to MongoDB")
+    return MongoClient(
         mongo_uri,
         maxPoolSize=50,
         waitQueueTimeoutMS=2500,
         connectTimeoutMS=2000,
         serverSelectionTimeoutMS=2000
     )
-    # Test the connection
-    client.admin.command('ping')
-    print("Successfully connected to MongoDB")
-    db = client.resume_tracker
-except Exception as e:
-    print(f"MongoDB connection error: {str(e)}")
-    raise
-
-# Initialize extensions
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-
-# AWS S3 Configuration
-s3 = boto3.client(
-    's3',
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-    region_name=os.getenv('AWS_REGION'),
-    config=Config(
-        connect_timeout=5,
-        read_timeout=5,
-        retries={'max_attempts': 2}
+
+def _create_s3():
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        's3',
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        region_name=os.getenv('AWS_REGION'),
+        config=Config(
+            connect_timeout=5,
+            read_timeout=5,
+            retries={'max_attempts': 2}
+        )
     )
-)
-BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
+
+def _create_openai():
+    openai_api_key = os.getenv('OPENAI_API_KEY')
+    if not openai_api_key:
+        logger.warning("OPENAI_API_KEY not set. OpenAI features will not work.")
+        return None
+    import openai
+
+    # Retries are handled by call_with_backoff so they respect our rate limiter
+    return openai.OpenAI(api_key=openai_api_key, max_retries=0)
+
+def _load_gmail():
+    """The Gmail client libraries; they're slow to import and only used by Gmail routes."""
+    from google_auth_oauthlib.flow import Flow
+    from gmail_service import GmailService
+    from gmail_client_pool import GmailServicePool
+    from gmail_tokens import GmailTokenManager
+    # Access tokens are refreshed ahead of expiry and saved back to the store;
+    # create_app starts the background refresher
+    tokens = GmailTokenManager(gmail_credentials)
+    # Built Gmail clients are reused across a user's syncs
+    return types.SimpleNamespace(Flow=Flow, GmailService=GmailService, pool=GmailServicePool(), tokens=tokens)
+
+def _check_gmail(client_secrets_file):
+    if not client_secrets_file or not os.path.exists(client_secrets_file):
+        raise Exception('Client secrets file not found')
+
+def _check_s3(client):
+    if not BUCKET_NAME:
+        raise Exception('S3_BUCKET_NAME not set')
+    client.head_bucket(Bucket=BUCKET_NAME)
+
+mongo = services.register('mongodb', _connect_mongo, check=lambda client: client.admin.command('ping'))
+s3_service = services.register('s3', _create_s3, check=_check_s3)
+openai_client = services.register('openai', _create_openai, required=False)
+# /healthz only looks for the client secrets file; loading the libraries
+# is left to the Gmail routes and the token refresher
+services.register('gmail', lambda: os.getenv('GOOGLE_CLIENT_SECRET_FILE', ''), check=_check_gmail, required=False)
+gmail_api = LazyService('gmail.api', _load_gmail)
+
+db = LazyProxy(LazyService('mongodb.resume_tracker', lambda: mongo.get().resume_tracker))
+s3 = LazyProxy(s3_service)
+
+def collection(name):
+    """A collection handle that connects on first use."""
+    return LazyProxy(LazyService(f'mongodb.{name}', lambda: mongo.get().resume_tracker[name]))
+
+ENSURE_INDEXES_ON_STARTUP = os.getenv('ENSURE_INDEXES_ON_STARTUP', '1') == '1'
+
+# The unique indexes back registration and sync dedup; /healthz says so
+# until all of them exist
+index_bootstrap = IndexBootstrap(db)
+
+def _check_indexes(bootstrap):
+    status = bootstrap.status()
+    if not status['ensured']:
+        raise Exception(f"{len(status['pending'])} indexes not created yet after {status['attempts']} "
+                        f"attempt(s): {status['error']}")
+
+services.register('indexes', lambda: index_bootstrap if ENSURE_INDEXES_ON_STARTUP else None,
+                  check=_check_indexes, required=False)
+
+# One limiter per process: OpenAI limits apply to the key, not the request
+openai_rate_limiter = RateLimiter()
+
+# Gmail OAuth credentials, encrypted per user so sync workers can load them
+gmail_credentials = GmailCredentialStore(collection('gmail_credentials'), load_keys(SECRET_KEY))
+
+# Shared across requests so repeat syncs reuse earlier OpenAI answers
+classification_cache = ClassificationCache(collection('classification_cache'))
+
+# Slim user records for Flask-Login, so most requests skip the users lookup
+user_cache = UserCache(collection('users'))
+
+# Serialized dashboard responses, keyed by the user's data version
+response_cache = ResponseCache()
+
+def data_changed(user_id):
+    """Call after any write to a user's applications or resumes."""
+    bump_data_version(db.data_versions, user_id)
+
+# Gmail syncs run here in the background; clients poll the job for progress
+sync_jobs = SyncJobQueue(collection('sync_jobs'))
+
+login_manager = LoginManager()
+login_manager.login_view = 'api.login'
+
+# Resume download URLs are reused until shortly before they expire
+presigned_urls = PresignedUrlCache(s3, BUCKET_NAME)
+
+# Browsers upload resumes straight to S3 with presigned POSTs; objects are
+# stored by content hash and shared between identical resumes
+resume_storage = ResumeStorage(s3, BUCKET_NAME, collection('resume_uploads'), collection('resumes'),
+                               collection('resume_blobs'))
+
+# Text is extracted from new resumes on worker threads for /api/resumes/search
+resume_indexer = ResumeIndexer(s3, BUCKET_NAME, collection('resumes'), collection('resume_texts'),
+                               collection('resume_terms'), on_change=data_changed)
+
+def start_gmail_token_refresher():
+    """Renew active users' Gmail tokens from this worker in the background.
+
+    The Google libraries are loaded on the new thread, so starting it
+    doesn't slow down create_app.
+    """
+    def start():
+        try:
+            gmail_api.get().tokens.start()
+        except Exception:
+            logger.exception("Gmail token refresher not started")
+
+    threading.Thread(target=start, name='gmail-token-refresh-start', daemon=True).start()
+
+def create_app(config=None):
+    """Build the Flask app. Nothing here waits on MongoDB, S3 or OpenAI."""
+    app = Flask(__name__)
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": ["http://localhost:5173"],
+            "methods": ["GET", "POST", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type"],
+            "supports_credentials": True
+        }
+    })
+    app.config['SECRET_KEY'] = SECRET_KEY
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+    app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
+    app.config['SESSION_TYPE'] = 'filesystem'
+    app.config.update(config or {})
+
+    # Sessions: SESSION_BACKEND=mongodb shares them across replicas, the
+    # default keeps Flask-Session's filesystem store
+    if os.getenv('SESSION_BACKEND', 'filesystem') == 'mongodb':
+        app.session_interface = MongoSessionInterface(collection('sessions'))
+    else:
+        Session(app)
+
+    login_manager.init_app(app)
+    app.register_blueprint(api)
+    instrument_app(app)
+    init_request_ids(app)
+
+    # Create any missing indexes off the startup path, retrying until MongoDB
+    # answers; `python db_indexes.py --check` verifies plans
+    if ENSURE_INDEXES_ON_STARTUP:
+        index_bootstrap.start()
+
+    if os.getenv('GOOGLE_CLIENT_SECRET_FILE'):
+        start_gmail_token_refresher()
+
+    # Re-queue resume text extractions a restarted worker lost
+    resume_indexer.start()
+
+    return app
+
+def _user_data_version():
+    return current_user.id, get_data_version(db.data_versions, current_user.id)
+
+def cached_per_user(cacheable=None, attach=None):
+    """Cache a JSON view per (user, data version) with ETag revalidation."""
+    return cached_json(response_cache, _user_data_version, cacheable, attach)
+
+def without_presigned_urls():
+    return request.args.get('resume_urls') == 'lazy'
+
+def sign_resume_urls(resumes, keep_key=False):
+    """Give each resume a download ``url`` for its ``s3_key``, which is dropped unless ``keep_key``."""
+    for resume in resumes:
+        s3_key = resume.get('s3_key') if keep_key else resume.pop('s3_key', None)
+        try:
+            resume['url'] = presigned_urls.url(s3_key)
+        except Exception as e:
+            logger.warning("Error generating URL for resume %s: %s", resume.get('id'), e)
+            resume['url'] = None
+    return resumes
+
+# Cached dashboard and resume responses leave out the presigned URLs; they
+# expire, so they're signed into the cached payload on each request
+def attach_dashboard_urls(payload):
+    if not without_presigned_urls():
+        resumes = payload['resumes']
+        if isinstance(resumes, dict):
+            sign_resume_urls(resumes['items'])
+        else:
+            sign_resume_urls(resumes, keep_key=True)
+    return payload
+
+def attach_resume_urls(payload):
+    if not without_presigned_urls():
+        sign_resume_urls(payload['items'])
+    return payload
 
 # Gmail OAuth2 routes
-@app.route('/api/auth/gmail', methods=['GET'])
+@api.route('/api/auth/gmail', methods=['GET'])
 @login_required
 def gmail_auth():
     """Start Gmail OAuth2 flow."""
@@ -91,9 +277,9 @@ def gmail_auth():
     if not os.path.exists(client_secrets_file):
         return jsonify({'error': 'Client secrets file not found'}), 500
 
-    flow = Flow.from_client_secrets_file(
+    flow = gmail_api.get().Flow.from_client_secrets_file(
         client_secrets_file,
-        scopes=['https://www.googleapis.com/auth/gmail.readonly', 'https://www.googleapis.com/auth/gmail.send'],
+        scopes=GMAIL_SCOPES,
         redirect_uri=os.getenv('GOOGLE_OAUTH_REDIRECT_URI')
     )
     
@@ -104,7 +290,7 @@ def gmail_auth():
     
     return jsonify({'auth_url': authorization_url})
 
-@app.route('/api/auth/gmail/callback', methods=['GET'])
+@api.route('/api/auth/gmail/callback', methods=['GET'])
 @login_required
 def gmail_callback():
     """Handle Gmail OAuth2 callback."""
@@ -113,116 +299,303 @@ def gmail_callback():
         return jsonify({'error': 'Authorization code not provided'}), 400
 
     try:
-        flow = Flow.from_client_secrets_file(
+        flow = gmail_api.get().Flow.from_client_secrets_file(
             os.getenv('GOOGLE_CLIENT_SECRET_FILE'),
-            scopes=['https://www.googleapis.com/auth/gmail.readonly', 'https://www.googleapis.com/auth/gmail.send'],
+            scopes=GMAIL_SCOPES,
             redirect_uri=os.getenv('GOOGLE_OAUTH_REDIRECT_URI')
         )
         
         flow.fetch_token(code=auth_code)
         credentials = flow.credentials
+
+        # A (re)connected mailbox may be a different account
+        clear_checkpoint(db.gmail_sync_state, current_user.id)
         
-        # Store credentials in user's session
-        session['gmail_credentials'] = {
+        # Store credentials encrypted for this user
+        gmail_credentials.save(current_user.id, {
             'token': credentials.token,
             'refresh_token': credentials.refresh_token,
             'token_uri': credentials.token_uri,
             'client_id': credentials.client_id,
             'client_secret': credentials.client_secret,
-            'scopes': credentials.scopes
-        }
+            'scopes': credentials.scopes,
+            'expiry': credentials.expiry.isoformat() if credentials.expiry else None
+        })
+        session.pop('gmail_credentials', None)
         
         # Redirect back to the frontend dashboard
         return redirect('http://localhost:5173/dashboard')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/gmail/status', methods=['GET'])
+@api.route('/api/gmail/status', methods=['GET'])
 @login_required
 def gmail_status():
     """Check Gmail authentication status."""
-    is_authenticated = 'gmail_credentials' in session
+    migrate_session_credentials()
+    is_authenticated = gmail_credentials.exists(current_user.id)
     return jsonify({'is_authenticated': is_authenticated})
 
-@app.route('/api/gmail/disconnect', methods=['POST'])
+@api.route('/api/gmail/disconnect', methods=['POST'])
 @login_required
 def gmail_disconnect():
     """Disconnect Gmail integration."""
     try:
-        # Remove Gmail credentials from session
-        if 'gmail_credentials' in session:
-            session.pop('gmail_credentials')
+        # Remove stored Gmail credentials
+        session.pop('gmail_credentials', None)
+        gmail_credentials.delete(current_user.id)
+        if gmail_api.initialized:
+            gmail_api.get().pool.invalidate(current_user.id)
+        clear_checkpoint(db.gmail_sync_state, current_user.id)
         return jsonify({'success': True, 'message': 'Gmail disconnected successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/gmail/sync', methods=['POST'])
+def migrate_session_credentials():
+    """Move Gmail credentials left in a session by older versions into the store."""
+    legacy = session.pop('gmail_credentials', None)
+    if legacy:
+        gmail_credentials.save(current_user.id, legacy)
+
+@contextmanager
+def gmail_service_for(user_id):
+    """A GmailService for a user's stored credentials, on a pooled Gmail client."""
+    gmail = gmail_api.get()
+    with SYNC_STAGE_SECONDS.time(stage='gmail_token'):
+        credentials = gmail.tokens.get(user_id)
+    if not credentials:
+        raise Exception('Gmail not authenticated')
+    on_refresh = lambda refreshed: gmail.tokens.record(user_id, refreshed)
+    with gmail.pool.acquire(user_id, credentials, on_refresh=on_refresh) as client:
+        gmail_service = gmail.GmailService(
+            openai_client.get(),
+            classification_cache=classification_cache.for_user(user_id),
+            rate_limiter=openai_rate_limiter
+        )
+        gmail_service.service = client
+        yield gmail_service
+
+@contextmanager
+def sync_metrics(full):
+    """Time a whole sync and count it by mode and outcome.
+
+    The caller updates ``sync['mode']`` once it knows whether the sync ran
+    incrementally; a stream the client abandons counts as ``cancelled``.
+    """
+    sync = {'mode': 'full' if full else 'incremental', 'outcome': 'cancelled'}
+    timer = SYNC_STAGE_SECONDS.time(stage='total')
+    try:
+        with timer:
+            yield sync
+        sync['outcome'] = 'ok'
+    except Exception:
+        sync['outcome'] = 'error'
+        raise
+    finally:
+        SYNCS.inc(mode=sync['mode'], outcome=sync['outcome'])
+
+def run_gmail_sync(user_id, full=False, on_progress=None):
+    """Sync one user's job applications from Gmail using AI analysis.
+
+    Runs outside the request on the sync job queue, so it loads the user's
+    stored credentials itself. Returns the stats stored as the job's result.
+    """
+    with sync_metrics(full) as sync, gmail_service_for(user_id) as gmail_service:
+        # Only look at mail added since the last sync unless a full rescan
+        # was asked for
+        checkpoint = None
+        if not full:
+            checkpoint = load_checkpoint(db.gmail_sync_state, user_id)
+
+        # Fetch and parse emails with AI
+        applications = gmail_service.fetch_job_application_emails(checkpoint=checkpoint, on_progress=on_progress)
+
+        # Save new applications to MongoDB in a single bulk upsert
+        with SYNC_STAGE_SECONDS.time(stage='mongo_write'):
+            version = stats_version(db.application_stats, user_id)
+            new_applications = save_synced_applications(db.applications, user_id, applications)
+            record_applications(db.application_stats, db.applications, user_id, new_applications, version)
+            if new_applications:
+                data_changed(user_id)
+
+            save_checkpoint(
+                db.gmail_sync_state,
+                user_id,
+                gmail_service.history_id,
+                gmail_service.seen_message_ids,
+                gmail_service.sync_mode
+            )
+        sync['mode'] = gmail_service.sync_mode
+
+        return {
+            'total_processed': len(applications),
+            'new_added': len(new_applications),
+            'mode': gmail_service.sync_mode,
+            'llm_calls_avoided': gmail_service.llm_calls_avoided,
+            'source': 'Gmail AI Analysis'
+        }
+
+@api.route('/api/gmail/sync', methods=['POST'])
 @login_required
 def sync_gmail():
-    """Sync job applications from Gmail using AI analysis."""
-    if 'gmail_credentials' not in session:
+    """Start a background Gmail sync, or return the one already running."""
+    migrate_session_credentials()
+    if not gmail_credentials.exists(current_user.id):
         return jsonify({'error': 'Gmail not authenticated'}), 401
 
     try:
-        # Initialize Gmail service
-        gmail_service = GmailService()
-        gmail_service.initialize_service(session['gmail_credentials'])
-
-        # Fetch and parse emails with AI
-        applications = gmail_service.fetch_job_application_emails()
-        
-        # Save new applications to MongoDB
-        new_applications = []
-        for app_data in applications:
-            # Check if application already exists
-            existing = db.applications.find_one({
-                'user_id': ObjectId(current_user.id),
-                'company': app_data['company'],
-                'position': app_data['position'],
-                'email_id': app_data['email_id']  # Use email_id to prevent duplicates
-            })
-
-            if not existing:
-                application = {
-                    'user_id': ObjectId(current_user.id),
-                    'company': app_data['company'],
-                    'position': app_data['position'],
-                    'status': app_data['status'],
-                    'status_color': app_data.get('status_color', 'primary'),
-                    'application_date': app_data['application_date'],
-                    'source': app_data['source'],
-                    'email_id': app_data['email_id'],
-                    'confidence': app_data.get('confidence', 100),  # Add AI confidence score
-                    'created_at': datetime.utcnow(),
-                    'updated_at': datetime.utcnow()
-                }
-                result = db.applications.insert_one(application)
-                app_data['id'] = str(result.inserted_id)
-                new_applications.append(app_data)
+        user_id = current_user.id
+        data = request.get_json(silent=True) or {}
+        full = bool(data.get('full'))
 
+        job, created = sync_jobs.submit(
+            user_id,
+            lambda on_progress: run_gmail_sync(user_id, full, on_progress),
+            params={'full': full}
+        )
         return jsonify({
-            'message': f'Successfully synced {len(new_applications)} new applications using AI analysis',
-            'applications': new_applications,
-            'stats': {
-                'total_processed': len(applications),
-                'new_added': len(new_applications),
-                'source': 'Gmail AI Analysis'
-            }
-        })
+            'message': 'Gmail sync started' if created else 'Gmail sync already in progress',
+            'job_id': str(job['_id']),
+            'job': serialize_job(job)
+        }), 202
 
     except Exception as e:
-        print(f"Error syncing Gmail: {str(e)}")
+        logger.exception("Error starting Gmail sync")
         return jsonify({'error': str(e)}), 500
 
+def stream_gmail_sync(user_id, full=False):
+    """Sync one user's Gmail, yielding ``(event, data)`` pairs as it goes.
+
+    Each accepted application is saved as soon as it's classified, so the
+    ``email`` event can say whether it was new or already stored.
+    """
+    with sync_metrics(full) as sync, gmail_service_for(user_id) as gmail_service:
+        checkpoint = None
+        if not full:
+            checkpoint = load_checkpoint(db.gmail_sync_state, user_id)
+
+        new_added = 0
+        for event in gmail_service.iter_sync_events(checkpoint=checkpoint):
+            if event['type'] == 'start':
+                yield 'start', {'mode': event['mode'], 'total': event['total']}
+            elif event['type'] == 'email':
+                data = {
+                    'message_id': event['message_id'],
+                    'subject': event['subject'],
+                    'processed': event['processed'],
+                    'total': event['total'],
+                    'result': 'error' if event['error'] else 'skipped',
+                    'error': event['error'],
+                    'application': None
+                }
+                analysis = event['analysis'] or {}
+                data['classification'] = {
+                    'is_job_application': analysis.get('is_job_application', False),
+                    'is_job_alert': analysis.get('is_job_alert', False),
+                    'confidence': analysis.get('confidence', 0),
+                    'source': analysis.get('source', 'openai')
+                }
+                if event['application']:
+                    with SYNC_STAGE_SECONDS.time(stage='mongo_write'):
+                        version = stats_version(db.application_stats, user_id)
+                        saved = save_synced_applications(db.applications, user_id, [event['application']])
+                        record_applications(db.application_stats, db.applications, user_id, saved, version)
+                        if saved:
+                            data_changed(user_id)
+                    data['result'] = 'new' if saved else 'duplicate'
+                    data['application'] = saved[0] if saved else event['application']
+                    new_added += len(saved)
+                yield 'email', data
+            else:
+                with SYNC_STAGE_SECONDS.time(stage='mongo_write'):
+                    save_checkpoint(
+                        db.gmail_sync_state,
+                        user_id,
+                        gmail_service.history_id,
+                        gmail_service.seen_message_ids,
+                        gmail_service.sync_mode
+                    )
+                sync['mode'] = gmail_service.sync_mode
+                yield 'summary', {
+                    'total_processed': event['found'],
+                    'new_added': new_added,
+                    'mode': gmail_service.sync_mode,
+                    'llm_calls_avoided': gmail_service.llm_calls_avoided,
+                    'source': 'Gmail AI Analysis'
+                }
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@api.route('/api/gmail/sync/stream', methods=['GET'])
+@login_required
+def sync_gmail_stream():
+    """Sync Gmail in this request, streaming a Server-Sent Event per email."""
+    migrate_session_credentials()
+    user_id = current_user.id
+    if not gmail_credentials.exists(user_id):
+        return jsonify({'error': 'Gmail not authenticated'}), 401
+
+    full = request.args.get('full') == '1'
+
+    # Hold the user's active sync slot for the life of the stream, so neither
+    # another tab's stream nor POST /api/gmail/sync runs a second sync
+    job, created = sync_jobs.claim(user_id, params={'full': full, 'stream': True})
+    if not created:
+        return jsonify({'error': 'Gmail sync already in progress', 'job_id': str(job['_id'])}), 409
+    job_id = job['_id']
+
+    def generate():
+        on_progress = sync_jobs.progress_callback(job_id)
+        result = None
+        error = 'Stream closed before the sync finished'
+        found = 0
+        try:
+            for event, data in stream_gmail_sync(user_id, full):
+                if event == 'email':
+                    found += data['application'] is not None
+                    on_progress(data['processed'], data['total'], found)
+                elif event == 'summary':
+                    result, error = data, None
+                yield format_sse(event, data)
+        except Exception as e:
+            logger.exception("Error streaming Gmail sync")
+            error = str(e)
+            yield format_sse('error', {'error': str(e)})
+        finally:
+            sync_jobs.release(job_id, result=result, error=error)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop nginx from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+    # A client that leaves before the stream starts never runs generate()
+    response.call_on_close(lambda: sync_jobs.release(job_id, error='Stream closed before the sync started'))
+    return response
+
+@api.route('/api/gmail/sync/<job_id>', methods=['GET'])
+@login_required
+def sync_gmail_status(job_id):
+    """Report progress of a background Gmail sync."""
+    job = sync_jobs.get(job_id, current_user.id)
+    if not job:
+        return jsonify({'error': 'Sync job not found'}), 404
+
+    return jsonify({
+        'job': serialize_job(job),
+        'classification_cache': classification_cache.stats()
+    })
+
 # Test route for OpenAI
-@app.route('/api/test-openai', methods=['GET'])
+@api.route('/api/test-openai', methods=['GET'])
 def test_openai():
-    if not openai_client:
+    if not openai_client.get():
         return jsonify({'error': 'OpenAI API key not configured'}), 500
     
     try:
         # Simple test completion
-        response = openai_client.chat.completions.create(
+        response = openai_client.get().chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant."},
@@ -238,8 +611,19 @@ def test_openai():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api.route('/healthz', methods=['GET'])
+def healthz():
+    """Readiness: 200 when MongoDB and S3 answer, 503 otherwise, with a result per service."""
+    ready, checks = services.health()
+    return jsonify({'status': 'ok' if ready else 'unavailable', 'services': checks}), 200 if ready else 503
+
+@api.route('/metrics', methods=['GET'])
+def prometheus_metrics_view():
+    """Sync stage timings, message counts and per-endpoint latency for Prometheus."""
+    return Response(prometheus_metrics.render(), content_type=CONTENT_TYPE)
+
 # Add a root route to verify the server is working
-@app.route('/')
+@api.route('/')
 def index():
     return jsonify({
         'message': 'Resume Tracker API is running',
@@ -247,7 +631,7 @@ def index():
         'version': '1.0.0'
     })
 
-@app.route('/api/check-auth', methods=['GET'])
+@api.route('/api/check-auth', methods=['GET'])
 @login_required
 def check_auth():
     return jsonify({
@@ -264,7 +648,8 @@ class User(UserMixin):
         self.id = str(user_data['_id'])
         self.username = user_data['username']
         self.email = user_data['email']
-        self.password = user_data['password']
+        # Only present when loaded for login; cached records leave it out
+        self.password = user_data.get('password')
 
     @staticmethod
     def get_by_email(email):
@@ -294,7 +679,7 @@ class User(UserMixin):
 @login_manager.user_loader
 def load_user(user_id):
     try:
-        user_data = db.users.find_one({'_id': ObjectId(user_id)})
+        user_data = user_cache.get(user_id)
         if user_data:
             return User(user_data)
     except:
@@ -302,7 +687,7 @@ def load_user(user_id):
     return None
 
 # API Routes
-@app.route('/api/register', methods=['POST'])
+@api.route('/api/register', methods=['POST'])
 def register():
     data = request.get_json()
     username = data.get('username')
@@ -315,7 +700,12 @@ def register():
     if db.users.find_one({'username': username}):
         return jsonify({'error': 'Username already taken'}), 400
     
-    user = User.create(username, email, password)
+    try:
+        user = User.create(username, email, password)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent registration; the unique indexes
+        # on email and username caught it
+        return jsonify({'error': 'Email or username already registered'}), 400
     login_user(user)
     
     return jsonify({
@@ -327,7 +717,7 @@ def register():
         }
     }), 201
 
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
 def login():
     try:
         data = request.get_json()
@@ -349,6 +739,8 @@ def login():
             return jsonify({'error': 'Invalid email or password'}), 401
             
         login_user(user)
+        # Warm the cache so the next request doesn't go to MongoDB
+        user_cache.put(user.user_data)
         
         return jsonify({
             'message': 'Login successful',
@@ -359,45 +751,42 @@ def login():
             }
         })
         
-    except Exception as e:
-        print(f"Login error: {str(e)}")  # This will show in the Flask console
+    except Exception:
+        logger.exception("Login error")
         return jsonify({'error': 'An error occurred during login'}), 500
 
-@app.route('/api/logout', methods=['POST'])
+@api.route('/api/logout', methods=['POST'])
 @login_required
 def logout():
     logout_user()
     return jsonify({'message': 'Logged out successfully'})
 
-@app.route('/api/dashboard', methods=['GET'])
+@api.route('/api/dashboard', methods=['GET'])
 @login_required
+@cached_per_user(attach=attach_dashboard_urls)
 def dashboard():
+    # ?mode=paged returns the first page of each list; without it the full
+    # lists are returned as before
+    if request.args.get('mode') == 'paged':
+        return dashboard_page()
+
     try:
+        # Download URLs are added by attach_dashboard_urls; with
+        # ?resume_urls=lazy resumes come back without them and the client
+        # asks /api/resume/<id>/url when one is opened
+
         # Fetch user's resumes from MongoDB
         resumes = list(db.resumes.find({'user_id': ObjectId(current_user.id)}))
-        print(f"Found {len(resumes)} resumes for user {current_user.id}")
+        logger.debug("Found %d resumes for user %s", len(resumes), current_user.id)
         
-        # Add S3 URL to each resume
         for resume in resumes:
-            try:
-                resume['url'] = s3.generate_presigned_url(
-                    'get_object',
-                    Params={
-                        'Bucket': BUCKET_NAME,
-                        'Key': resume['s3_key']
-                    },
-                    ExpiresIn=3600
-                )
-                resume['id'] = str(resume['_id'])
-                # Convert ObjectId to string for JSON serialization
-                resume['user_id'] = str(resume['user_id'])
-                resume['_id'] = str(resume['_id'])
-                # Convert datetime to string
-                if 'upload_date' in resume:
-                    resume['upload_date'] = resume['upload_date'].isoformat()
-            except Exception as e:
-                print(f"Error generating URL for resume {resume.get('_id')}: {str(e)}")
-                resume['url'] = None
+            resume['id'] = str(resume['_id'])
+            # Convert ObjectId to string for JSON serialization
+            resume['user_id'] = str(resume['user_id'])
+            resume['_id'] = str(resume['_id'])
+            # Convert datetime to string
+            if 'upload_date' in resume:
+                resume['upload_date'] = resume['upload_date'].isoformat()
         
         # Fetch user's job applications
         applications = list(db.applications.find({'user_id': ObjectId(current_user.id)}))
@@ -411,17 +800,122 @@ def dashboard():
             if 'apply_date' in app:
                 app['apply_date'] = app['apply_date'].isoformat()
         
-        print(f"Found {len(applications)} applications for user {current_user.id}")
+        logger.debug("Found %d applications for user %s", len(applications), current_user.id)
         
         return jsonify({
             'resumes': resumes,
             'applications': applications
         })
-    except Exception as e:
-        print(f"Dashboard error: {str(e)}")
+    except Exception:
+        logger.exception("Dashboard error")
+        return jsonify({'error': 'Failed to fetch dashboard data'}), 500
+
+def dashboard_page():
+    """First pages of the dashboard lists; later pages come from
+    /api/applications and /api/resumes with their ``next_cursor``."""
+    try:
+        applications = page_applications(db.applications, current_user.id, request.args)
+        resumes = _resume_page(request.args.get('resume_urls') == 'lazy', {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception:
+        logger.exception("Dashboard error")
         return jsonify({'error': 'Failed to fetch dashboard data'}), 500
 
-@app.route('/api/upload', methods=['POST'])
+    return jsonify({
+        'applications': applications,
+        'resumes': resumes
+    })
+
+def _resume_page(lazy_urls, args):
+    # s3_key is swapped for a URL by sign_resume_urls after caching
+    return page_resumes(db.resumes, current_user.id, args, extra_fields=() if lazy_urls else ('s3_key',))
+
+@api.route('/api/applications', methods=['GET'])
+@login_required
+@cached_per_user()
+def list_applications():
+    """A page of applications, filtered by status/company/date.
+
+    Query parameters: limit, cursor, sort (date|company|status), order
+    (asc|desc), fields, status (comma separated), company (prefix),
+    date_from and date_to (YYYY-MM-DD).
+    """
+    try:
+        return jsonify(page_applications(db.applications, current_user.id, request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception:
+        logger.exception("Error listing applications")
+        return jsonify({'error': 'Failed to fetch applications'}), 500
+
+@api.route('/api/resumes', methods=['GET'])
+@login_required
+@cached_per_user(attach=attach_resume_urls)
+def list_resumes():
+    """A page of resumes; query parameters: limit, cursor, sort (date|filename),
+    order, fields and resume_urls=lazy."""
+    try:
+        return jsonify(_resume_page(request.args.get('resume_urls') == 'lazy', request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception:
+        logger.exception("Error listing resumes")
+        return jsonify({'error': 'Failed to fetch resumes'}), 500
+
+@api.route('/api/resumes/search', methods=['GET'])
+@login_required
+def search_resumes():
+    """Resumes whose text matches ``q``, best first; ``limit`` caps the results."""
+    try:
+        limit = min(max(int(request.args.get('limit', SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    try:
+        # Not response-cached: the index changes as extraction finishes
+        matches = resume_indexer.search(current_user.id, request.args.get('q'), limit)
+        resumes = {resume['_id']: resume for resume in db.resumes.find(
+            {'_id': {'$in': [match['resume_id'] for match in matches]}, 'user_id': ObjectId(current_user.id)},
+            {'filename': 1, 'upload_date': 1}
+        )}
+        pending = db.resumes.count_documents({
+            'user_id': ObjectId(current_user.id),
+            'text_status': {'$in': ['pending', 'processing']}
+        })
+        return jsonify({
+            'results': [{
+                'id': str(match['resume_id']),
+                'filename': resumes[match['resume_id']]['filename'],
+                'upload_date': resumes[match['resume_id']]['upload_date'].isoformat(),
+                'score': match['score'],
+                'matched_terms': match['matched_terms'],
+                'snippet': match['snippet']
+            } for match in matches if match['resume_id'] in resumes],
+            'pending': pending
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception:
+        logger.exception("Error searching resumes")
+        return jsonify({'error': 'Failed to search resumes'}), 500
+
+@api.route('/api/metrics', methods=['GET'])
+@login_required
+@cached_per_user(cacheable=lambda: request.args.get('refresh') != '1')
+def metrics():
+    """Application counts by status and week; ?refresh=1 recounts them."""
+    try:
+        return jsonify(get_metrics(
+            db.application_stats,
+            db.applications,
+            current_user.id,
+            refresh=request.args.get('refresh') == '1'
+        ))
+    except Exception:
+        logger.exception("Metrics error")
+        return jsonify({'error': 'Failed to fetch metrics'}), 500
+
+@api.route('/api/upload', methods=['POST'])
 @login_required
 def upload_resume():
     if 'resume' not in request.files:
@@ -432,441 +926,193 @@ def upload_resume():
         return jsonify({'error': 'No file selected'}), 400
     
     try:
-        # Upload to S3
-        s3_key = f"resumes/{current_user.id}/{file.filename}"
-        s3.upload_fileobj(
-            file,
-            BUCKET_NAME,
-            s3_key
+        # Hashed first; identical content is stored in S3 only once
+        resume, _ = resume_storage.store_stream(
+            current_user.id,
+            os.path.basename(file.filename),
+            file.mimetype,
+            file.stream
         )
-        
-        # Save to MongoDB
-        resume_data = {
-            'filename': file.filename,
-            's3_key': s3_key,
-            'upload_date': datetime.utcnow(),
-            'user_id': ObjectId(current_user.id)
-        }
-        db.resumes.insert_one(resume_data)
+        data_changed(current_user.id)
+        index_resume(resume)
         
         return jsonify({'message': 'Resume uploaded successfully'}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/resume/<resume_id>', methods=['DELETE'])
+def index_resume(resume):
+    """Queue text extraction for a recorded resume.
+
+    The resume is already stored, so a failure here doesn't fail the
+    upload; the indexer's retry thread picks the resume up later.
+    """
+    try:
+        resume_indexer.submit(resume)
+    except Exception:
+        logger.exception("Error queueing text extraction for resume %s", resume['_id'])
+
+def serialize_uploaded_resume(resume):
+    return {
+        'id': str(resume['_id']),
+        'filename': resume['filename'],
+        'upload_date': resume['upload_date'].isoformat()
+    }
+
+@api.route('/api/upload/init', methods=['POST'])
 @login_required
-def delete_resume(resume_id):
+def upload_init():
+    """Start a direct-to-S3 upload; the browser POSTs the file to the returned url."""
+    data = request.get_json(silent=True) or {}
     try:
-        resume = db.resumes.find_one({
-            '_id': ObjectId(resume_id),
-            'user_id': ObjectId(current_user.id)
+        upload = resume_storage.init_upload(
+            current_user.id,
+            data.get('filename'),
+            data.get('content_type'),
+            data.get('size'),
+            data.get('sha256')
+        )
+        if upload['duplicate']:
+            # Same content as a resume already stored; nothing to upload
+            data_changed(current_user.id)
+            index_resume(upload['resume'])
+            upload['resume'] = serialize_uploaded_resume(upload['resume'])
+        return jsonify(upload), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/upload/complete', methods=['POST'])
+@login_required
+def upload_complete():
+    """Record a resume after the browser has uploaded it to S3."""
+    data = request.get_json(silent=True) or {}
+    try:
+        resume = resume_storage.complete_upload(current_user.id, data.get('upload_id'))
+        data_changed(current_user.id)
+        index_resume(resume)
+        return jsonify({
+            'message': 'Resume uploaded successfully',
+            'resume': serialize_uploaded_resume(resume)
+        }), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/resume/<resume_id>/url', methods=['GET'])
+@login_required
+def resume_url(resume_id):
+    """Sign a download URL for one resume on demand."""
+    try:
+        resume = db.resumes.find_one(
+            {'_id': ObjectId(resume_id), 'user_id': ObjectId(current_user.id)},
+            {'s3_key': 1}
+        )
+        if not resume:
+            return jsonify({'error': 'Resume not found'}), 404
+
+        url, expires_at = presigned_urls.get(resume['s3_key'])
+        return jsonify({
+            'url': url,
+            'expires_at': datetime.utcfromtimestamp(expires_at).isoformat() + 'Z'
         })
-        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/resume/<resume_id>', methods=['DELETE'])
+@login_required
+def delete_resume(resume_id):
+    try:
+        # The S3 object is deleted only when no other resume shares it
+        resume, object_deleted = resume_storage.delete_resume(current_user.id, resume_id)
         if not resume:
             return jsonify({'error': 'Resume not found'}), 404
         
-        # Delete from S3
-        s3.delete_object(
-            Bucket=BUCKET_NAME,
-            Key=resume['s3_key']
-        )
-        
-        # Delete from MongoDB
-        result = db.resumes.delete_one({'_id': ObjectId(resume_id)})
-        if result.deleted_count == 1:
-            return jsonify({'message': 'Resume deleted successfully'})
-        else:
-            return jsonify({'error': 'Failed to delete from database'}), 500
+        if object_deleted:
+            presigned_urls.invalidate(resume['s3_key'])
+        resume_indexer.remove([resume['_id']])
+        data_changed(current_user.id)
+        return jsonify({'message': 'Resume deleted successfully'})
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/applications/clear', methods=['POST'])
+@api.route('/api/applications/clear', methods=['POST'])
 @login_required
 def clear_applications():
     try:
-        # Delete all applications for the current user
-        result = db.applications.delete_many({'user_id': ObjectId(current_user.id)})
+        deleted_count = clear_applications_for(current_user.id)
         return jsonify({
-            'message': f'Successfully cleared {result.deleted_count} applications',
-            'deleted_count': result.deleted_count
+            'message': f'Successfully cleared {deleted_count} applications',
+            'deleted_count': deleted_count
         })
     except Exception as e:
-        print(f"Error clearing applications: {str(e)}")
+        logger.exception("Error clearing applications")
         return jsonify({'error': str(e)}), 500
 
-class GmailService:
-    def __init__(self):
-        self.service = None
-
-    def get_auth_url(self):
-        """Get the authorization URL for Gmail OAuth2."""
-        flow = Flow.from_client_secrets_file(
-            os.getenv('GOOGLE_CLIENT_SECRET_FILE'),
-            scopes=['https://www.googleapis.com/auth/gmail.readonly'],
-            redirect_uri=os.getenv('GOOGLE_OAUTH_REDIRECT_URI')
-        )
-        authorization_url, _ = flow.authorization_url(
-            access_type='offline',
-            include_granted_scopes='true'
-        )
-        return authorization_url
-
-    def get_credentials(self, auth_code):
-        """Get credentials from authorization code."""
-        flow = Flow.from_client_secrets_file(
-            os.getenv('GOOGLE_CLIENT_SECRET_FILE'),
-            scopes=['https://www.googleapis.com/auth/gmail.readonly'],
-            redirect_uri=os.getenv('GOOGLE_OAUTH_REDIRECT_URI')
-        )
-        flow.fetch_token(code=auth_code)
-        return flow.credentials
-
-    def initialize_service(self, credentials_dict):
-        """Initialize Gmail service with credentials."""
-        credentials = Credentials(
-            token=credentials_dict['token'],
-            refresh_token=credentials_dict['refresh_token'],
-            token_uri=credentials_dict['token_uri'],
-            client_id=credentials_dict['client_id'],
-            client_secret=credentials_dict['client_secret'],
-            scopes=credentials_dict['scopes']
-        )
-        self.service = build('gmail', 'v1', credentials=credentials)
-
-    def _extract_company_name(self, subject, body, from_header):
-        """Extract company name from email subject, body, and from header."""
-        # First try to extract from the From header as it's usually most reliable
-        from_name = self._extract_company_from_email(from_header)
-        if from_name and len(from_name) > 2:  # Ensure it's not just a short abbreviation
-            return from_name
-
-        # Common patterns for company names in application emails
-        patterns = [
-            r"(?:application|applied) (?:at|to|with) ([A-Za-z0-9][A-Za-z0-9\s&.-]{2,40}?)(?:[\.,]|\s+(?:for|position|team|careers|jobs))",
-            r"thank you for (?:your interest|applying) (?:at|to|with) ([A-Za-z0-9][A-Za-z0-9\s&.-]{2,40}?)(?:[\.,]|\s+(?:for|position|team))",
-            r"welcome to ([A-Za-z0-9][A-Za-z0-9\s&.-]{2,40}?)(?:[\.,]|\s+(?:careers|team))",
-            r"from ([A-Za-z0-9][A-Za-z0-9\s&.-]{2,40}?) (?:team|recruiting|careers|hiring)",
-            r"([A-Za-z0-9][A-Za-z0-9\s&.-]{2,40}?) (?:team|careers) would like",
-            r"([A-Za-z0-9][A-Za-z0-9\s&.-]{2,40}?) application (?:portal|status|received)"
-        ]
-
-        # Try subject first as it's usually more structured
-        for pattern in patterns:
-            match = re.search(pattern, subject, re.IGNORECASE)
-            if match:
-                company = match.group(1).strip()
-                if self._is_valid_company_name(company):
-                    return company
-
-        # Then try body
-        for pattern in patterns:
-            match = re.search(pattern, body, re.IGNORECASE)
-            if match:
-                company = match.group(1).strip()
-                if self._is_valid_company_name(company):
-                    return company
-
-        return None
-
-    def _is_valid_company_name(self, name):
-        """Validate extracted company name."""
-        if not name:
-            return False
-            
-        # List of common words that shouldn't be company names
-        invalid_names = {
-            'team', 'career', 'careers', 'job', 'jobs', 'position', 'application',
-            'portal', 'status', 'update', 'mail', 'email', 'notification', 'alert',
-            'center', 'global', 'local', 'international', 'worldwide', 'recruiting',
-            'talent', 'hr', 'human resources', 'apply', 'applied', 'applying'
-        }
-        
-        # Check if the name is just a common word
-        if name.lower() in invalid_names:
-            return False
-            
-        # Check length and character requirements
-        if len(name) < 2 or len(name) > 40:
-            return False
-            
-        # Must contain at least one letter
-        if not any(c.isalpha() for c in name):
-            return False
-            
-        return True
-
-    def _extract_position(self, subject, body):
-        """Extract position from email subject and body."""
-        # Common patterns for job positions
-        patterns = [
-            r"(?:position|role|job)(?: for)?:?\s*([A-Za-z0-9][A-Za-z0-9\s\-&.]{2,50}?)(?:[\.,]|\s+(?:at|with|position|role|job|team))",
-            r"applying for(?: the)? ([A-Za-z0-9][A-Za-z0-9\s\-&.]{2,50}?)(?:[\.,]|\s+(?:at|with|position|role|job|team))",
-            r"application for(?: the)? ([A-Za-z0-9][A-Za-z0-9\s\-&.]{2,50}?)(?:[\.,]|\s+(?:at|with|position|role|job|team))",
-            r"interested in(?: the)? ([A-Za-z0-9][A-Za-z0-9\s\-&.]{2,50}?)(?:[\.,]|\s+(?:at|with|position|role|job|team))",
-            r"regarding the ([A-Za-z0-9][A-Za-z0-9\s\-&.]{2,50}?)(?:[\.,]|\s+(?:at|with|position|role|job|team))"
-        ]
-
-        # Try subject first
-        for pattern in patterns:
-            match = re.search(pattern, subject, re.IGNORECASE)
-            if match:
-                position = match.group(1).strip()
-                if self._is_valid_position(position):
-                    return position
-
-        # Then try body
-        for pattern in patterns:
-            match = re.search(pattern, body, re.IGNORECASE)
-            if match:
-                position = match.group(1).strip()
-                if self._is_valid_position(position):
-                    return position
+def clear_applications_for(user_id):
+    """Delete all of a user's applications; returns how many were deleted.
 
-        return None
+    The sync checkpoint goes too, so the next sync rescans the mailbox and
+    brings back anything still there instead of only looking at new mail.
+    """
+    result = db.applications.delete_many({'user_id': ObjectId(user_id)})
+    reset_stats(db.application_stats, user_id)
+    clear_checkpoint(db.gmail_sync_state, user_id)
+    data_changed(user_id)
+    return result.deleted_count
 
-    def _is_valid_position(self, position):
-        """Validate extracted position."""
-        if not position:
-            return False
-            
-        # List of common words that shouldn't be positions by themselves
-        invalid_positions = {
-            'job', 'position', 'role', 'opportunity', 'application', 'career',
-            'team', 'work', 'employment', 'opening', 'vacancy', 'apply', 'applied',
-            'new', 'current', 'future', 'available'
-        }
-        
-        # Check if the position is just a common word
-        if position.lower() in invalid_positions:
-            return False
-            
-        # Check length requirements
-        if len(position) < 3 or len(position) > 50:
-            return False
-            
-        # Must contain at least one letter
-        if not any(c.isalpha() for c in position):
-            return False
-            
-        return True
+def delete_resumes_for(user_id, resume_ids=None):
+    """Bulk-delete resumes and forget the download URLs of deleted objects."""
+    result = resume_storage.delete_resumes(user_id, resume_ids)
+    for s3_key in result['deleted_keys']:
+        presigned_urls.invalidate(s3_key)
+    resume_indexer.remove(result['deleted_ids'])
+    if result['deleted_ids']:
+        data_changed(user_id)
+    return {
+        'deleted_count': len(result['deleted_ids']),
+        'deleted_ids': result['deleted_ids'],
+        'deleted_objects': len(result['deleted_keys']),
+        'errors': result['errors']
+    }
 
-    def analyze_email_with_openai(self, subject, body, from_header):
-        """Use OpenAI to analyze an email and determine if it's a job application."""
-        if not openai_client:
-            raise Exception("OpenAI client not configured")
-        
-        # Prepare the prompt
-        email_content = f"Subject: {subject}\nFrom: {from_header}\n\nBody:\n{body[:1500]}..."  # Limit to avoid token limits
-        
-        prompt = {
-            "role": "system", 
-            "content": """
-            You are an assistant that analyzes emails to determine if they are job application confirmations or receipts.
-            
-            Be very strict in your analysis - only identify an email as a job application if:
-            1. It explicitly confirms a job application was submitted
-            2. It's sent directly from a company or its recruiting system (not a job board unless it confirms a specific application)
-            3. It's about a specific job the user has actually applied to
-            
-            DO NOT classify these as job applications:
-            - Credit card applications or financial services
-            - Job alerts or notifications about new job postings
-            - General newsletters from job boards
-            - Marketing emails from companies
-            - Emails that just mention jobs but don't confirm an actual application
-            
-            For status, determine one of:
-            - "Applied" (default for confirmations)
-            - "Rejected" (if it contains rejection language)
-            - "Interview" (if it's scheduling/requesting an interview)
-            - "Offer" (if it's extending a job offer)
-            
-            Extract the following information:
-            1. Is this a job application confirmation or receipt? (yes/no)
-            2. If yes, what's the company name? (be specific and accurate)
-            3. What position/role was applied for?
-            4. What's the application status? (Applied, Rejected, Interview, Offer)
-            5. Is this an automated job alert rather than an actual application? (yes/no)
-            
-            Return your analysis in JSON format:
-            {
-                "is_job_application": true/false,
-                "is_job_alert": true/false,
-                "company_name": "Company Name",
-                "position": "Position Title",
-                "status": "Status",
-                "confidence": 0-100
-            }
-            
-            Be especially careful about credit card applications and other financial services - these are NOT job applications.
-            """
-        }
-        
-        try:
-            response = openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    prompt,
-                    {"role": "user", "content": email_content}
-                ],
-                temperature=0.1  # Low temperature for more deterministic results
-            )
-            
-            result_text = response.choices[0].message.content
-            
-            # Try to parse the JSON response
-            try:
-                # Find JSON in the response (in case there's additional text)
-                import re
-                json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-                if json_match:
-                    result_json = json.loads(json_match.group(0))
-                else:
-                    result_json = json.loads(result_text)
-                
-                return result_json
-            except json.JSONDecodeError:
-                print(f"Failed to parse OpenAI response as JSON: {result_text}")
-                # Return a default structure
-                return {
-                    "is_job_application": False,
-                    "is_job_alert": True,
-                    "company_name": None,
-                    "position": None,
-                    "status": None,
-                    "confidence": 0
-                }
-                
-        except Exception as e:
-            print(f"Error calling OpenAI API: {str(e)}")
-            raise
-
-    def fetch_job_application_emails(self, max_results=100):
-        """Fetch and parse job application confirmation emails using AI."""
-        if not self.service:
-            raise Exception("Gmail service not initialized")
-
-        # Use a broader search to catch potential job emails
-        query = """
-        (
-            subject:(job OR application OR position OR career OR opportunity OR applied OR thank you) 
-            -subject:(newsletter OR digest OR weekly)
-        )
-        """
-        
-        try:
-            results = self.service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=max_results
-            ).execute()
-
-            messages = results.get('messages', [])
-            if not messages:
-                print("No messages found matching the query")
-                return []
-
-            print(f"Found {len(messages)} potential job-related emails")
-            applications = []
-            processed_count = 0
-            job_app_count = 0
-
-            for message in messages:
-                try:
-                    msg = self.service.users().messages().get(
-                        userId='me',
-                        id=message['id'],
-                        format='full'
-                    ).execute()
-
-                    # Extract email data
-                    headers = msg['payload']['headers']
-                    subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), '')
-                    date_str = next((h['value'] for h in headers if h['name'].lower() == 'date'), '')
-                    from_header = next((h['value'] for h in headers if h['name'].lower() == 'from'), '')
-                    
-                    # Get email body
-                    body = self._get_email_body(msg['payload'])
-                    
-                    # Skip emails that are obviously not job applications
-                    if any(phrase.lower() in subject.lower() for phrase in ['credit card', 'banking', 'financial', 'insurance']):
-                        print(f"Skipping likely non-job email: {subject}")
-                        continue
-                        
-                    # Use OpenAI to analyze the email
-                    analysis = self.analyze_email_with_openai(subject, body, from_header)
-                    processed_count += 1
-                    
-                    # Only add if OpenAI determined it's a job application with high confidence
-                    # and not just an alert, and ensure it has a minimum confidence level
-                    if (analysis.get('is_job_application', False) and 
-                        not analysis.get('is_job_alert', True) and 
-                        analysis.get('confidence', 0) > 70):
-                        
-                        job_app_count += 1
-                        company_name = analysis.get('company_name', 'Unknown Company')
-                        position = analysis.get('position', 'Unknown Position')
-                        status = analysis.get('status', 'Applied')
-                        
-                        # Generate a status color for display
-                        status_color = 'primary'  # Default blue
-                        if status.lower() == 'rejected':
-                            status_color = 'danger'  # Red
-                        elif status.lower() == 'interview':
-                            status_color = 'success'  # Green
-                        elif status.lower() == 'offer':
-                            status_color = 'warning'  # Yellow/Orange
-                        
-                        applications.append({
-                            'company': company_name,
-                            'position': position,
-                            'application_date': parsedate_to_datetime(date_str).isoformat(),
-                            'status': status,
-                            'status_color': status_color,
-                            'source': 'Gmail (AI Analysis)',
-                            'email_id': message['id'],
-                            'confidence': analysis.get('confidence', 50)
-                        })
-                        
-                        print(f"AI detected job application - Company: {company_name}, Position: {position}, Status: {status}")
-
-                except Exception as e:
-                    print(f"Error processing message {message['id']}: {str(e)}")
-                    continue
-
-            print(f"Processed {processed_count} emails, found {job_app_count} job applications")
-            return applications
+@api.route('/api/resumes/delete', methods=['POST'])
+@login_required
+def delete_resumes():
+    """Delete the resumes listed in ``ids``, or all of them with ``all: true``."""
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    if not data.get('all') and not isinstance(ids, list):
+        return jsonify({'error': 'Provide a list of resume ids or all: true'}), 400
+    try:
+        return jsonify(delete_resumes_for(current_user.id, None if data.get('all') else ids))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.exception("Error deleting resumes")
+        return jsonify({'error': str(e)}), 500
 
-        except Exception as e:
-            print(f"Error fetching emails: {str(e)}")
-            raise
+@api.route('/api/account/clear', methods=['POST'])
+@login_required
+def clear_account():
+    """Delete all of the user's applications and resumes; the login and Gmail connection stay."""
+    try:
+        applications_deleted = clear_applications_for(current_user.id)
+        resumes = delete_resumes_for(current_user.id)
+        return jsonify({
+            'message': f"Cleared {applications_deleted} applications and {resumes['deleted_count']} resumes",
+            'applications_deleted': applications_deleted,
+            'resumes_deleted': resumes['deleted_count'],
+            'objects_deleted': resumes['deleted_objects'],
+            'errors': resumes['errors']
+        })
+    except Exception as e:
+        logger.exception("Error clearing account")
+        return jsonify({'error': str(e)}), 500
 
-    def _get_email_body(self, payload):
-        """Extract email body from payload."""
-        if 'body' in payload and payload['body'].get('data'):
-            return base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8')
-        
-        if 'parts' in payload:
-            for part in payload['parts']:
-                if part['mimeType'] == 'text/plain' and part['body'].get('data'):
-                    return base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
-                elif part['mimeType'] == 'text/html' and part['body'].get('data'):
-                    return base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
-        
-        return ""
-
-    def _extract_company_from_email(self, from_header):
-        """Extract company name from email address."""
-        # Try to extract company name from email domain
-        email_match = re.search(r'@([^.]+)', from_header.lower())
-        if email_match:
-            domain = email_match.group(1)
-            # Exclude common email providers
-            common_domains = {'gmail', 'yahoo', 'hotmail', 'outlook', 'aol', 'icloud'}
-            if domain not in common_domains:
-                return domain.title()
-        return None
+app = create_app()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', debug=True) 
\ No newline at end of file
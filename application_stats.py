@@ -0,0 +1,173 @@
+"""Per-user application metrics.
+
+A counters document per user in ``application_stats`` holds the total, a
+count per status and a count per ISO week (keyed by the week's Monday). Sync
+increments it as applications are inserted and clearing resets it, so
+``get_metrics`` is a single read. When the document is missing, e.g. for
+applications stored before it existed, it's rebuilt from the applications
+with an aggregation pipeline.
+
+Every write bumps the document's ``version``. A sync reads it before
+inserting and only increments the version it read; a rebuild only
+replaces the version it read before aggregating. Either one that finds the
+document changed underneath it recounts instead, so a rebuild racing a
+sync can neither drop nor double count the sync's applications.
+"""
+from datetime import date, datetime, timedelta
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Statuses the dashboard counts as a successful application
+SUCCESS_STATUSES = ('interview', 'offer')
+
+# Recounts attempted before a rebuild gives up persisting its result
+REBUILD_ATTEMPTS = 3
+
+
+def week_start(application_date):
+    """Monday of the ISO week an ISO-8601 date string falls in, or None."""
+    try:
+        day = date.fromisoformat((application_date or '')[:10])
+    except ValueError:
+        return None
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def _status_key(status):
+    # Field names can't contain dots or start with $
+    return (status or 'Unknown').replace('.', '_').lstrip('$') or 'Unknown'
+
+
+def _increments(applications):
+    increments = {}
+    for application in applications:
+        for key in ('total',
+                    'by_status.' + _status_key(application.get('status')),
+                    'weekly.' + (week_start(application.get('application_date')) or 'unknown')):
+            increments[key] = increments.get(key, 0) + 1
+    return increments
+
+
+def stats_version(collection, user_id):
+    """Version of the user's counters document, or None if it's missing.
+
+    Read it before inserting applications and pass it to
+    ``record_applications``.
+    """
+    stats = collection.find_one({'_id': ObjectId(user_id)}, {'version': 1})
+    return stats.get('version') if stats else None
+
+
+def record_applications(collection, applications_collection, user_id, applications, version):
+    """Count newly inserted applications into the user's counters document.
+
+    ``version`` is what ``stats_version`` returned before they were
+    inserted. If the document is missing or was rewritten since, it may or
+    may not include them already, so it's rebuilt from the applications
+    collection instead. Returns the document's new version.
+    """
+    if not applications:
+        return version
+    stats = collection.find_one_and_update(
+        {'_id': ObjectId(user_id), 'version': version},
+        {'$inc': dict(_increments(applications), version=1), '$set': {'updated_at': datetime.utcnow()}},
+        projection={'version': 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if stats is None:
+        stats = rebuild_stats(collection, applications_collection, user_id)
+    return stats.get('version')
+
+
+def reset_stats(collection, user_id):
+    """Zero a user's counters, e.g. after all their applications are cleared."""
+    collection.update_one(
+        {'_id': ObjectId(user_id)},
+        {'$set': {'total': 0, 'by_status': {}, 'weekly': {}, 'updated_at': datetime.utcnow()},
+         '$inc': {'version': 1}},
+        upsert=True
+    )
+
+
+def aggregate_stats(applications_collection, user_id):
+    """Compute a user's counters from their applications in one aggregation.
+
+    Days are grouped in the pipeline and folded into ISO weeks here, which
+    keeps the pipeline to operators every MongoDB version supports.
+    """
+    result = list(applications_collection.aggregate([
+        {'$match': {'user_id': ObjectId(user_id)}},
+        {'$facet': {
+            'by_status': [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}],
+            'by_day': [{'$group': {'_id': {'$substr': ['$application_date', 0, 10]}, 'count': {'$sum': 1}}}]
+        }}
+    ]))
+    facets = result[0] if result else {'by_status': [], 'by_day': []}
+
+    stats = {'total': 0, 'by_status': {}, 'weekly': {}}
+    for row in facets['by_status']:
+        key = _status_key(row['_id'])
+        stats['by_status'][key] = stats['by_status'].get(key, 0) + row['count']
+        stats['total'] += row['count']
+    for row in facets['by_day']:
+        key = week_start(row['_id']) or 'unknown'
+        stats['weekly'][key] = stats['weekly'].get(key, 0) + row['count']
+    return stats
+
+
+def rebuild_stats(collection, applications_collection, user_id):
+    """Recount a user's counters and store them unless a sync wrote meanwhile.
+
+    The store is conditional on the version read before aggregating; if it
+    changed, the count may have missed applications the sync just counted,
+    so it's taken again.
+    """
+    key = {'_id': ObjectId(user_id)}
+    for _ in range(REBUILD_ATTEMPTS):
+        current = collection.find_one(key, {'version': 1})
+        stats = aggregate_stats(applications_collection, user_id)
+        stats['updated_at'] = datetime.utcnow()
+        if current is None:
+            stats['version'] = 1
+            try:
+                collection.insert_one(dict(key, **stats))
+                return stats
+            except DuplicateKeyError:
+                continue
+        stats['version'] = (current.get('version') or 0) + 1
+        if collection.replace_one(dict(key, version=current.get('version')), stats).matched_count:
+            return stats
+    # Still racing writers; the next rebuild will store it
+    return stats
+
+
+def get_metrics(collection, applications_collection, user_id, refresh=False):
+    """Dashboard metrics for a user, from the counters document."""
+    stats = None if refresh else collection.find_one({'_id': ObjectId(user_id)})
+    if stats is None:
+        stats = rebuild_stats(collection, applications_collection, user_id)
+    return format_metrics(stats)
+
+
+def format_metrics(stats):
+    by_status = {status: count for status, count in stats.get('by_status', {}).items() if count}
+    counts = {}
+    for status, count in by_status.items():
+        counts[status.lower()] = counts.get(status.lower(), 0) + count
+    total = stats.get('total', 0)
+    successes = sum(counts.get(status, 0) for status in SUCCESS_STATUSES)
+    return {
+        'total': total,
+        'interview': counts.get('interview', 0),
+        'offer': counts.get('offer', 0),
+        'rejected': counts.get('rejected', 0),
+        'success_rate': round(successes / total * 100, 1) if total else 0.0,
+        'by_status': by_status,
+        'weekly': [
+            {'week_start': week, 'count': count}
+            for week, count in sorted(stats.get('weekly', {}).items())
+            if count
+        ]
+    }
@@ -0,0 +1,70 @@
+"""Persistence for applications found by Gmail sync."""
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def save_synced_applications(collection, user_id, applications):
+    """Insert synced applications that aren't stored yet, in one bulk write.
+
+    Each application becomes an unordered upsert keyed on
+    (user_id, email_id) that only sets fields on insert, so ones already
+    present are left untouched. Upserts that lose a race with a concurrent
+    sync fail on the unique (user_id, email_id) index declared in
+    db_indexes and are counted as already present.
+    Returns the newly added applications, each with its new ``id``.
+    """
+    user_id = ObjectId(user_id)
+    now = datetime.utcnow()
+    operations = []
+    pending = []
+    seen = set()
+    for app_data in applications:
+        if app_data['email_id'] in seen:
+            continue
+        seen.add(app_data['email_id'])
+
+        # Choose the _id up front so new documents can be matched back to
+        # their application regardless of how the driver reports upserts
+        application_id = ObjectId()
+        operations.append(UpdateOne(
+            {'user_id': user_id, 'email_id': app_data['email_id']},
+            {'$setOnInsert': {
+                '_id': application_id,
+                'user_id': user_id,
+                'company': app_data['company'],
+                'position': app_data['position'],
+                'status': app_data['status'],
+                'status_color': app_data.get('status_color', 'primary'),
+                'application_date': app_data['application_date'],
+                'source': app_data['source'],
+                'email_id': app_data['email_id'],
+                'confidence': app_data.get('confidence', 100),  # Add AI confidence score
+                'created_at': now,
+                'updated_at': now
+            }},
+            upsert=True
+        ))
+        pending.append((application_id, app_data))
+
+    if not operations:
+        return []
+
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        upserted = set(result.upserted_ids.values())
+    except BulkWriteError as e:
+        other_errors = [err for err in e.details.get('writeErrors', []) if err.get('code') != DUPLICATE_KEY_ERROR]
+        if other_errors:
+            raise
+        upserted = {item['_id'] for item in e.details.get('upserted', [])}
+
+    new_applications = []
+    for application_id, app_data in pending:
+        if application_id in upserted:
+            app_data['id'] = str(application_id)
+            new_applications.append(app_data)
+    return new_applications
@@ -0,0 +1,110 @@
+"""Benchmark /api/check-auth latency with and without the user cache.
+
+Runs a minimal Flask-Login app over mongomock with a simulated MongoDB round
+trip, once with a loader that reads the users collection on every request
+(the old behaviour) and once with UserCache, and reports p50/p99.
+
+    python benchmarks/bench_check_auth.py --requests 500 --rtt-ms 2
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import mongomock
+from bson.objectid import ObjectId
+from flask import Flask, jsonify
+from flask_login import LoginManager, UserMixin, current_user, login_required, login_user
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from user_cache import UserCache  # noqa: E402
+
+
+class SlowCollection:
+    """A collection whose find_one pays a fixed network round trip."""
+
+    def __init__(self, collection, rtt):
+        self.collection = collection
+        self.rtt = rtt
+
+    def find_one(self, *args, **kwargs):
+        time.sleep(self.rtt)
+        return self.collection.find_one(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+class User(UserMixin):
+    def __init__(self, user_data):
+        self.id = str(user_data['_id'])
+        self.username = user_data['username']
+        self.email = user_data['email']
+
+
+def make_app(users, load):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'bench'
+    login_manager = LoginManager(app)
+    login_manager.user_loader(load)
+
+    @app.route('/login', methods=['POST'])
+    def login():
+        # Straight from the collection, so logging in costs no round trip
+        login_user(User(users.collection.find_one()))
+        return jsonify({'ok': True})
+
+    @app.route('/api/check-auth')
+    @login_required
+    def check_auth():
+        return jsonify({'user': {'id': current_user.id, 'username': current_user.username,
+                                 'email': current_user.email}})
+
+    return app
+
+
+def run(users, load, requests):
+    client = make_app(users, load).test_client()
+    client.post('/login')
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get('/api/check-auth')
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--rtt-ms', type=float, default=2.0, help='simulated MongoDB round trip')
+    args = parser.parse_args()
+
+    users = SlowCollection(mongomock.MongoClient().resume_tracker.users, args.rtt_ms / 1000)
+    users.collection.insert_one({'username': 'ada', 'email': 'ada@example.com', 'password': 'x' * 100})
+
+    def uncached(user_id):
+        user_data = users.find_one({'_id': ObjectId(user_id)})
+        return User(user_data) if user_data else None
+
+    cache = UserCache(users)
+
+    def cached(user_id):
+        user_data = cache.get(user_id)
+        return User(user_data) if user_data else None
+
+    print(f"{args.requests} requests, {args.rtt_ms:.1f} ms simulated MongoDB round trip")
+    print(f"{'loader':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, load in (('uncached', uncached), ('cached', cached)):
+        p50, p99 = run(users, load, args.requests)
+        print(f"{name:>10} {p50 * 1000:>8.3f} {p99 * 1000:>8.3f}")
+    print(f"cache: {cache.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Benchmark Gmail sync classification throughput against fake Gmail/OpenAI.
+
+Runs fetch_job_application_emails over a synthetic mailbox with a fixed
+simulated OpenAI latency for each combination of worker count and emails per
+request, so the effect of the concurrent pipeline and of batched prompts can
+be measured without network access.
+
+    python benchmarks/bench_classification.py --messages 100 --latency 0.3
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from classification_pipeline import RateLimiter  # noqa: E402
+from gmail_service import GmailService  # noqa: E402
+from fake_gmail import FakeGmail, make_message  # noqa: E402
+from fake_openai import FakeOpenAI  # noqa: E402
+
+
+def run(messages, latency, workers, rpm, tpm, batch_size):
+    gmail = FakeGmail([
+        make_message(f'm{i}', f'Your application {i} at Acme', body='Thanks for applying. ' * 20)
+        for i in range(messages)
+    ])
+    openai_client = FakeOpenAI(latency=latency)
+    limiter = RateLimiter(rpm, tpm)
+    service = GmailService(
+        openai_client,
+        rate_limiter=limiter,
+        max_workers=workers,
+        classification_batch_size=batch_size
+    )
+    service.service = gmail
+
+    start = time.perf_counter()
+    applications = service.fetch_job_application_emails(max_results=messages)
+    elapsed = time.perf_counter() - start
+
+    assert len(applications) == messages
+    return elapsed, openai_client.calls, openai_client.max_in_flight, limiter.waited
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.3, help='simulated OpenAI latency in seconds')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10],
+                        help='emails per OpenAI request')
+    parser.add_argument('--rpm', type=int, default=3500)
+    parser.add_argument('--tpm', type=int, default=1000000)
+    args = parser.parse_args()
+
+    print(f"{args.messages} messages, {args.latency * 1000:.0f} ms simulated OpenAI latency")
+    print(f"{'batch':>6} {'workers':>8} {'requests':>9} {'seconds':>9} {'emails/s':>9} {'in flight':>10} {'throttled s':>12}")
+    for batch_size in args.batch_sizes:
+        for workers in args.workers:
+            elapsed, calls, in_flight, waited = run(
+                args.messages, args.latency, workers, args.rpm, args.tpm, batch_size
+            )
+            print(f"{batch_size:>6} {workers:>8} {calls:>9} {elapsed:>9.2f} "
+                  f"{args.messages / elapsed:>9.1f} {in_flight:>10} {waited:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
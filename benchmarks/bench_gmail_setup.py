@@ -0,0 +1,80 @@
+"""Benchmark the per-sync cost of getting a Gmail API client.
+
+Compares the old setup, ``build('gmail', 'v1', credentials=...)`` on every
+sync, with building from the discovery document parsed once, and with
+checking a client out of GmailServicePool. Only getting the client is
+timed, not the API calls made with it. Nothing touches the network.
+
+    python benchmarks/bench_gmail_setup.py --syncs 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from googleapiclient.discovery import build
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from gmail_client_pool import (GmailServicePool, build_gmail_service,  # noqa: E402
+                               credentials_from_dict, gmail_discovery_document)
+
+CREDENTIALS = {
+    'token': 'access-token',
+    'refresh_token': 'refresh-token',
+    'token_uri': 'https://oauth2.googleapis.com/token',
+    'client_id': 'client-id',
+    'client_secret': 'client-secret',
+    'scopes': ['https://www.googleapis.com/auth/gmail.readonly']
+}
+
+
+def old_setup():
+    return build('gmail', 'v1', credentials=credentials_from_dict(CREDENTIALS), static_discovery=True)
+
+
+def cached_document_setup():
+    return build_gmail_service(credentials_from_dict(CREDENTIALS))
+
+
+def make_pooled_setup():
+    pool = GmailServicePool()
+
+    def pooled_setup():
+        with pool.acquire('user-1', CREDENTIALS) as service:
+            return service
+
+    return pooled_setup, pool
+
+
+def measure(setup, syncs):
+    timings = []
+    for _ in range(syncs):
+        start = time.perf_counter()
+        setup()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--syncs', type=int, default=200)
+    args = parser.parse_args()
+
+    # Parse the document up front; that one-off cost isn't per sync
+    gmail_discovery_document()
+    pooled_setup, pool = make_pooled_setup()
+
+    print(f"{args.syncs} syncs for one user")
+    print(f"{'setup':>16} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, setup in (('build()', old_setup), ('cached document', cached_document_setup), ('pooled', pooled_setup)):
+        p50, p99 = measure(setup, args.syncs)
+        print(f"{name:>16} {p50 * 1000:>8.3f} {p99 * 1000:>8.3f}")
+    print(f"pool: {pool.stats()}")
+
+
+if __name__ == '__main__':
+    main()
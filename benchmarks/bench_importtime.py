@@ -0,0 +1,72 @@
+"""Measure the cold-start cost of importing the app.
+
+Runs ``python -X importtime -c "import app"`` in fresh interpreters with
+MongoDB pointed at a closed port, so any connection made at import shows up
+as time (or as a failed import), and reports the wall time plus the
+modules with the largest cumulative import time.
+
+    python benchmarks/bench_importtime.py --runs 5 --top 15
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# "import time:      self [us] |  cumulative | imported package"
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def import_once(module, env):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            # Top-level imports are the least indented; keep their cumulative time
+            modules.setdefault(name, (int(cumulative), len(indent)))
+    return wall, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update({
+        'MONGO_URI': 'mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=2000',
+        'ENSURE_INDEXES_ON_STARTUP': '0',
+        'PYTHONDONTWRITEBYTECODE': '1',
+    })
+
+    walls = []
+    for _ in range(args.runs):
+        wall, modules = import_once(args.module, env)
+        walls.append(wall)
+
+    print(f"import {args.module}: {args.runs} runs, wall p50 {statistics.median(walls) * 1000:.0f} ms, "
+          f"min {min(walls) * 1000:.0f} ms")
+    print(f"{'cumulative ms':>14}  module (last run)")
+    ranked = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (cumulative, depth) in ranked[:args.top]:
+        print(f"{cumulative / 1000:>14.1f}  {' ' * (depth // 2)}{name}")
+
+
+if __name__ == '__main__':
+    main()
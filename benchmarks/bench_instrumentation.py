@@ -0,0 +1,96 @@
+"""Benchmark the cost of recording sync and request metrics.
+
+Times an empty ``with`` block against the same block wrapped in a
+histogram timer, a counter increment, and a Flask request with and without
+instrument_app, so the per-call overhead of leaving metrics on is visible.
+
+    python benchmarks/bench_instrumentation.py --calls 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+from flask import Flask
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from instrumentation import MetricsRegistry, instrument_app  # noqa: E402
+
+
+class Nothing:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def per_call(work, calls):
+    start = time.perf_counter()
+    work(calls)
+    return (time.perf_counter() - start) / calls
+
+
+def make_app(registry=None):
+    app = Flask(__name__)
+
+    @app.route('/api/applications')
+    def applications():
+        return {'applications': []}
+
+    if registry is not None:
+        instrument_app(app, registry.histogram('latency', 'Latency.', ['method', 'endpoint', 'status']))
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    stage = registry.histogram('stage_seconds', 'Stage time.', ['stage']).labels(stage='openai')
+    counter = registry.counter('messages_total', 'Messages.', ['outcome']).labels(outcome='skipped')
+    nothing = Nothing()
+
+    def bare(calls):
+        for _ in range(calls):
+            with nothing:
+                pass
+
+    def timed(calls):
+        for _ in range(calls):
+            with stage.time():
+                pass
+
+    def counted(calls):
+        for _ in range(calls):
+            counter.inc()
+
+    print(f"{'operation':>22} {'us/call':>9}")
+    baseline = per_call(bare, args.calls)
+    print(f"{'empty with block':>22} {baseline * 1e6:>9.3f}")
+    print(f"{'histogram timer':>22} {(per_call(timed, args.calls) - baseline) * 1e6:>9.3f}")
+    print(f"{'counter inc':>22} {per_call(counted, args.calls) * 1e6:>9.3f}")
+
+    # Request timings are noisy; alternate the two apps and keep each best round
+    clients = {'request': make_app().test_client(),
+               'instrumented request': make_app(MetricsRegistry()).test_client()}
+    best = dict.fromkeys(clients, float('inf'))
+    for _ in range(args.rounds):
+        for name, client in clients.items():
+            def requests(calls):
+                for _ in range(calls):
+                    client.get('/api/applications')
+
+            best[name] = min(best[name], per_call(requests, args.requests // args.rounds))
+    for name, seconds in best.items():
+        print(f"{name:>22} {seconds * 1e6:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark presigned URL signing per dashboard load against moto S3.
+
+Compares signing every resume on every load (the old dashboard), the
+PresignedUrlCache and the lazy mode, where a load signs nothing and each
+opened resume is signed on demand.
+
+    python benchmarks/bench_presigned_urls.py --resumes 100 500 --loads 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import boto3
+from moto import mock_aws
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from presigned_urls import PresignedUrlCache  # noqa: E402
+
+BUCKET = 'resume-tracker-bench'
+
+
+def sign_all(s3, keys):
+    return [
+        s3.generate_presigned_url('get_object', Params={'Bucket': BUCKET, 'Key': key}, ExpiresIn=3600)
+        for key in keys
+    ]
+
+
+def time_loads(load, loads):
+    start = time.perf_counter()
+    for _ in range(loads):
+        load()
+    return (time.perf_counter() - start) / loads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--resumes', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--loads', type=int, default=20, help='dashboard loads per measurement')
+    parser.add_argument('--opened', type=int, default=1, help='resumes opened per load in lazy mode')
+    args = parser.parse_args()
+
+    with mock_aws():
+        s3 = boto3.client('s3', region_name='us-east-1',
+                          aws_access_key_id='testing', aws_secret_access_key='testing')
+        s3.create_bucket(Bucket=BUCKET)
+
+        print(f"{args.loads} dashboard loads per row, ms per load")
+        print(f"{'resumes':>8} {'sign all':>10} {'cached':>10} {'lazy':>10} {'speedup':>9}")
+        for count in args.resumes:
+            keys = [f'resumes/user/resume-{i}.pdf' for i in range(count)]
+            uncached = time_loads(lambda: sign_all(s3, keys), args.loads)
+
+            cache = PresignedUrlCache(s3, BUCKET)
+            cache_urls = lambda: [cache.url(key) for key in keys]  # noqa: E731
+            cache_urls()  # first load signs everything
+            cached = time_loads(cache_urls, args.loads)
+
+            lazy_cache = PresignedUrlCache(s3, BUCKET)
+            lazy = time_loads(lambda: [lazy_cache.url(key) for key in keys[:args.opened]], args.loads)
+
+            print(f"{count:>8} {uncached * 1000:>10.2f} {cached * 1000:>10.3f} {lazy * 1000:>10.3f} "
+                  f"{uncached / cached:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
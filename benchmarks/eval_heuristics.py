@@ -0,0 +1,39 @@
+"""Evaluate the local pre-classifier against AI-path labels.
+
+Reads a JSON corpus of parsed emails (subject, from, body, list_unsubscribe,
+precedence) each labelled with ``ai_is_application``, the outcome of the
+OpenAI path, and reports how many emails the heuristics decide locally and
+how often those decisions agree with the model.
+
+    python benchmarks/eval_heuristics.py [corpus.json]
+"""
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from email_heuristics import evaluate  # noqa: E402
+from gmail_service import GmailService  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(ROOT, 'tests', 'fixtures', 'heuristic_corpus.json')
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CORPUS
+    with open(path) as f:
+        corpus = json.load(f)
+
+    report = evaluate(GmailService(), corpus)
+    print(f"emails:             {report['total']}")
+    print(f"decided locally:    {report['decided_locally']} ({report['avoided_rate']:.1%} LLM calls avoided)")
+    print(f"precision:          {report['precision']:.3f}")
+    print(f"recall:             {report['recall']:.3f}")
+    print(f"negative precision: {report['negative_precision']:.3f}")
+    for subject in report['mistakes']:
+        print(f"  disagrees with AI: {subject}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Cache of OpenAI email classifications.
+
+Results are keyed by user and by a hash of the normalized content the model
+sees (subject, sender and truncated body), so re-syncing a mailbox and
+receiving the same templated ATS email twice are both answered without
+another OpenAI call. A classification includes the company and position
+pulled from the email, so it's never shared between users. A bounded
+in-process LRU sits in front of a MongoDB collection whose TTL index
+(declared in db_indexes) expires old results.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import os
+import re
+import threading
+import time
+
+from bson.objectid import ObjectId
+
+CLASSIFICATION_CACHE_SIZE = int(os.getenv('CLASSIFICATION_CACHE_SIZE', '2048'))
+CLASSIFICATION_CACHE_TTL = int(os.getenv('CLASSIFICATION_CACHE_TTL_DAYS', '30')) * 24 * 3600
+
+# Same truncation as the prompt: text past this point never reaches the model
+BODY_HASH_CHARS = 1500
+
+# Bump when the prompt or model changes so stale answers stop matching
+CACHE_VERSION = 1
+
+
+def content_hash(subject, from_header, body):
+    """Hash the parts of an email the classifier looks at, ignoring case and spacing."""
+    parts = [str(CACHE_VERSION)]
+    for value in (subject, from_header, (body or '')[:BODY_HASH_CHARS]):
+        parts.append(re.sub(r'\s+', ' ', (value or '').lower()).strip())
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _cache_key(user_id, digest):
+    return f'{user_id}:{digest}'
+
+
+class ClassificationCache:
+    def __init__(self, collection=None, max_entries=CLASSIFICATION_CACHE_SIZE, ttl=CLASSIFICATION_CACHE_TTL):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+
+    def for_user(self, user_id):
+        """This cache seen from one user's sync, as GmailService uses it."""
+        return UserClassificationCache(self, user_id)
+
+    def get(self, user_id, subject, from_header, body):
+        """Return the user's cached classification for this email content, or None."""
+        key = _cache_key(user_id, content_hash(subject, from_header, body))
+        result = self._get_memory(key)
+        if result is not None:
+            with self._lock:
+                self.hits += 1
+                self.memory_hits += 1
+            return result
+
+        if self.collection is not None:
+            doc = self.collection.find_one({
+                '_id': key,
+                'user_id': ObjectId(user_id),
+                'created_at': {'$gt': datetime.utcnow() - timedelta(seconds=self.ttl)}
+            })
+            if doc:
+                self._put_memory(key, doc['result'])
+                with self._lock:
+                    self.hits += 1
+                return doc['result']
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, user_id, subject, from_header, body, result):
+        """Remember a classification for the user under the content hash."""
+        key = _cache_key(user_id, content_hash(subject, from_header, body))
+        self._put_memory(key, result)
+        if self.collection is not None:
+            self.collection.update_one(
+                {'_id': key},
+                {'$set': {'user_id': ObjectId(user_id), 'result': result, 'created_at': datetime.utcnow()}},
+                upsert=True
+            )
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_hits': self.memory_hits,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self._entries)
+            }
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            result, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def _put_memory(self, key, result):
+        with self._lock:
+            self._entries[key] = (result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class UserClassificationCache:
+    """A ClassificationCache bound to one user."""
+
+    def __init__(self, cache, user_id):
+        self.cache = cache
+        self.user_id = user_id
+
+    def get(self, subject, from_header, body):
+        return self.cache.get(self.user_id, subject, from_header, body)
+
+    def put(self, subject, from_header, body, result):
+        self.cache.put(self.user_id, subject, from_header, body, result)
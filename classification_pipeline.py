@@ -0,0 +1,147 @@
+"""Concurrency and rate limiting for OpenAI classification calls.
+
+``ordered_map`` runs classification on a thread pool while the caller keeps
+feeding it emails from the Gmail fetch, and hands results back in input
+order. ``RateLimiter`` keeps the pool inside the account's requests/minute
+and tokens/minute limits, and ``call_with_backoff`` retries the 429s that
+slip through anyway.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+OPENAI_MAX_WORKERS = int(os.getenv('OPENAI_MAX_WORKERS', '8'))
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv('OPENAI_REQUESTS_PER_MINUTE', '500'))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv('OPENAI_TOKENS_PER_MINUTE', '60000'))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '5'))
+
+
+def estimate_tokens(*texts):
+    """Rough token count for rate limiting (about four characters per token)."""
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+class TokenBucket:
+    """Refills ``rate_per_minute`` units per minute, holding at most ``capacity``."""
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount=1):
+        """Take ``amount`` units and return how long to wait before using them.
+
+        The bucket may go negative, so concurrent callers queue up behind
+        each other instead of all waking at once.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self, amount=1):
+        wait = self.reserve(amount)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one API key."""
+
+    def __init__(self, requests_per_minute=OPENAI_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=OPENAI_TOKENS_PER_MINUTE, sleep=time.sleep):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self, tokens):
+        """Block until one request of roughly ``tokens`` tokens may be sent."""
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > 0:
+            with self._lock:
+                self.waited += wait
+            self._sleep(wait)
+        return wait
+
+
+def is_rate_limit_error(error):
+    return getattr(error, 'status_code', None) == 429
+
+
+def call_with_backoff(fn, max_retries=OPENAI_MAX_RETRIES, base_delay=1.0, max_delay=30.0, sleep=time.sleep):
+    """Call ``fn``, retrying 429 responses with full-jitter exponential backoff."""
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt >= max_retries:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            retry_after = _retry_after(e)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            attempt += 1
+            logger.info("OpenAI rate limited, retrying in %.2fs (attempt %d/%d)", delay, attempt, max_retries)
+            sleep(delay)
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def ordered_map(fn, items, max_workers=OPENAI_MAX_WORKERS):
+    """Apply ``fn`` to ``items`` on a thread pool, yielding in input order.
+
+    Yields ``(item, result, error)``. ``items`` is consumed lazily, so a
+    generator that fetches from Gmail keeps fetching while earlier items are
+    being classified. At most ``2 * max_workers`` items are in flight.
+    """
+    if max_workers <= 1:
+        for item in items:
+            yield _call(fn, item)
+        return
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='classify') as pool:
+        for item in items:
+            pending.append((item, pool.submit(_call, fn, item)))
+            # Hand back whatever has finished at the head of the queue
+            while pending and (pending[0][1].done() or len(pending) >= 2 * max_workers):
+                yield pending.popleft()[1].result()
+        while pending:
+            yield pending.popleft()[1].result()
+
+
+def _call(fn, item):
+    try:
+        return item, fn(item), None
+    except Exception as e:
+        return item, None, e
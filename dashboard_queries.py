@@ -0,0 +1,173 @@
+"""Keyset-paginated, projected and filtered queries behind the dashboard.
+
+Pages are ordered by a sort field with ``_id`` as the tie-breaker, and the
+cursor carries the last row's values of both, so fetching page N costs the
+same as page 1 (no ``skip``). Only the requested fields are read from
+MongoDB. Invalid query parameters raise ValueError with a message meant for
+the API response.
+"""
+from datetime import date, datetime, timedelta
+import base64
+import json
+import re
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+APPLICATION_FIELDS = ['company', 'position', 'status', 'status_color', 'application_date', 'source', 'confidence']
+APPLICATION_SORTS = {'date': 'application_date', 'company': 'company', 'status': 'status'}
+
+RESUME_FIELDS = ['filename', 'upload_date']
+RESUME_SORTS = {'date': 'upload_date', 'filename': 'filename'}
+
+
+def encode_cursor(sort_key, value, last_id):
+    if isinstance(value, datetime):
+        value = {'$date': value.isoformat()}
+    payload = json.dumps([sort_key, value, str(last_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort_key):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value['$date'])
+        last_id = ObjectId(last_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if cursor_sort != sort_key:
+        raise ValueError('Cursor does not match the requested sort')
+    return value, last_id
+
+
+def _keyset_filter(field, direction, value, last_id):
+    """Rows strictly after ``(value, last_id)`` in the page order.
+
+    MongoDB sorts missing/null values before everything else, so they come
+    last in descending order and first in ascending order.
+    """
+    if direction == DESCENDING:
+        if value is None:
+            return {field: None, '_id': {'$lt': last_id}}
+        return {'$or': [
+            {field: {'$lt': value}},
+            {field: value, '_id': {'$lt': last_id}},
+            {field: None}
+        ]}
+    if value is None:
+        return {'$or': [{field: None, '_id': {'$gt': last_id}}, {field: {'$ne': None}}]}
+    return {'$or': [{field: {'$gt': value}}, {field: value, '_id': {'$gt': last_id}}]}
+
+
+def _page_size(args):
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise ValueError('limit must be a number')
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _sort(args, sorts, default):
+    sort_key = args.get('sort', default)
+    if sort_key not in sorts:
+        raise ValueError(f"sort must be one of: {', '.join(sorts)}")
+    order = args.get('order', 'desc' if sort_key == default else 'asc')
+    if order not in ('asc', 'desc'):
+        raise ValueError('order must be asc or desc')
+    return sort_key, sorts[sort_key], ASCENDING if order == 'asc' else DESCENDING
+
+
+def _projection(args, allowed):
+    fields = args.get('fields')
+    if not fields:
+        return allowed
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+
+
+def application_filter(user_id, args):
+    """The MongoDB filter for the status/company/date query parameters."""
+    query = {'user_id': ObjectId(user_id)}
+    if args.get('status'):
+        statuses = [status.strip() for status in args['status'].split(',') if status.strip()]
+        query['status'] = statuses[0] if len(statuses) == 1 else {'$in': statuses}
+    if args.get('company'):
+        # Case-insensitive, so MongoDB can't turn the prefix into index
+        # bounds; it scans the user's keys in a (user_id, company) index and
+        # matches the regex against them without fetching documents
+        query['company'] = {'$regex': '^' + re.escape(args['company']), '$options': 'i'}
+    # application_date is an ISO-8601 string, so dates compare as strings
+    date_range = {}
+    if args.get('date_from'):
+        date_range['$gte'] = _parse_date(args['date_from'], 'date_from').isoformat()
+    if args.get('date_to'):
+        date_range['$lt'] = (_parse_date(args['date_to'], 'date_to') + timedelta(days=1)).isoformat()
+    if date_range:
+        query['application_date'] = date_range
+    return query
+
+
+def _page(collection, query, args, sorts, default_sort, fields, extra_fields=()):
+    limit = _page_size(args)
+    sort_key, sort_field, direction = _sort(args, sorts, default_sort)
+    projection = _projection(args, fields)
+    if args.get('cursor'):
+        value, last_id = decode_cursor(args['cursor'], sort_key)
+        query = {'$and': [query, _keyset_filter(sort_field, direction, value, last_id)]}
+
+    # One extra row tells us whether there's another page
+    docs = list(
+        collection.find(query, {field: 1 for field in set(projection) | set(extra_fields) | {sort_field}})
+        .sort([(sort_field, direction), ('_id', direction)])
+        .limit(limit + 1)
+    )
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = None
+    if has_more:
+        last = docs[-1]
+        next_cursor = encode_cursor(sort_key, last.get(sort_field), last['_id'])
+    return {
+        'items': [_serialize(doc, list(projection) + list(extra_fields)) for doc in docs],
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    }
+
+
+def _serialize(doc, fields):
+    item = {'id': str(doc['_id'])}
+    for field in fields:
+        value = doc.get(field)
+        item[field] = value.isoformat() if isinstance(value, datetime) else value
+    return item
+
+
+def page_applications(collection, user_id, args):
+    """One page of a user's applications: ``{'items', 'next_cursor', 'has_more'}``."""
+    return _page(collection, application_filter(user_id, args), args, APPLICATION_SORTS, 'date', APPLICATION_FIELDS)
+
+
+def page_resumes(collection, user_id, args, extra_fields=()):
+    """One page of a user's resumes, newest first by default.
+
+    ``extra_fields`` are always read and returned, e.g. ``s3_key`` so the
+    caller can sign download URLs.
+    """
+    return _page(collection, {'user_id': ObjectId(user_id)}, args, RESUME_SORTS, 'date', RESUME_FIELDS, extra_fields)
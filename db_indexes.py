@@ -0,0 +1,311 @@
+"""MongoDB index declarations, bootstrap and query plan checks.
+
+Every index the app relies on is declared in INDEXES. ``ensure_indexes``
+creates them idempotently and ``check_query_plans`` explains each query in
+HOT_QUERIES and reports any that would fall back to a collection scan or
+sort its results in memory.
+
+The app starts an ``IndexBootstrap`` on startup, which keeps retrying the
+indexes that failed, with backoff, so a worker that boots while MongoDB is
+unreachable still gets its unique indexes once MongoDB is back. /healthz
+reports on it until every index exists.
+
+    python db_indexes.py            # create missing indexes
+    python db_indexes.py --check    # also explain hot queries, exit 1 on COLLSCAN or SORT
+"""
+from datetime import datetime
+import argparse
+import logging
+import os
+import sys
+import threading
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import ConfigurationError, ConnectionFailure, OperationFailure
+
+from classification_cache import CLASSIFICATION_CACHE_TTL
+from resume_storage import PENDING_UPLOAD_TTL
+
+logger = logging.getLogger(__name__)
+
+# Server error codes for an existing index with the same name or keys but
+# different options
+INDEX_CONFLICT_CODES = {85, 86}
+
+# Seconds between attempts to build indexes that failed, doubling up to the max
+INDEX_RETRY_INITIAL_DELAY = float(os.getenv('INDEX_RETRY_INITIAL_DELAY', '1'))
+INDEX_RETRY_MAX_DELAY = float(os.getenv('INDEX_RETRY_MAX_DELAY', '60'))
+
+INDEXES = {
+    'users': [
+        ([('email', ASCENDING)], {'name': 'email_unique', 'unique': True}),
+        ([('username', ASCENDING)], {'name': 'username_unique', 'unique': True}),
+    ],
+    'applications': [
+        # Partial, so only queries that pin email_id can use it
+        ([('user_id', ASCENDING), ('email_id', ASCENDING)], {
+            'name': 'user_id_email_id_unique',
+            'unique': True,
+            'partialFilterExpression': {'email_id': {'$exists': True}}
+        }),
+        # Also serves every "all applications for this user" query
+        ([('user_id', ASCENDING), ('company', ASCENDING), ('position', ASCENDING)], {
+            'name': 'user_id_company_position'
+        }),
+        # Keyset pages of the dashboard list, newest first (dashboard_queries)
+        ([('user_id', ASCENDING), ('application_date', DESCENDING), ('_id', DESCENDING)], {
+            'name': 'user_id_application_date'
+        }),
+        ([('user_id', ASCENDING), ('status', ASCENDING), ('application_date', DESCENDING), ('_id', DESCENDING)], {
+            'name': 'user_id_status_application_date'
+        }),
+        # Keyset pages sorted by company or status, _id breaking ties
+        ([('user_id', ASCENDING), ('company', ASCENDING), ('_id', ASCENDING)], {'name': 'user_id_company_id'}),
+        ([('user_id', ASCENDING), ('status', ASCENDING), ('_id', ASCENDING)], {'name': 'user_id_status_id'}),
+    ],
+    'resumes': [
+        ([('user_id', ASCENDING), ('upload_date', DESCENDING)], {'name': 'user_id_upload_date'}),
+        # Other references to an object before deleting it (resume_storage)
+        ([('s3_key', ASCENDING)], {'name': 's3_key'}),
+        # Text extractions to retry (resume_text)
+        ([('text_status', ASCENDING), ('text_status_at', ASCENDING)], {'name': 'text_status_text_status_at'}),
+    ],
+    'resume_uploads': [
+        # Presigned uploads that were never completed (resume_storage)
+        ([('created_at', ASCENDING)], {'name': 'created_at_ttl', 'expireAfterSeconds': PENDING_UPLOAD_TTL}),
+    ],
+    'resume_texts': [
+        # Reusing text extracted from the same content (resume_text)
+        ([('user_id', ASCENDING), ('sha256', ASCENDING)], {'name': 'user_id_sha256'}),
+    ],
+    'resume_terms': [
+        # Inverted index for resume search (resume_text)
+        ([('user_id', ASCENDING), ('term', ASCENDING)], {'name': 'user_id_term'}),
+        ([('resume_id', ASCENDING)], {'name': 'resume_id'}),
+    ],
+    'classification_cache': [
+        ([('created_at', ASCENDING)], {'name': 'created_at_ttl', 'expireAfterSeconds': CLASSIFICATION_CACHE_TTL}),
+    ],
+    'sessions': [
+        # Used only with SESSION_BACKEND=mongodb; see mongo_session
+        ([('expires_at', ASCENDING)], {'name': 'expires_at_ttl', 'expireAfterSeconds': 0}),
+    ],
+    'gmail_credentials': [
+        # Tokens the background refresher renews before they expire (gmail_tokens)
+        ([('expires_at', ASCENDING)], {'name': 'expires_at'}),
+    ],
+    'sync_jobs': [
+        # One queued or running sync per user; see sync_jobs
+        ([('user_id', ASCENDING)], {
+            'name': 'user_id_active_unique',
+            'unique': True,
+            'partialFilterExpression': {'active': True}
+        }),
+        ([('user_id', ASCENDING), ('created_at', DESCENDING)], {'name': 'user_id_created_at'}),
+    ],
+}
+
+# The queries behind login, the dashboard and sync, with placeholder values.
+# Each entry is (name, collection, filter, sort).
+HOT_QUERIES = [
+    ('login by email', 'users', {'email': 'someone@example.com'}, None),
+    ('register username check', 'users', {'username': 'someone'}, None),
+    ('load user', 'users', {'_id': ObjectId()}, None),
+    ('dashboard applications', 'applications', {'user_id': ObjectId()}, None),
+    ('sync duplicate check', 'applications', {'user_id': ObjectId(), 'email_id': 'message-id'}, None),
+    ('application by company', 'applications',
+     {'user_id': ObjectId(), 'company': 'Acme', 'position': 'Engineer'}, None),
+    ('applications page', 'applications', {'user_id': ObjectId()},
+     [('application_date', DESCENDING), ('_id', DESCENDING)]),
+    ('applications page by status', 'applications', {'user_id': ObjectId(), 'status': 'Interview'},
+     [('application_date', DESCENDING), ('_id', DESCENDING)]),
+    ('applications sorted by company', 'applications', {'user_id': ObjectId()},
+     [('company', ASCENDING), ('_id', ASCENDING)]),
+    ('applications sorted by status', 'applications', {'user_id': ObjectId()},
+     [('status', DESCENDING), ('_id', DESCENDING)]),
+    ('dashboard resumes', 'resumes', {'user_id': ObjectId()}, None),
+    ('resume by id', 'resumes', {'_id': ObjectId(), 'user_id': ObjectId()}, None),
+    ('resume search terms', 'resume_terms', {'user_id': ObjectId(), 'term': {'$in': ['python', 'aws']}}, None),
+    ('resume search lengths', 'resume_texts', {'user_id': ObjectId()}, None),
+    ('stale resume extractions', 'resumes',
+     {'text_status': {'$in': ['pending', 'processing']}, 'text_status_at': {'$lt': datetime(2000, 1, 1)}}, None),
+    ('active sync job', 'sync_jobs', {'user_id': ObjectId(), 'active': True}, None),
+    ('sync job by id', 'sync_jobs', {'_id': ObjectId(), 'user_id': ObjectId()}, None),
+    ('classification cache lookup', 'classification_cache',
+     {'_id': 'user-id:content-hash', 'user_id': ObjectId(), 'created_at': {'$gt': datetime(2000, 1, 1)}}, None),
+]
+
+
+def ensure_indexes(db, indexes=INDEXES):
+    """Create every declared index; safe to run repeatedly.
+
+    An index whose options changed (say a new TTL) is dropped and rebuilt.
+    Returns a list of ``(collection, index name, error)`` for indexes that
+    couldn't be built, e.g. a unique index over existing duplicates. When
+    MongoDB can't be reached at all every remaining index is reported with
+    that error, rather than waiting out the server selection timeout once
+    per index.
+    """
+    failures = []
+    unreachable = None
+    for collection_name, specs in indexes.items():
+        for keys, options in specs:
+            if unreachable is not None:
+                failures.append((collection_name, options['name'], unreachable))
+                continue
+            try:
+                # Inside the try: resolving the client can fail too (SRV lookup)
+                collection = db[collection_name]
+                try:
+                    collection.create_index(keys, **options)
+                except OperationFailure as e:
+                    if e.code not in INDEX_CONFLICT_CODES:
+                        raise
+                    logger.info("Rebuilding index %s.%s with new options", collection_name, options['name'])
+                    _drop_conflicting(collection, keys, options['name'])
+                    collection.create_index(keys, **options)
+            except (ConfigurationError, ConnectionFailure) as e:
+                logger.error("Can't reach MongoDB to create indexes: %s", e)
+                unreachable = e
+                failures.append((collection_name, options['name'], e))
+            except Exception as e:
+                logger.error("Error creating index %s.%s: %s", collection_name, options['name'], e)
+                failures.append((collection_name, options['name'], e))
+    return failures
+
+
+class IndexBootstrap:
+    """Runs ``ensure_indexes`` on a background thread until every index exists.
+
+    Each attempt only retries the indexes that failed last time, waiting
+    ``initial_delay`` seconds after the first failure and doubling up to
+    ``max_delay``.
+    """
+
+    def __init__(self, db, indexes=INDEXES, initial_delay=INDEX_RETRY_INITIAL_DELAY,
+                 max_delay=INDEX_RETRY_MAX_DELAY):
+        self.db = db
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self._pending = {name: list(specs) for name, specs in indexes.items()}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.attempts = 0
+        self.last_error = None
+
+    def start(self):
+        """Start the background thread (once)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ensure-indexes', daemon=True)
+                self._thread.start()
+
+    def ensure_once(self):
+        """Try the pending indexes once; returns True when none are left."""
+        with self._lock:
+            pending = dict(self._pending)
+        failures = ensure_indexes(self.db, pending)
+        failed = {(collection_name, name) for collection_name, name, _ in failures}
+        remaining = {}
+        for collection_name, specs in pending.items():
+            left = [spec for spec in specs if (collection_name, spec[1]['name']) in failed]
+            if left:
+                remaining[collection_name] = left
+        with self._lock:
+            self._pending = remaining
+            self.attempts += 1
+            self.last_error = str(failures[-1][2]) if failures else None
+        return not remaining
+
+    def _run(self):
+        delay = self.initial_delay
+        while not self._stop.is_set():
+            if self.ensure_once():
+                logger.info("Indexes ensured after %d attempt(s)", self.attempts)
+                return
+            logger.warning("%d index(es) not created yet, retrying in %.0fs",
+                           len(self.status()['pending']), delay)
+            if self._stop.wait(delay):
+                return
+            delay = min(delay * 2, self.max_delay)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def ensured(self):
+        with self._lock:
+            return not self._pending
+
+    def status(self):
+        with self._lock:
+            return {
+                'ensured': not self._pending,
+                'pending': [f"{collection_name}.{options['name']}"
+                            for collection_name, specs in self._pending.items() for _, options in specs],
+                'attempts': self.attempts,
+                'error': self.last_error
+            }
+
+
+def _drop_conflicting(collection, keys, name):
+    for existing_name, info in collection.index_information().items():
+        if existing_name == name or list(info['key']) == list(keys):
+            collection.drop_index(existing_name)
+
+
+def plan_stages(plan):
+    """Flatten an explain() plan tree into its list of stage names."""
+    if not isinstance(plan, dict):
+        return []
+    stages = [plan['stage']] if 'stage' in plan else []
+    for key in ('inputStage', 'queryPlan', 'outerStage', 'innerStage'):
+        stages.extend(plan_stages(plan.get(key)))
+    for child in plan.get('inputStages', []):
+        stages.extend(plan_stages(child))
+    return stages
+
+
+def check_query_plans(db, queries=HOT_QUERIES):
+    """Explain each hot query; returns ``(name, stages, ok)`` per query."""
+    report = []
+    for name, collection_name, query, sort in queries:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = cursor.explain()
+        stages = plan_stages(explain.get('queryPlanner', {}).get('winningPlan', {}))
+        # SORT is an in-memory sort: no index gives the requested order
+        report.append((name, stages, 'COLLSCAN' not in stages and 'SORT' not in stages))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Create MongoDB indexes and check query plans.')
+    parser.add_argument('--check', action='store_true', help='explain hot queries and fail on COLLSCAN or SORT')
+    parser.add_argument('--skip-create', action='store_true', help='only run the plan check')
+    args = parser.parse_args(argv)
+
+    client = MongoClient(os.getenv('MONGO_URI'), serverSelectionTimeoutMS=5000)
+    db = client.resume_tracker
+
+    failed = False
+    if not args.skip_create:
+        failures = ensure_indexes(db)
+        failed = bool(failures)
+        print(f"Indexes ensured ({len(failures)} failed)")
+
+    if args.check or args.skip_create:
+        for name, stages, ok in check_query_plans(db):
+            print(f"{'ok  ' if ok else 'FAIL'} {name}: {' <- '.join(stages)}")
+            failed = failed or not ok
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
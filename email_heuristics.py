@@ -0,0 +1,225 @@
+"""Local pre-classification of job emails before any OpenAI call.
+
+Scores an email from cheap signals: the GmailService regex extractors, the
+sender's domain, confirmation/alert/newsletter phrasing and bulk-mail
+headers. Emails that score clearly one way are decided locally; only the
+ambiguous middle goes to the model. ``evaluate`` replays a labelled corpus
+to measure how often the local decision agrees with the AI path.
+"""
+import re
+
+# Applicant tracking systems that send confirmations on a company's behalf
+ATS_DOMAINS = {
+    'greenhouse.io', 'greenhouse-mail.io', 'lever.co', 'hire.lever.co', 'myworkday.com', 'workday.com',
+    'icims.com', 'smartrecruiters.com', 'jobvite.com', 'ashbyhq.com', 'taleo.net', 'successfactors.com',
+    'bamboohr.com', 'recruitee.com', 'workablemail.com', 'breezy.hr', 'applytojob.com'
+}
+
+# Job boards and marketing senders whose mail is mostly alerts and promotions
+BULK_DOMAINS = {
+    'indeed.com', 'ziprecruiter.com', 'glassdoor.com', 'monster.com', 'careerbuilder.com',
+    'dice.com', 'simplyhired.com', 'mailchimp.com', 'sendgrid.net', 'hubspotemail.net'
+}
+
+CONFIRMATION_PHRASES = [
+    r'thank you for (?:your )?appl(?:ying|ication)',
+    r'thanks for appl(?:ying|ication)',
+    r'(?:we(?:\'ve| have)|has been) received your application',
+    r'your application (?:has been|was) (?:received|submitted|sent)',
+    r'application (?:received|confirmation|submitted)',
+    r'we received your application',
+]
+
+# Rejections, interviews and offers need the model to tell them apart
+STATUS_PHRASES = [
+    r'unfortunately', r'not (?:be )?moving forward', r'other candidates', r'regret to inform',
+    r'interview', r'schedule a (?:call|time)', r'offer letter', r'pleased to offer',
+]
+
+ALERT_PHRASES = [
+    r'job alert', r'jobs? (?:you may|that may|we think you)', r'recommended jobs?', r'new jobs? (?:for|matching|near)',
+    r'jobs? matching', r'apply now', r'is hiring', r'\d+ new jobs?', r'similar jobs',
+]
+
+NEWSLETTER_PHRASES = [
+    r'newsletter', r'digest', r'webinar', r'unsubscribe from this list', r'% off', r'limited time', r'sale\b',
+]
+
+FINANCIAL_TERMS = ['credit card', 'banking', 'financial', 'insurance']
+
+# The position regexes are loose; a local decision only trusts titles that
+# don't start or end like a sentence fragment ("at Acme", "has been received")
+TITLE_STOPWORDS = {
+    'a', 'an', 'at', 'as', 'by', 'for', 'from', 'has', 'have', 'in', 'is', 'of', 'on', 's',
+    'that', 'the', 'to', 'was', 'we', 'with', 'you', 'your', 'been', 'received', 'submitted',
+    'successfully', 'profile', 'search', 'new', 'alert'
+}
+
+APPLICATION_THRESHOLD = 5
+NOT_APPLICATION_THRESHOLD = -3
+
+
+def _domain(from_header):
+    match = re.search(r'@([A-Za-z0-9.-]+)', from_header or '')
+    return match.group(1).lower() if match else ''
+
+
+def _matches_domain(domain, domains):
+    return any(domain == d or domain.endswith('.' + d) for d in domains)
+
+
+def _has_any(patterns, text):
+    return any(re.search(pattern, text) for pattern in patterns)
+
+
+def _plausible_title(position):
+    words = (position or '').lower().split()
+    return bool(words) and len(words) <= 6 and words[0] not in TITLE_STOPWORDS and words[-1] not in TITLE_STOPWORDS
+
+
+def score_email(service, email):
+    """Return ``(score, signals)`` for a parsed email.
+
+    Positive scores point to an application confirmation, negative scores
+    to alerts, newsletters and other mail. ``signals`` records what fired,
+    including the company and position found by the regex extractors.
+    """
+    subject = email.get('subject', '')
+    body = email.get('body', '')[:3000]
+    from_header = email.get('from', '')
+    text = f"{subject}\n{body}".lower()
+    domain = _domain(from_header)
+    signals = {}
+    score = 0
+
+    if any(term in subject.lower() for term in FINANCIAL_TERMS):
+        signals['financial'] = True
+        score -= 10
+
+    ats_sender = _matches_domain(domain, ATS_DOMAINS)
+    # ATS mail comes from the vendor's domain, not the employer's, so only
+    # look for the company in the text
+    company = service._extract_company_name(subject, body, '' if ats_sender else from_header)
+    position = service._extract_position(subject, body)
+    if not _plausible_title(position):
+        position = None
+    signals['company'] = company
+    signals['position'] = position
+    if company:
+        score += 1
+    if position:
+        score += 1
+
+    if ats_sender:
+        signals['ats_sender'] = True
+        score += 2
+    elif _matches_domain(domain, BULK_DOMAINS):
+        signals['bulk_sender'] = True
+        score -= 2
+
+    if _has_any(CONFIRMATION_PHRASES, text):
+        signals['confirmation'] = True
+        score += 3
+    if _has_any(STATUS_PHRASES, text):
+        signals['status_language'] = True
+    if _has_any(ALERT_PHRASES, text):
+        signals['alert'] = True
+        score -= 3
+    if _has_any(NEWSLETTER_PHRASES, text):
+        signals['newsletter'] = True
+        score -= 2
+    if email.get('list_unsubscribe'):
+        signals['list_unsubscribe'] = True
+        score -= 1
+    if (email.get('precedence') or '').lower() in ('bulk', 'list'):
+        signals['bulk_precedence'] = True
+        score -= 1
+
+    return score, signals
+
+
+def pre_classify(service, email):
+    """Decide an email locally when the signals are clear.
+
+    Returns an analysis in the same shape as the OpenAI result, or None
+    when the email is ambiguous and needs the model.
+    """
+    score, signals = score_email(service, email)
+
+    if score <= NOT_APPLICATION_THRESHOLD:
+        return {
+            'is_job_application': False,
+            'is_job_alert': bool(signals.get('alert')),
+            'company_name': None,
+            'position': None,
+            'status': None,
+            'confidence': min(95, 70 + 5 * (NOT_APPLICATION_THRESHOLD - score)),
+            'source': 'heuristic'
+        }
+
+    # Only plain confirmations with both fields found are safe to accept;
+    # anything that reads like a status change goes to the model.
+    if (score >= APPLICATION_THRESHOLD and signals.get('confirmation') and
+            signals.get('company') and signals.get('position') and
+            not signals.get('status_language') and not signals.get('alert')):
+        return {
+            'is_job_application': True,
+            'is_job_alert': False,
+            'company_name': signals['company'],
+            'position': signals['position'],
+            'status': 'Applied',
+            'confidence': min(95, 75 + 5 * (score - APPLICATION_THRESHOLD)),
+            'source': 'heuristic'
+        }
+
+    return None
+
+
+def is_accepted(analysis):
+    """The sync's acceptance rule for an analysis, local or from OpenAI."""
+    return bool(
+        analysis.get('is_job_application', False) and
+        not analysis.get('is_job_alert', True) and
+        analysis.get('confidence', 0) > 70
+    )
+
+
+def evaluate(service, corpus):
+    """Compare local decisions with AI-path labels over a labelled corpus.
+
+    Each corpus entry is a parsed email plus ``ai_is_application``, the
+    outcome of the OpenAI path for it. Precision and recall are measured on
+    the emails decided locally, for the "is an application" class;
+    ``avoided_rate`` is the share of emails that never reach the model.
+    """
+    true_pos = false_pos = false_neg = true_neg = 0
+    decided = 0
+    mistakes = []
+    for entry in corpus:
+        analysis = pre_classify(service, entry)
+        if analysis is None:
+            continue
+        decided += 1
+        predicted = is_accepted(analysis)
+        expected = entry['ai_is_application']
+        if predicted and expected:
+            true_pos += 1
+        elif predicted and not expected:
+            false_pos += 1
+        elif not predicted and expected:
+            false_neg += 1
+        else:
+            true_neg += 1
+        if predicted != expected:
+            mistakes.append(entry.get('subject'))
+
+    return {
+        'total': len(corpus),
+        'decided_locally': decided,
+        'llm_calls_avoided': decided,
+        'avoided_rate': round(decided / len(corpus), 3) if corpus else 0.0,
+        'precision': round(true_pos / (true_pos + false_pos), 3) if true_pos + false_pos else 1.0,
+        'recall': round(true_pos / (true_pos + false_neg), 3) if true_pos + false_neg else 1.0,
+        'negative_precision': round(true_neg / (true_neg + false_neg), 3) if true_neg + false_neg else 1.0,
+        'mistakes': mistakes
+    }
@@ -6,11 +6,13 @@ import { faTrash } from '@fortawesome/free-solid-svg-icons';
 import GmailIntegration from './GmailIntegration';
 import toast from 'react-hot-toast';
 import DashboardMetrics from './DashboardMetrics';
+import ResumeSearch from './ResumeSearch';
+import { streamGmailSync } from '../gmailSync';
 
 interface Resume {
   id: string;
   filename: string;
-  url: string;
+  url?: string;
   upload_date: string;
 }
 
@@ -27,22 +29,28 @@ interface Application {
 export default function Dashboard() {
   const [resumes, setResumes] = useState<Resume[]>([]);
   const [applications, setApplications] = useState<Application[]>([]);
+  const [applicationsCursor, setApplicationsCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [metricsVersion, setMetricsVersion] = useState(0);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [isGmailAuthenticated, setIsGmailAuthenticated] = useState(false);
   const [syncingGmail, setSyncingGmail] = useState(false);
   const [clearingApplications, setClearingApplications] = useState(false);
+  const [deletingResumes, setDeletingResumes] = useState(false);
 
   const fetchDashboardData = async () => {
     try {
-      const response = await fetch('/api/dashboard', {
+      const response = await fetch('/api/dashboard?mode=paged&resume_urls=lazy', {
         credentials: 'include'
       });
       const data = await response.json();
       
       if (response.ok) {
-        setResumes(data.resumes);
-        setApplications(data.applications);
+        setResumes(data.resumes.items);
+        setApplications(data.applications.items);
+        setApplicationsCursor(data.applications.next_cursor);
+        setMetricsVersion(version => version + 1);
       } else {
         setError(data.error || 'Failed to fetch dashboard data');
       }
@@ -53,6 +61,29 @@ export default function Dashboard() {
     }
   };
 
+  const loadMoreApplications = async () => {
+    if (!applicationsCursor) {
+      return;
+    }
+    setLoadingMore(true);
+    try {
+      const response = await fetch(`/api/applications?cursor=${encodeURIComponent(applicationsCursor)}`, {
+        credentials: 'include'
+      });
+      const data = await response.json();
+      if (!response.ok) {
+        throw new Error(data.error || 'Failed to fetch applications');
+      }
+      setApplications(previous => [...previous, ...data.items]);
+      setApplicationsCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Error loading applications:', error);
+      toast.error('Failed to load more applications');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchDashboardData();
     checkGmailAuth();
@@ -73,17 +104,16 @@ export default function Dashboard() {
   const handleGmailSync = async () => {
     setSyncingGmail(true);
     try {
-      const response = await fetch('/api/gmail/sync', {
-        method: 'POST',
-        credentials: 'include',
+      const summary = await streamGmailSync({
+        // Show each new application as soon as it's found
+        onEmail: email => {
+          if (email.result === 'new' && email.application?.id) {
+            const application = email.application as Application;
+            setApplications(previous => [application, ...previous]);
+          }
+        }
       });
-
-      if (!response.ok) {
-        throw new Error('Failed to sync Gmail');
-      }
-
-      const data = await response.json();
-      toast.success(data.message);
+      toast.success(`Successfully synced ${summary.new_added} new applications using AI analysis`);
       // Refresh dashboard data to show new applications
       await fetchDashboardData();
     } catch (error) {
@@ -94,6 +124,32 @@ export default function Dashboard() {
     }
   };
 
+  const handleOpenResume = async (resumeId: string) => {
+    // Open the tab now so it isn't treated as a popup once the URL arrives
+    const tab = window.open('', '_blank');
+    if (tab) {
+      tab.opener = null;
+    }
+    try {
+      const response = await fetch(`/api/resume/${resumeId}/url`, {
+        credentials: 'include'
+      });
+      const data = await response.json();
+      if (!response.ok) {
+        throw new Error(data.error || 'Failed to open resume');
+      }
+      if (tab) {
+        tab.location.href = data.url;
+      } else {
+        window.location.href = data.url;
+      }
+    } catch (error) {
+      tab?.close();
+      console.error('Error opening resume:', error);
+      toast.error('Failed to open resume');
+    }
+  };
+
   const handleDeleteResume = async (resumeId: string) => {
     try {
       const response = await fetch(`/api/resume/${resumeId}`, {
@@ -112,6 +168,38 @@ export default function Dashboard() {
     }
   };
 
+  const handleDeleteAllResumes = async () => {
+    if (!window.confirm('Are you sure you want to delete all resumes? This action cannot be undone.')) {
+      return;
+    }
+
+    setDeletingResumes(true);
+    try {
+      const response = await fetch('/api/resumes/delete', {
+        method: 'POST',
+        credentials: 'include',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ all: true })
+      });
+
+      if (!response.ok) {
+        throw new Error('Failed to delete resumes');
+      }
+
+      const data = await response.json();
+      setResumes([]);
+      toast.success(`Deleted ${data.deleted_count} resumes`);
+      if (data.errors.length > 0) {
+        console.error('Resume files that could not be deleted:', data.errors);
+      }
+    } catch (error) {
+      console.error('Error deleting resumes:', error);
+      toast.error('Failed to delete resumes');
+    } finally {
+      setDeletingResumes(false);
+    }
+  };
+
   const handleClearApplications = async () => {
     if (!window.confirm('Are you sure you want to clear all job applications? This action cannot be undone.')) {
       return;
@@ -130,6 +218,8 @@ export default function Dashboard() {
 
       const data = await response.json();
       setApplications([]);
+      setApplicationsCursor(null);
+      setMetricsVersion(version => version + 1);
       toast.success(data.message);
     } catch (error) {
       console.error('Error clearing applications:', error);
@@ -151,16 +241,24 @@ export default function Dashboard() {
     <div className="container mt-4">
       <div className="row mb-4">
         <div className="col-12">
-          <DashboardMetrics applications={applications} />
+          <DashboardMetrics refreshKey={metricsVersion} />
         </div>
       </div>
       <div className="row">
         <div className="col-md-6">
           <div className="card mb-4">
-            <div className="card-header">
+            <div className="card-header d-flex justify-content-between align-items-center">
               <h3 className="card-title mb-0">My Resumes</h3>
+              <button
+                className="btn btn-outline-danger"
+                onClick={handleDeleteAllResumes}
+                disabled={deletingResumes || resumes.length === 0}
+              >
+                {deletingResumes ? 'Deleting...' : 'Delete All'}
+              </button>
             </div>
             <div className="card-body">
+              {resumes.length > 0 && <ResumeSearch onOpen={handleOpenResume} />}
               {resumes.length > 0 ? (
                 <div className="list-group">
                   {resumes.map(resume => (
@@ -172,14 +270,12 @@ export default function Dashboard() {
                         </small>
                       </div>
                       <div className="btn-group">
-                        <a
-                          href={resume.url}
+                        <button
                           className="btn btn-sm btn-outline-primary"
-                          target="_blank"
-                          rel="noopener noreferrer"
+                          onClick={() => handleOpenResume(resume.id)}
                         >
                           <i className="fas fa-download"></i>
-                        </a>
+                        </button>
                         <button
                           className="btn btn-sm btn-outline-danger"
                           onClick={() => handleDeleteResume(resume.id)}
@@ -236,6 +332,15 @@ export default function Dashboard() {
                       </div>
                     </div>
                   ))}
+                  {applicationsCursor && (
+                    <button
+                      className="btn btn-outline-secondary mt-3"
+                      onClick={loadMoreApplications}
+                      disabled={loadingMore}
+                    >
+                      {loadingMore ? 'Loading...' : 'Load more'}
+                    </button>
+                  )}
                 </div>
               ) : (
                 <p className="text-center text-muted">No job applications tracked yet.</p>
@@ -1,23 +1,58 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
+
+interface Metrics {
+  total: number;
+  interview: number;
+  offer: number;
+  rejected: number;
+  success_rate: number;
+  by_status: Record<string, number>;
+  weekly: Array<{ week_start: string; count: number }>;
+}
 
 interface DashboardMetricsProps {
-  applications: Array<{
-    status: string;
-    status_color: string;
-  }>;
+  // Change this to refetch, e.g. after a sync or clear
+  refreshKey?: number;
 }
 
-const DashboardMetrics: React.FC<DashboardMetricsProps> = ({ applications }) => {
-  // Calculate metrics
-  const totalApplications = applications.length;
-  const interviewCount = applications.filter(app => app.status.toLowerCase() === 'interview').length;
-  const offerCount = applications.filter(app => app.status.toLowerCase() === 'offer').length;
-  const rejectedCount = applications.filter(app => app.status.toLowerCase() === 'rejected').length;
-  
-  // Calculate success rate (interviews + offers) / total
-  const successRate = totalApplications > 0
-    ? ((interviewCount + offerCount) / totalApplications) * 100
-    : 0;
+const EMPTY_METRICS: Metrics = {
+  total: 0,
+  interview: 0,
+  offer: 0,
+  rejected: 0,
+  success_rate: 0,
+  by_status: {},
+  weekly: []
+};
+
+const DashboardMetrics: React.FC<DashboardMetricsProps> = ({ refreshKey = 0 }) => {
+  const [metrics, setMetrics] = useState<Metrics>(EMPTY_METRICS);
+
+  useEffect(() => {
+    const fetchMetrics = async () => {
+      try {
+        const response = await fetch('/api/metrics', {
+          credentials: 'include'
+        });
+        const data = await response.json();
+        if (response.ok) {
+          setMetrics(data);
+        } else {
+          console.error('Failed to fetch metrics:', data.error);
+        }
+      } catch (error) {
+        console.error('Failed to fetch metrics:', error);
+      }
+    };
+    fetchMetrics();
+  }, [refreshKey]);
+
+  // Counts and success rate ((interviews + offers) / total) come from the server
+  const totalApplications = metrics.total;
+  const interviewCount = metrics.interview;
+  const offerCount = metrics.offer;
+  const rejectedCount = metrics.rejected;
+  const successRate = metrics.success_rate;
   
   // Calculate gauge rotation (from -90 to 90 degrees)
   const gaugeRotation = -90 + (successRate * 1.8); // 1.8 = 180/100
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
+import { streamGmailSync, SyncEmailEvent } from '../gmailSync';
 
 interface GmailSyncProps {
   onSync: () => void;
@@ -9,6 +10,8 @@ const GmailSync: React.FC<GmailSyncProps> = ({ onSync }) => {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [isSyncing, setIsSyncing] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [progress, setProgress] = useState<{ processed: number; total: number } | null>(null);
+  const [found, setFound] = useState<SyncEmailEvent[]>([]);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -43,25 +46,26 @@ const GmailSync: React.FC<GmailSyncProps> = ({ onSync }) => {
   const handleSync = async () => {
     setIsSyncing(true);
     setError(null);
+    setProgress(null);
+    setFound([]);
 
     try {
-      const response = await fetch('/api/gmail/sync', {
-        method: 'POST',
-        credentials: 'include'
+      await streamGmailSync({
+        onStart: ({ total }) => setProgress({ processed: 0, total }),
+        onEmail: email => {
+          setProgress({ processed: email.processed, total: email.total });
+          if (email.application) {
+            setFound(previous => [...previous, email]);
+          }
+        }
       });
-
-      const data = await response.json();
-
-      if (response.ok) {
-        onSync();
-      } else {
-        setError(data.error || 'Failed to sync with Gmail');
-      }
+      onSync();
     } catch (error) {
-      setError('Failed to sync with Gmail');
+      setError(error instanceof Error ? error.message : 'Failed to sync with Gmail');
       console.error('Gmail sync error:', error);
     } finally {
       setIsSyncing(false);
+      setProgress(null);
     }
   };
 
@@ -96,7 +100,9 @@ const GmailSync: React.FC<GmailSyncProps> = ({ onSync }) => {
               {isSyncing ? (
                 <>
                   <span className="spinner-border spinner-border-sm me-2" role="status" aria-hidden="true"></span>
-                  Syncing...
+                  {progress && progress.total > 0
+                    ? `Syncing ${progress.processed}/${progress.total}...`
+                    : 'Syncing...'}
                 </>
               ) : (
                 <>
@@ -114,6 +120,19 @@ const GmailSync: React.FC<GmailSyncProps> = ({ onSync }) => {
               Connect Gmail
             </button>
           )}
+
+          {found.length > 0 && (
+            <ul className="list-group list-group-flush mt-3">
+              {found.map(email => (
+                <li key={email.message_id} className="list-group-item d-flex justify-content-between align-items-center">
+                  <span>{email.application?.company} - {email.application?.position}</span>
+                  <span className={`badge bg-${email.result === 'new' ? 'success' : 'secondary'}`}>
+                    {email.result === 'new' ? 'New' : 'Already tracked'}
+                  </span>
+                </li>
+              ))}
+            </ul>
+          )}
         </div>
       </div>
     </div>
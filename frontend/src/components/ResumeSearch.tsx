@@ -0,0 +1,88 @@
+import React, { useState } from 'react';
+
+interface SearchResult {
+  id: string;
+  filename: string;
+  upload_date: string;
+  score: number;
+  matched_terms: string[];
+  snippet: string;
+}
+
+interface ResumeSearchProps {
+  onOpen: (resumeId: string) => void;
+}
+
+const ResumeSearch: React.FC<ResumeSearchProps> = ({ onOpen }) => {
+  const [query, setQuery] = useState('');
+  const [results, setResults] = useState<SearchResult[] | null>(null);
+  const [pending, setPending] = useState(0);
+  const [error, setError] = useState('');
+  const [searching, setSearching] = useState(false);
+
+  const handleSearch = async (e: React.FormEvent) => {
+    e.preventDefault();
+    if (!query.trim()) {
+      setResults(null);
+      return;
+    }
+
+    setSearching(true);
+    setError('');
+    try {
+      const response = await fetch(`/api/resumes/search?q=${encodeURIComponent(query)}`, {
+        credentials: 'include'
+      });
+      const data = await response.json();
+      if (response.ok) {
+        setResults(data.results);
+        setPending(data.pending);
+      } else {
+        setError(data.error || 'Search failed');
+      }
+    } catch (error) {
+      setError('An error occurred while searching');
+    } finally {
+      setSearching(false);
+    }
+  };
+
+  return (
+    <div className="mb-3">
+      <form className="input-group" onSubmit={handleSearch}>
+        <input
+          type="search"
+          className="form-control"
+          placeholder="Search resume text"
+          value={query}
+          onChange={(e) => setQuery(e.target.value)}
+        />
+        <button type="submit" className="btn btn-outline-secondary" disabled={searching}>
+          {searching ? 'Searching...' : 'Search'}
+        </button>
+      </form>
+      {error && <div className="text-danger small mt-1">{error}</div>}
+      {results && (
+        <div className="list-group mt-2">
+          {results.map(result => (
+            <button
+              key={result.id}
+              type="button"
+              className="list-group-item list-group-item-action"
+              onClick={() => onOpen(result.id)}
+            >
+              <div className="fw-bold">{result.filename}</div>
+              <small className="text-muted">{result.snippet}</small>
+            </button>
+          ))}
+          {results.length === 0 && <div className="text-muted small">No matching resumes.</div>}
+          {pending > 0 && (
+            <div className="text-muted small mt-1">{pending} resume(s) are still being indexed.</div>
+          )}
+        </div>
+      )}
+    </div>
+  );
+};
+
+export default ResumeSearch;
@@ -1,6 +1,24 @@
 import { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 
+// Browsers don't always know the type of .doc/.docx files
+const CONTENT_TYPES: Record<string, string> = {
+  pdf: 'application/pdf',
+  doc: 'application/msword',
+  docx: 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+};
+
+const contentTypeFor = (file: File) =>
+  file.type || CONTENT_TYPES[file.name.split('.').pop()?.toLowerCase() || ''] || '';
+
+// Lets the API skip the upload when this exact file is already stored
+const sha256Hex = async (file: File) => {
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, '0'))
+    .join('');
+};
+
 const UploadResume = () => {
   const [file, setFile] = useState<File | null>(null);
   const [error, setError] = useState('');
@@ -26,18 +44,53 @@ const UploadResume = () => {
     setUploading(true);
 
     try {
+      // 1. Ask the API for a presigned POST
+      const initResponse = await fetch('/api/upload/init', {
+        method: 'POST',
+        credentials: 'include',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          filename: file.name,
+          content_type: contentTypeFor(file),
+          size: file.size,
+          sha256: await sha256Hex(file)
+        })
+      });
+      const upload = await initResponse.json();
+      if (!initResponse.ok) {
+        setError(upload.error || 'Upload failed');
+        return;
+      }
+      if (upload.duplicate) {
+        navigate('/dashboard');
+        return;
+      }
+
+      // 2. Send the file straight to S3; the file field must come last
       const formData = new FormData();
-      formData.append('resume', file);
+      Object.entries(upload.fields as Record<string, string>).forEach(([key, value]) => {
+        formData.append(key, value);
+      });
+      formData.append('file', file);
+      const s3Response = await fetch(upload.url, {
+        method: 'POST',
+        body: formData
+      });
+      if (!s3Response.ok) {
+        setError('Upload failed');
+        return;
+      }
 
-      const response = await fetch('/api/upload', {
+      // 3. Let the API verify and record it
+      const completeResponse = await fetch('/api/upload/complete', {
         method: 'POST',
         credentials: 'include',
-        body: formData,
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ upload_id: upload.upload_id })
       });
+      const data = await completeResponse.json();
 
-      const data = await response.json();
-
-      if (response.ok) {
+      if (completeResponse.ok) {
         navigate('/dashboard');
       } else {
         setError(data.error || 'Upload failed');
@@ -0,0 +1,69 @@
+export interface SyncEmailEvent {
+  message_id: string;
+  subject: string;
+  processed: number;
+  total: number;
+  result: 'new' | 'duplicate' | 'skipped' | 'error';
+  error: string | null;
+  classification: {
+    is_job_application: boolean;
+    is_job_alert: boolean;
+    confidence: number;
+    source: string;
+  };
+  application: {
+    id?: string;
+    company: string;
+    position: string;
+    status: string;
+    status_color: string;
+    application_date: string;
+    source: string;
+  } | null;
+}
+
+export interface SyncSummary {
+  total_processed: number;
+  new_added: number;
+  mode: string;
+  llm_calls_avoided: number;
+  source: string;
+}
+
+interface StreamHandlers {
+  onStart?: (start: { mode: string; total: number }) => void;
+  onEmail?: (email: SyncEmailEvent) => void;
+}
+
+// Runs a Gmail sync over Server-Sent Events, calling back as each email is
+// classified. Resolves with the final summary.
+export function streamGmailSync(handlers: StreamHandlers = {}, full = false): Promise<SyncSummary> {
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`/api/gmail/sync/stream${full ? '?full=1' : ''}`, {
+      withCredentials: true
+    });
+    let finished = false;
+
+    source.addEventListener('start', event => {
+      handlers.onStart?.(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('email', event => {
+      handlers.onEmail?.(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('summary', event => {
+      finished = true;
+      source.close();
+      resolve(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('error', event => {
+      if (finished) {
+        return;
+      }
+      finished = true;
+      source.close();
+      // Server-sent error events carry a message; connection errors don't
+      const data = (event as MessageEvent).data;
+      reject(new Error(data ? JSON.parse(data).error : 'Failed to sync with Gmail'));
+    });
+  });
+}
@@ -0,0 +1,185 @@
+"""Reusable Gmail API clients.
+
+``build('gmail', 'v1')`` reads and parses the discovery document and
+builds the resource tree on every call, and every sync used to do that.
+The bundled static discovery document is now parsed once per process and
+clients are built from it with ``build_from_document``.
+
+``GmailServicePool`` goes further and keeps built clients between syncs,
+keyed by user and credential (refresh token, client and scopes), so a
+reconnected mailbox never reuses the old client. A pooled client keeps its
+Credentials object, so an access token refreshed during one sync is reused
+by the next instead of being refreshed again, and it takes on a newer
+token from the store (see gmail_tokens) when there is one. Clients are
+checked out for the length of a sync because httplib2 connections aren't
+thread-safe, and a client is dropped when a sync using it fails, when its
+credentials can no longer refresh, or after GMAIL_SERVICE_IDLE_TTL seconds
+unused.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+GMAIL_SERVICE_POOL_SIZE = int(os.getenv('GMAIL_SERVICE_POOL_SIZE', '256'))
+GMAIL_SERVICE_IDLE_TTL = int(os.getenv('GMAIL_SERVICE_IDLE_TTL', '1800'))
+
+_discovery_document = None
+_discovery_lock = threading.Lock()
+
+
+def gmail_discovery_document():
+    """The bundled Gmail v1 discovery document, parsed once per process."""
+    global _discovery_document
+    if _discovery_document is None:
+        with _discovery_lock:
+            if _discovery_document is None:
+                _discovery_document = json.loads(get_static_doc('gmail', 'v1'))
+    return _discovery_document
+
+
+def credentials_from_dict(credentials_dict):
+    expiry = credentials_dict.get('expiry')
+    return Credentials(
+        token=credentials_dict['token'],
+        refresh_token=credentials_dict['refresh_token'],
+        token_uri=credentials_dict['token_uri'],
+        client_id=credentials_dict['client_id'],
+        client_secret=credentials_dict['client_secret'],
+        scopes=credentials_dict['scopes'],
+        # google-auth works in naive UTC
+        expiry=datetime.fromisoformat(expiry) if expiry else None
+    )
+
+
+def credentials_to_dict(credentials):
+    return {
+        'token': credentials.token,
+        'refresh_token': credentials.refresh_token,
+        'token_uri': credentials.token_uri,
+        'client_id': credentials.client_id,
+        'client_secret': credentials.client_secret,
+        'scopes': credentials.scopes,
+        'expiry': credentials.expiry.isoformat() if credentials.expiry else None
+    }
+
+
+def build_gmail_service(credentials):
+    """A Gmail v1 client for google-auth ``credentials``, without re-reading discovery."""
+    return build_from_document(gmail_discovery_document(), credentials=credentials)
+
+
+def credential_key(user_id, credentials_dict):
+    """Pool key for a user's credentials; changes when they reconnect Gmail."""
+    identity = json.dumps([
+        credentials_dict.get('refresh_token'),
+        credentials_dict.get('client_id'),
+        sorted(credentials_dict.get('scopes') or [])
+    ])
+    return str(user_id), hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def adopt_newer_token(credentials, credentials_dict):
+    """Switch pooled ``credentials`` to the stored token if it expires later."""
+    expiry = credentials_dict.get('expiry')
+    if not expiry or credentials_dict['token'] == credentials.token:
+        return
+    expiry = datetime.fromisoformat(expiry)
+    if credentials.expiry is None or expiry > credentials.expiry:
+        credentials.token = credentials_dict['token']
+        credentials.expiry = expiry
+
+
+class GmailServicePool:
+    def __init__(self, builder=build_gmail_service, max_entries=GMAIL_SERVICE_POOL_SIZE,
+                 idle_ttl=GMAIL_SERVICE_IDLE_TTL, clock=time.monotonic):
+        self.builder = builder
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        # key -> idle [(service, credentials, last_used)], least recently used key first
+        self._idle = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @contextmanager
+    def acquire(self, user_id, credentials_dict, on_refresh=None):
+        """Check out a Gmail client for these credentials for the ``with`` block.
+
+        ``on_refresh(credentials)`` is called afterwards if google-auth had
+        to refresh the access token while the client was in use.
+        """
+        key = credential_key(user_id, credentials_dict)
+        entry = self._checkout(key)
+        if entry is None:
+            credentials = credentials_from_dict(credentials_dict)
+            entry = (self.builder(credentials), credentials)
+        service, credentials = entry
+        adopt_newer_token(credentials, credentials_dict)
+        token = credentials.token
+
+        yield service
+        # Skipped when the sync raised: a client with a broken connection or
+        # revoked grant isn't handed to the next one
+        if on_refresh is not None and credentials.token != token:
+            on_refresh(credentials)
+        self._checkin(key, service, credentials)
+
+    def _checkout(self, key):
+        now = self._clock()
+        with self._lock:
+            entries = self._idle.get(key, [])
+            while entries:
+                service, credentials, last_used = entries.pop()
+                if now - last_used < self.idle_ttl and self._usable(credentials):
+                    self.hits += 1
+                    return service, credentials
+            self._idle.pop(key, None)
+            self.misses += 1
+            return None
+
+    def _checkin(self, key, service, credentials):
+        if not self._usable(credentials):
+            return
+        with self._lock:
+            self._idle.setdefault(key, []).append((service, credentials, self._clock()))
+            self._idle.move_to_end(key)
+            while sum(len(entries) for entries in self._idle.values()) > self.max_entries:
+                oldest = next(iter(self._idle))
+                self._idle[oldest].pop(0)
+                if not self._idle[oldest]:
+                    del self._idle[oldest]
+
+    @staticmethod
+    def _usable(credentials):
+        # Without a refresh token the client dies with its access token, whose
+        # expiry the stored credentials don't record
+        return bool(credentials.refresh_token)
+
+    def invalidate(self, user_id=None):
+        """Drop idle clients, for one user or all of them (e.g. on disconnect)."""
+        with self._lock:
+            if user_id is None:
+                self._idle.clear()
+                return
+            for key in [key for key in self._idle if key[0] == str(user_id)]:
+                del self._idle[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'idle': sum(len(entries) for entries in self._idle.values())
+            }
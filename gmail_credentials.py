@@ -0,0 +1,110 @@
+"""Encrypted per-user Gmail OAuth credentials.
+
+Credentials used to live in the Flask session, which tied them to one
+browser and kept refresh tokens on the web server's disk. They're now one
+document per user in ``gmail_credentials``, encrypted with Fernet, so
+background sync jobs can load them by user id.
+
+GMAIL_CREDENTIALS_KEY holds one or more comma-separated Fernet keys; the
+first encrypts and all of them decrypt, so keys can be rotated. Without it
+a key is derived from SECRET_KEY.
+
+The access token's expiry is also kept in clear as ``expires_at`` so the
+token refresher (gmail_tokens) can find tokens about to expire, along with
+``last_used_at`` and a short ``refresh_lease_until`` that keeps two
+processes from refreshing the same user's token at once.
+"""
+from datetime import datetime, timedelta
+import base64
+import hashlib
+import json
+import logging
+import os
+
+from bson.objectid import ObjectId
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+logger = logging.getLogger(__name__)
+
+
+def load_keys(secret_key=None):
+    """Fernet instances from GMAIL_CREDENTIALS_KEY, or one derived from ``secret_key``."""
+    configured = [key.strip() for key in os.getenv('GMAIL_CREDENTIALS_KEY', '').split(',') if key.strip()]
+    if configured:
+        return [Fernet(key) for key in configured]
+    if not secret_key:
+        raise ValueError('GMAIL_CREDENTIALS_KEY or SECRET_KEY must be set to store Gmail credentials')
+    logger.warning("GMAIL_CREDENTIALS_KEY not set, deriving the credentials key from SECRET_KEY")
+    return [Fernet(base64.urlsafe_b64encode(hashlib.sha256(secret_key.encode('utf-8')).digest()))]
+
+
+class GmailCredentialStore:
+    def __init__(self, collection, keys):
+        self.collection = collection
+        self.fernet = MultiFernet(keys)
+
+    def save(self, user_id, credentials):
+        """Encrypt and store a credentials dict (token, refresh_token, expiry, ...)."""
+        token = self.fernet.encrypt(json.dumps(credentials).encode('utf-8'))
+        expiry = credentials.get('expiry')
+        self.collection.update_one(
+            {'_id': ObjectId(user_id)},
+            {'$set': {
+                'credentials': token,
+                'expires_at': datetime.fromisoformat(expiry) if expiry else None,
+                'updated_at': datetime.utcnow()
+            }, '$unset': {'refresh_lease_until': ''}},
+            upsert=True
+        )
+
+    def load(self, user_id):
+        """Return the user's credentials dict, or None if there are none usable."""
+        doc = self.collection.find_one({'_id': ObjectId(user_id)})
+        if not doc:
+            return None
+        try:
+            return json.loads(self.fernet.decrypt(doc['credentials']))
+        except InvalidToken:
+            # Encrypted with a key that has since been removed
+            logger.warning("Could not decrypt Gmail credentials for user %s", user_id)
+            return None
+
+    def exists(self, user_id):
+        return self.collection.count_documents({'_id': ObjectId(user_id)}, limit=1) > 0
+
+    def delete(self, user_id):
+        self.collection.delete_one({'_id': ObjectId(user_id)})
+
+    def mark_used(self, user_id):
+        self.collection.update_one({'_id': ObjectId(user_id)}, {'$set': {'last_used_at': datetime.utcnow()}})
+
+    def claim_refresh(self, user_id, lease_seconds):
+        """Take the right to refresh a user's token for ``lease_seconds``; False if another holds it."""
+        now = datetime.utcnow()
+        claimed = self.collection.find_one_and_update(
+            {'_id': ObjectId(user_id), '$or': [
+                {'refresh_lease_until': {'$exists': False}},
+                {'refresh_lease_until': {'$lt': now}}
+            ]},
+            {'$set': {'refresh_lease_until': now + timedelta(seconds=lease_seconds)}}
+        )
+        return claimed is not None
+
+    def release_refresh(self, user_id):
+        self.collection.update_one({'_id': ObjectId(user_id)}, {'$unset': {'refresh_lease_until': ''}})
+
+    def due_for_refresh(self, expires_before, used_since):
+        """Ids of users with a token expiring before ``expires_before`` who used Gmail since ``used_since``."""
+        return [str(doc['_id']) for doc in self.collection.find(
+            {'expires_at': {'$lt': expires_before}, 'last_used_at': {'$gte': used_since}},
+            {'_id': 1}
+        )]
+
+    def rotate(self, user_id):
+        """Re-encrypt a user's credentials with the current primary key."""
+        doc = self.collection.find_one({'_id': ObjectId(user_id)})
+        if doc:
+            self.collection.update_one(
+                {'_id': doc['_id']},
+                {'$set': {'credentials': self.fernet.rotate(doc['credentials'])}}
+            )
@@ -0,0 +1,850 @@
+from google_auth_oauthlib.flow import Flow
+from googleapiclient.errors import HttpError
+from email.utils import parsedate_to_datetime
+import os
+import json
+import base64
+import logging
+import re
+import threading
+from classification_pipeline import OPENAI_MAX_WORKERS, call_with_backoff, estimate_tokens, ordered_map
+from email_heuristics import pre_classify
+from gmail_client_pool import build_gmail_service, credentials_from_dict
+from instrumentation import SYNC_MESSAGES, SYNC_STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Gmail caps a batch at 100 calls; Google recommends staying at or below 50
+# to avoid per-user rate limiting.
+GMAIL_BATCH_SIZE = int(os.getenv('GMAIL_BATCH_SIZE', '50'))
+GMAIL_MAX_BATCH_SIZE = 100
+
+# Series for each sync stage, looked up once rather than per message
+GMAIL_PROFILE_SECONDS = SYNC_STAGE_SECONDS.labels(stage='gmail_profile')
+GMAIL_HISTORY_SECONDS = SYNC_STAGE_SECONDS.labels(stage='gmail_history')
+GMAIL_LIST_SECONDS = SYNC_STAGE_SECONDS.labels(stage='gmail_list')
+GMAIL_GET_SECONDS = SYNC_STAGE_SECONDS.labels(stage='gmail_get')
+DECODE_SECONDS = SYNC_STAGE_SECONDS.labels(stage='decode')
+OPENAI_SECONDS = SYNC_STAGE_SECONDS.labels(stage='openai')
+MESSAGES_ACCEPTED = SYNC_MESSAGES.labels(outcome='application')
+MESSAGES_SKIPPED = SYNC_MESSAGES.labels(outcome='skipped')
+MESSAGES_FILTERED = SYNC_MESSAGES.labels(outcome='filtered')
+MESSAGES_FAILED = SYNC_MESSAGES.labels(outcome='error')
+
+# Subject words that make an email worth classifying. The same lists build
+# the Gmail search query for full scans and the local filter applied to
+# messages picked up from history during incremental syncs.
+SYNC_SUBJECT_KEYWORDS = ['job', 'application', 'position', 'career', 'opportunity', 'applied', 'thank you']
+SYNC_SUBJECT_EXCLUDES = ['newsletter', 'digest', 'weekly']
+SYNC_QUERY = "subject:({}) -subject:({})".format(
+    ' OR '.join(SYNC_SUBJECT_KEYWORDS),
+    ' OR '.join(SYNC_SUBJECT_EXCLUDES)
+)
+
+# Allowance for the JSON answer when estimating tokens per request
+ANALYSIS_MAX_TOKENS = 150
+
+ANALYSIS_PROMPT = """
+            You are an assistant that analyzes emails to determine if they are job application confirmations or receipts.
+            
+            Be very strict in your analysis - only identify an email as a job application if:
+            1. It explicitly confirms a job application was submitted
+            2. It's sent directly from a company or its recruiting system (not a job board unless it confirms a specific application)
+            3. It's about a specific job the user has actually applied to
+            
+            DO NOT classify these as job applications:
+            - Credit card applications or financial services
+            - Job alerts or notifications about new job postings
+            - General newsletters from job boards
+            - Marketing emails from companies
+            - Emails that just mention jobs but don't confirm an actual application
+            
+            For status, determine one of:
+            - "Applied" (default for confirmations)
+            - "Rejected" (if it contains rejection language)
+            - "Interview" (if it's scheduling/requesting an interview)
+            - "Offer" (if it's extending a job offer)
+            
+            Extract the following information:
+            1. Is this a job application confirmation or receipt? (yes/no)
+            2. If yes, what's the company name? (be specific and accurate)
+            3. What position/role was applied for?
+            4. What's the application status? (Applied, Rejected, Interview, Offer)
+            5. Is this an automated job alert rather than an actual application? (yes/no)
+            
+            Return your analysis in JSON format:
+            {
+                "is_job_application": true/false,
+                "is_job_alert": true/false,
+                "company_name": "Company Name",
+                "position": "Position Title",
+                "status": "Status",
+                "confidence": 0-100
+            }
+            
+            Be especially careful about credit card applications and other financial services - these are NOT job applications.
+            """
+
+# Batch mode sends the same instructions once for several emails and asks
+# for one result object per email, tagged with the email's index.
+BATCH_ANALYSIS_PROMPT = ANALYSIS_PROMPT + """
+            You will be given several emails, each starting with a line "=== Email <index> ===".
+            Analyze every email independently, exactly as described above.
+            Return a JSON array with one object per email, each with an "index" field set to the email's index
+            plus the fields above, for example:
+            [
+                {"index": 0, "is_job_application": true, "is_job_alert": false, "company_name": "Company Name", "position": "Position Title", "status": "Applied", "confidence": 90},
+                {"index": 1, "is_job_application": false, "is_job_alert": true, "company_name": null, "position": null, "status": null, "confidence": 95}
+            ]
+            Return only the JSON array.
+            """
+
+OPENAI_BATCH_SIZE = int(os.getenv('OPENAI_BATCH_SIZE', '10'))
+OPENAI_BATCH_TOKEN_BUDGET = int(os.getenv('OPENAI_BATCH_TOKEN_BUDGET', '6000'))
+
+# Decide clear-cut emails locally before asking OpenAI
+USE_HEURISTICS = os.getenv('HEURISTIC_PRECLASSIFIER', '1') == '1'
+
+# Labels on messages that were never received by the user
+SKIPPED_HISTORY_LABELS = {'SENT', 'DRAFT', 'SPAM', 'TRASH'}
+
+# Gmail answers that won't change on retry: the id is malformed or the
+# message was deleted between listing and fetching it
+PERMANENT_FETCH_STATUSES = {400, 404, 410}
+
+
+def is_permanent_fetch_error(error):
+    """Whether retrying a failed message fetch can't succeed."""
+    return isinstance(error, HttpError) and error.resp.status in PERMANENT_FETCH_STATUSES
+
+
+class InvalidAnalysisError(ValueError):
+    """OpenAI answered with something that isn't a usable classification."""
+
+
+class HistoryExpiredError(Exception):
+    """The stored historyId is too old for Gmail to return changes since it."""
+
+
+class GmailService:
+    def __init__(self, openai_client=None, batch_size=GMAIL_BATCH_SIZE, classification_cache=None,
+                 rate_limiter=None, max_workers=OPENAI_MAX_WORKERS,
+                 classification_batch_size=OPENAI_BATCH_SIZE, classification_token_budget=OPENAI_BATCH_TOKEN_BUDGET,
+                 use_heuristics=USE_HEURISTICS):
+        self.service = None
+        self.openai_client = openai_client
+        self.classification_cache = classification_cache
+        self.rate_limiter = rate_limiter
+        self.max_workers = max_workers
+        self.classification_batch_size = max(1, classification_batch_size)
+        self.classification_token_budget = classification_token_budget
+        self.use_heuristics = use_heuristics
+        # Emails the local pre-classifier decided without OpenAI
+        self.llm_calls_avoided = 0
+        self._stats_lock = threading.Lock()
+        self.batch_size = max(1, min(batch_size, GMAIL_MAX_BATCH_SIZE))
+        # Filled in by fetch_job_application_emails for the caller to persist
+        self.sync_mode = None
+        self.history_id = None
+        self.seen_message_ids = []
+        self.messages_handled = 0
+
+    def get_auth_url(self):
+        """Get the authorization URL for Gmail OAuth2."""
+        flow = Flow.from_client_secrets_file(
+            os.getenv('GOOGLE_CLIENT_SECRET_FILE'),
+            scopes=['https://www.googleapis.com/auth/gmail.readonly'],
+            redirect_uri=os.getenv('GOOGLE_OAUTH_REDIRECT_URI')
+        )
+        authorization_url, _ = flow.authorization_url(
+            access_type='offline',
+            include_granted_scopes='true'
+        )
+        return authorization_url
+
+    def get_credentials(self, auth_code):
+        """Get credentials from authorization code."""
+        flow = Flow.from_client_secrets_file(
+            os.getenv('GOOGLE_CLIENT_SECRET_FILE'),
+            scopes=['https://www.googleapis.com/auth/gmail.readonly'],
+            redirect_uri=os.getenv('GOOGLE_OAUTH_REDIRECT_URI')
+        )
+        flow.fetch_token(code=auth_code)
+        return flow.credentials
+
+    def initialize_service(self, credentials_dict):
+        """Initialize Gmail service with credentials."""
+        self.service = build_gmail_service(credentials_from_dict(credentials_dict))
+
+    def _extract_company_name(self, subject, body, from_header):
+        """Extract company name from email subject, body, and from header."""
+        # First try to extract from the From header as it's usually most reliable
+        from_name = self._extract_company_from_email(from_header)
+        if from_name and len(from_name) > 2:  # Ensure it's not just a short abbreviation
+            return from_name
+
+        # Common patterns for company names in application emails
+        patterns = [
+            r"(?:application|applied) (?:at|to|with) ([A-Za-z0-9][A-Za-z0-9\s&.-]{2,40}?)(?:[\.,]|\s+(?:for|position|team|careers|jobs))",
+            r"thank you for (?:your interest|applying) (?:at|to|with) ([A-Za-z0-9][A-Za-z0-9\s&.-]{2,40}?)(?:[\.,]|\s+(?:for|position|team))",
+            r"welcome to ([A-Za-z0-9][A-Za-z0-9\s&.-]{2,40}?)(?:[\.,]|\s+(?:careers|team))",
+            r"from ([A-Za-z0-9][A-Za-z0-9\s&.-]{2,40}?) (?:team|recruiting|careers|hiring)",
+            r"([A-Za-z0-9][A-Za-z0-9\s&.-]{2,40}?) (?:team|careers) would like",
+            r"([A-Za-z0-9][A-Za-z0-9\s&.-]{2,40}?) application (?:portal|status|received)"
+        ]
+
+        # Try subject first as it's usually more structured
+        for pattern in patterns:
+            match = re.search(pattern, subject, re.IGNORECASE)
+            if match:
+                company = match.group(1).strip()
+                if self._is_valid_company_name(company):
+                    return company
+
+        # Then try body
+        for pattern in patterns:
+            match = re.search(pattern, body, re.IGNORECASE)
+            if match:
+                company = match.group(1).strip()
+                if self._is_valid_company_name(company):
+                    return company
+
+        return None
+
+    def _is_valid_company_name(self, name):
+        """Validate extracted company name."""
+        if not name:
+            return False
+            
+        # List of common words that shouldn't be company names
+        invalid_names = {
+            'team', 'career', 'careers', 'job', 'jobs', 'position', 'application',
+            'portal', 'status', 'update', 'mail', 'email', 'notification', 'alert',
+            'center', 'global', 'local', 'international', 'worldwide', 'recruiting',
+            'talent', 'hr', 'human resources', 'apply', 'applied', 'applying'
+        }
+        
+        # Check if the name is just a common word
+        if name.lower() in invalid_names:
+            return False
+            
+        # Check length and character requirements
+        if len(name) < 2 or len(name) > 40:
+            return False
+            
+        # Must contain at least one letter
+        if not any(c.isalpha() for c in name):
+            return False
+            
+        return True
+
+    def _extract_position(self, subject, body):
+        """Extract position from email subject and body."""
+        # Common patterns for job positions
+        patterns = [
+            r"(?:position|role|job)(?: for)?:?\s*([A-Za-z0-9][A-Za-z0-9\s\-&.]{2,50}?)(?:[\.,]|\s+(?:at|with|position|role|job|team))",
+            r"applying for(?: the)? ([A-Za-z0-9][A-Za-z0-9\s\-&.]{2,50}?)(?:[\.,]|\s+(?:at|with|position|role|job|team))",
+            r"application for(?: the)? ([A-Za-z0-9][A-Za-z0-9\s\-&.]{2,50}?)(?:[\.,]|\s+(?:at|with|position|role|job|team))",
+            r"interested in(?: the)? ([A-Za-z0-9][A-Za-z0-9\s\-&.]{2,50}?)(?:[\.,]|\s+(?:at|with|position|role|job|team))",
+            r"regarding the ([A-Za-z0-9][A-Za-z0-9\s\-&.]{2,50}?)(?:[\.,]|\s+(?:at|with|position|role|job|team))"
+        ]
+
+        # Try subject first
+        for pattern in patterns:
+            match = re.search(pattern, subject, re.IGNORECASE)
+            if match:
+                position = match.group(1).strip()
+                if self._is_valid_position(position):
+                    return position
+
+        # Then try body
+        for pattern in patterns:
+            match = re.search(pattern, body, re.IGNORECASE)
+            if match:
+                position = match.group(1).strip()
+                if self._is_valid_position(position):
+                    return position
+
+        return None
+
+    def _is_valid_position(self, position):
+        """Validate extracted position."""
+        if not position:
+            return False
+            
+        # List of common words that shouldn't be positions by themselves
+        invalid_positions = {
+            'job', 'position', 'role', 'opportunity', 'application', 'career',
+            'team', 'work', 'employment', 'opening', 'vacancy', 'apply', 'applied',
+            'new', 'current', 'future', 'available'
+        }
+        
+        # Check if the position is just a common word
+        if position.lower() in invalid_positions:
+            return False
+            
+        # Check length requirements
+        if len(position) < 3 or len(position) > 50:
+            return False
+            
+        # Must contain at least one letter
+        if not any(c.isalpha() for c in position):
+            return False
+            
+        return True
+
+    def analyze_email_with_openai(self, subject, body, from_header):
+        """Use OpenAI to analyze an email and determine if it's a job application."""
+        if not self.openai_client:
+            raise Exception("OpenAI client not configured")
+        
+        # Prepare the prompt
+        email_content = self._email_content(subject, body, from_header)
+        
+        prompt = {"role": "system", "content": ANALYSIS_PROMPT}
+        
+        def create():
+            # Every attempt, retries included, counts against the rate limits
+            if self.rate_limiter:
+                self.rate_limiter.acquire(estimate_tokens(prompt['content'], email_content) + ANALYSIS_MAX_TOKENS)
+            return self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    prompt,
+                    {"role": "user", "content": email_content}
+                ],
+                temperature=0.1  # Low temperature for more deterministic results
+            )
+
+        try:
+            with OPENAI_SECONDS.time():
+                response = call_with_backoff(create)
+        except Exception as e:
+            logger.error("Error calling OpenAI API: %s", e)
+            raise
+
+        result_text = response.choices[0].message.content
+        
+        # Try to parse the JSON response
+        try:
+            # Find JSON in the response (in case there's additional text)
+            json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
+            if json_match:
+                result_json = json.loads(json_match.group(0))
+            else:
+                result_json = json.loads(result_text)
+        except (json.JSONDecodeError, TypeError):
+            result_json = None
+
+        # Not an answer: raise so the email is retried next sync instead of
+        # being cached as a made-up "not a job application"
+        if not self._is_valid_analysis(result_json):
+            logger.warning("Failed to parse OpenAI response as JSON: %s", result_text)
+            raise InvalidAnalysisError("OpenAI response is not a valid classification")
+        return result_json
+
+    def _email_content(self, subject, body, from_header):
+        return f"Subject: {subject}\nFrom: {from_header}\n\nBody:\n{body[:1500]}..."  # Limit to avoid token limits
+
+    def analyze_emails_with_openai_batch(self, emails):
+        """Classify several emails with one OpenAI request.
+
+        ``emails`` are parsed emails (``subject``, ``from``, ``body``).
+        Returns a list aligned with ``emails``; an entry is None when the
+        response had no usable result for that email, so the caller can fall
+        back to a single-email request for it.
+        """
+        if not self.openai_client:
+            raise Exception("OpenAI client not configured")
+
+        email_content = "\n\n".join(
+            f"=== Email {index} ===\n" + self._email_content(email['subject'], email['body'], email['from'])
+            for index, email in enumerate(emails)
+        )
+
+        def create():
+            if self.rate_limiter:
+                self.rate_limiter.acquire(
+                    estimate_tokens(BATCH_ANALYSIS_PROMPT, email_content) + ANALYSIS_MAX_TOKENS * len(emails)
+                )
+            return self.openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": BATCH_ANALYSIS_PROMPT},
+                    {"role": "user", "content": email_content}
+                ],
+                temperature=0.1
+            )
+
+        try:
+            with OPENAI_SECONDS.time():
+                response = call_with_backoff(create)
+        except Exception as e:
+            logger.error("Error calling OpenAI API: %s", e)
+            raise
+
+        result_text = response.choices[0].message.content
+        results = [None] * len(emails)
+        try:
+            json_match = re.search(r'\[.*\]', result_text, re.DOTALL)
+            parsed = json.loads(json_match.group(0) if json_match else result_text)
+        except (json.JSONDecodeError, TypeError):
+            logger.warning("Failed to parse OpenAI batch response as JSON: %s", result_text)
+            return results
+
+        if not isinstance(parsed, list):
+            return results
+        for item in parsed:
+            if not self._is_valid_analysis(item):
+                continue
+            index = item.get('index')
+            if isinstance(index, int) and 0 <= index < len(emails) and results[index] is None:
+                analysis = dict(item)
+                del analysis['index']
+                results[index] = analysis
+        return results
+
+    def _is_valid_analysis(self, analysis):
+        """Check a result has the fields the sync decides on, with usable types."""
+        return (
+            isinstance(analysis, dict) and
+            isinstance(analysis.get('is_job_application'), bool) and
+            isinstance(analysis.get('is_job_alert'), bool) and
+            isinstance(analysis.get('confidence'), (int, float)) and
+            not isinstance(analysis.get('confidence'), bool)
+        )
+
+    def classify_emails(self, emails):
+        """Classify a group of parsed emails, batching the cache misses into one request.
+
+        Clear-cut emails are decided by the local pre-classifier first.
+        Returns ``(analysis, error)`` per email, in order. Emails the batch
+        response doesn't cover are retried one at a time.
+        """
+        cache = self.classification_cache
+        results = [None] * len(emails)
+        misses = []
+        for i, email in enumerate(emails):
+            if self.use_heuristics:
+                local = pre_classify(self, email)
+                if local is not None:
+                    with self._stats_lock:
+                        self.llm_calls_avoided += 1
+                    results[i] = (local, None)
+                    continue
+
+            cached = None
+            if cache is not None:
+                cached = cache.get(email['subject'], email['from'], email['body'])
+            if cached is not None:
+                results[i] = (cached, None)
+            else:
+                misses.append(i)
+
+        if len(misses) > 1:
+            try:
+                analyses = self.analyze_emails_with_openai_batch([emails[i] for i in misses])
+            except Exception as e:
+                for i in misses:
+                    results[i] = (None, e)
+                return results
+            for i, analysis in zip(misses, analyses):
+                if analysis is not None:
+                    results[i] = (analysis, None)
+
+        for i in misses:
+            email = emails[i]
+            if results[i] is None:
+                try:
+                    results[i] = (self.analyze_email_with_openai(email['subject'], email['body'], email['from']), None)
+                except Exception as e:
+                    results[i] = (None, e)
+                    continue
+            if cache is not None and self._is_valid_analysis(results[i][0]):
+                cache.put(email['subject'], email['from'], email['body'], results[i][0])
+        return results
+
+    def _iter_classification_groups(self, candidates):
+        """Group emails for batch classification by count and estimated prompt tokens."""
+        group = []
+        tokens = estimate_tokens(BATCH_ANALYSIS_PROMPT)
+        for email in candidates:
+            email_tokens = estimate_tokens(self._email_content(email['subject'], email['body'], email['from']))
+            if group and (len(group) >= self.classification_batch_size or
+                          tokens + email_tokens > self.classification_token_budget):
+                yield group
+                group = []
+                tokens = estimate_tokens(BATCH_ANALYSIS_PROMPT)
+            group.append(email)
+            tokens += email_tokens
+        if group:
+            yield group
+
+    def _iter_classified(self, candidates):
+        """Yield ``(email, analysis, error)`` in input order, classifying groups concurrently."""
+        groups = self._iter_classification_groups(candidates)
+        for group, results, error in ordered_map(self.classify_emails, groups, self.max_workers):
+            for email, (analysis, email_error) in zip(group, results or [(None, error)] * len(group)):
+                yield email, analysis, email_error
+
+    def _iter_candidate_emails(self, message_ids, failed_ids):
+        """Fetch and parse messages, yielding the ones worth classifying.
+
+        Ids whose fetch failed transiently (5xx, rate limits, network) are
+        appended to ``failed_ids`` so the checkpoint waits for them.
+        Deleted messages and ones that can't be parsed never will succeed,
+        so they are skipped as seen.
+        """
+        for message_id, msg, error in self.iter_messages(message_ids):
+            if error is not None:
+                logger.warning("Error fetching message %s: %s", message_id, error, extra={'message_id': message_id})
+                if not is_permanent_fetch_error(error):
+                    failed_ids.append(message_id)
+                self.messages_handled += 1
+                MESSAGES_FAILED.inc()
+                continue
+
+            try:
+                # Extract email data
+                with DECODE_SECONDS.time():
+                    email = self._parse_message(msg)
+            except Exception as e:
+                # The same message fails the same way next time
+                logger.warning("Error processing message %s: %s", message_id, e, extra={'message_id': message_id})
+                self.messages_handled += 1
+                MESSAGES_FAILED.inc()
+                continue
+            email['message_id'] = message_id
+            subject = email['subject']
+
+            if self.sync_mode == 'incremental' and not self._matches_sync_query(subject):
+                self.messages_handled += 1
+                MESSAGES_FILTERED.inc()
+                continue
+
+            yield email
+
+    def get_history_id(self):
+        """Return the mailbox's current historyId."""
+        with GMAIL_PROFILE_SECONDS.time():
+            profile = self.service.users().getProfile(userId='me').execute()
+        return profile['historyId']
+
+    def list_added_message_ids(self, start_history_id):
+        """List ids of messages added to the mailbox since ``start_history_id``, oldest first.
+
+        Every page of history is read. Raises HistoryExpiredError when Gmail no longer has history that far
+        back, in which case the caller has to fall back to a full scan.
+        """
+        message_ids = []
+        page_token = None
+        while True:
+            try:
+                with GMAIL_HISTORY_SECONDS.time():
+                    response = self.service.users().history().list(
+                        userId='me',
+                        startHistoryId=start_history_id,
+                        historyTypes=['messageAdded'],
+                        pageToken=page_token
+                    ).execute()
+            except HttpError as e:
+                if e.resp.status == 404:
+                    raise HistoryExpiredError(f"History {start_history_id} has expired")
+                raise
+
+            for record in response.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message = added['message']
+                    if SKIPPED_HISTORY_LABELS.intersection(message.get('labelIds', [])):
+                        continue
+                    if message['id'] not in message_ids:
+                        message_ids.append(message['id'])
+
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
+        return message_ids
+
+    def _matches_sync_query(self, subject):
+        """Local equivalent of SYNC_QUERY for messages found through history."""
+        subject = subject.lower()
+        if any(re.search(r'\b' + re.escape(word) + r'\b', subject) for word in SYNC_SUBJECT_EXCLUDES):
+            return False
+        return any(re.search(r'\b' + re.escape(word) + r'\b', subject) for word in SYNC_SUBJECT_KEYWORDS)
+
+    def fetch_job_application_emails(self, max_results=100, checkpoint=None, on_progress=None):
+        """Fetch and parse job application confirmation emails using AI.
+
+        With a ``checkpoint`` (the stored ``history_id`` and
+        ``message_ids`` from the previous sync) only messages added since
+        then are fetched; without one, or once it has expired, the inbox is
+        rescanned with SYNC_QUERY. Afterwards ``sync_mode``, ``history_id``
+        and ``seen_message_ids`` describe the new checkpoint.
+
+        ``on_progress(processed, total, found)`` is called as messages are
+        handled, for callers that report progress while the sync runs.
+        """
+        applications = []
+        for event in self.iter_sync_events(max_results, checkpoint):
+            if event['type'] == 'email' and event['application']:
+                applications.append(event['application'])
+            if on_progress:
+                on_progress(event['processed'], event['total'], len(applications))
+        return applications
+
+    def iter_sync_events(self, max_results=100, checkpoint=None):
+        """Run a sync, yielding an event as each message is classified.
+
+        Yields a ``start`` event once the messages to look at are known, an
+        ``email`` event per classified message (with its ``application``
+        when it was accepted, else None) and a ``done`` event once the
+        checkpoint attributes are final. Only the messages currently being
+        fetched or classified are held in memory.
+        """
+        if not self.service:
+            raise Exception("Gmail service not initialized")
+
+        try:
+            # Read the historyId before listing so anything that arrives
+            # while we sync is picked up next time
+            self.history_id = self.get_history_id()
+            message_ids = None
+            truncated = False
+
+            if checkpoint and checkpoint.get('history_id'):
+                try:
+                    seen = set(checkpoint.get('message_ids', []))
+                    message_ids = [
+                        message_id
+                        for message_id in self.list_added_message_ids(checkpoint['history_id'])
+                        if message_id not in seen
+                    ]
+                    # Keep the newest to match the full scan; the rest are
+                    # picked up by the next sync (see below)
+                    truncated = len(message_ids) > max_results
+                    message_ids = message_ids[-max_results:]
+                    self.sync_mode = 'incremental'
+                except HistoryExpiredError as e:
+                    logger.info("%s, falling back to a full scan", e)
+
+            if message_ids is None:
+                with GMAIL_LIST_SECONDS.time():
+                    results = self.service.users().messages().list(
+                        userId='me',
+                        q=SYNC_QUERY,
+                        maxResults=max_results
+                    ).execute()
+                message_ids = [message['id'] for message in results.get('messages', [])]
+                self.sync_mode = 'full'
+
+            total = len(message_ids)
+            self.seen_message_ids = list(message_ids)
+            self.messages_handled = 0
+            yield {'type': 'start', 'mode': self.sync_mode, 'processed': 0, 'total': total}
+            if not message_ids:
+                logger.info("No new messages found matching the query")
+                yield {'type': 'done', 'mode': self.sync_mode, 'processed': 0, 'total': 0, 'found': 0}
+                return
+
+            logger.info("Found %d potential job-related emails (%s sync)", total, self.sync_mode,
+                        extra={'sync_mode': self.sync_mode, 'total': total})
+            processed_count = 0
+            job_app_count = 0
+
+            failed_ids = []
+            candidates = self._iter_candidate_emails(message_ids, failed_ids)
+            for email, analysis, error in self._iter_classified(candidates):
+                message_id = email['message_id']
+                self.messages_handled += 1
+                event = {
+                    'type': 'email',
+                    'message_id': message_id,
+                    'subject': email['subject'],
+                    'processed': self.messages_handled,
+                    'total': total,
+                    'analysis': analysis,
+                    'application': None,
+                    'error': None
+                }
+                if error is not None:
+                    logger.warning("Error processing message %s: %s", message_id, error, extra={'message_id': message_id})
+                    failed_ids.append(message_id)
+                    event['error'] = str(error)
+                    MESSAGES_FAILED.inc()
+                    yield event
+                    continue
+
+                try:
+                    processed_count += 1
+                    
+                    # Only add if OpenAI determined it's a job application with high confidence
+                    # and not just an alert, and ensure it has a minimum confidence level
+                    if (analysis.get('is_job_application', False) and 
+                        not analysis.get('is_job_alert', True) and 
+                        analysis.get('confidence', 0) > 70):
+                        
+                        job_app_count += 1
+                        company_name = analysis.get('company_name', 'Unknown Company')
+                        position = analysis.get('position', 'Unknown Position')
+                        status = analysis.get('status', 'Applied')
+                        
+                        # Generate a status color for display
+                        status_color = 'primary'  # Default blue
+                        if status.lower() == 'rejected':
+                            status_color = 'danger'  # Red
+                        elif status.lower() == 'interview':
+                            status_color = 'success'  # Green
+                        elif status.lower() == 'offer':
+                            status_color = 'warning'  # Yellow/Orange
+                        
+                        event['application'] = {
+                            'company': company_name,
+                            'position': position,
+                            'application_date': parsedate_to_datetime(email['date']).isoformat(),
+                            'status': status,
+                            'status_color': status_color,
+                            'source': 'Gmail (AI Analysis)',
+                            'email_id': message_id,
+                            'confidence': analysis.get('confidence', 50)
+                        }
+                        
+                        logger.debug("AI detected job application", extra={
+                            'sample': True, 'message_id': message_id, 'company': company_name,
+                            'position': position, 'status': status
+                        })
+                    else:
+                        logger.debug("Skipping email that isn't a job application", extra={
+                            'sample': True, 'message_id': message_id,
+                            'confidence': analysis.get('confidence', 0), 'source': analysis.get('source', 'openai')
+                        })
+
+                except Exception as e:
+                    # e.g. an unparseable Date header: retrying won't help,
+                    # so the message doesn't hold the checkpoint back
+                    logger.warning("Error processing message %s: %s", message_id, e, extra={'message_id': message_id})
+                    event['application'] = None
+                    event['error'] = str(e)
+
+                if event['error']:
+                    MESSAGES_FAILED.inc()
+                elif event['application']:
+                    MESSAGES_ACCEPTED.inc()
+                else:
+                    MESSAGES_SKIPPED.inc()
+                yield event
+
+            if failed_ids:
+                # Don't move the checkpoint past messages that failed for a
+                # reason that may clear up (Gmail 5xx/429, network, OpenAI):
+                # an incremental sync replays the same history window (seen
+                # ids are skipped), a failed full scan forces another one.
+                self.seen_message_ids = [i for i in message_ids if i not in failed_ids]
+                self.history_id = checkpoint['history_id'] if self.sync_mode == 'incremental' else None
+            elif truncated:
+                # More was added than one sync looks at: replay the same
+                # history next time, skipping the ids handled now
+                self.history_id = checkpoint['history_id']
+
+            self.messages_handled = total
+            logger.info("Processed %d emails, found %d job applications", processed_count, job_app_count,
+                        extra={'processed': processed_count, 'found': job_app_count, 'failed': len(failed_ids)})
+            yield {'type': 'done', 'mode': self.sync_mode, 'processed': total, 'total': total, 'found': job_app_count}
+
+        except Exception as e:
+            logger.error("Error fetching emails: %s", e)
+            raise
+
+    def iter_message_batches(self, message_ids, batch_size=None):
+        """Fetch full messages through Gmail batch requests.
+
+        Yields one list of ``(message_id, message, error)`` tuples per batch,
+        in the order the ids were given, as soon as that batch completes. A
+        failure on one message is reported in its tuple and does not abort
+        the rest of the batch.
+        """
+        if not self.service:
+            raise Exception("Gmail service not initialized")
+
+        batch_size = max(1, min(batch_size or self.batch_size, GMAIL_MAX_BATCH_SIZE))
+        for start in range(0, len(message_ids), batch_size):
+            chunk = message_ids[start:start + batch_size]
+            responses = {}
+
+            def callback(request_id, response, exception):
+                responses[request_id] = (response, exception)
+
+            batch = self.service.new_batch_http_request(callback=callback)
+            for message_id in chunk:
+                batch.add(
+                    self.service.users().messages().get(
+                        userId='me',
+                        id=message_id,
+                        format='full'
+                    ),
+                    request_id=message_id
+                )
+
+            try:
+                with GMAIL_GET_SECONDS.time():
+                    batch.execute()
+            except Exception as e:
+                # The whole batch request failed (network, auth); report it
+                # against every message that didn't get a response.
+                logger.warning("Error executing Gmail batch: %s", e)
+                for message_id in chunk:
+                    responses.setdefault(message_id, (None, e))
+
+            results = []
+            for message_id in chunk:
+                response, exception = responses.get(
+                    message_id, (None, Exception("No response in batch"))
+                )
+                results.append((message_id, response, exception))
+            yield results
+
+    def iter_messages(self, message_ids, batch_size=None):
+        """Yield ``(message_id, message, error)`` for each id, fetched in batches."""
+        for results in self.iter_message_batches(message_ids, batch_size):
+            for result in results:
+                yield result
+
+    def _parse_message(self, msg):
+        """Pull the headers and body we classify on out of a full Gmail message."""
+        headers = msg['payload']['headers']
+        return {
+            'subject': next((h['value'] for h in headers if h['name'].lower() == 'subject'), ''),
+            'date': next((h['value'] for h in headers if h['name'].lower() == 'date'), ''),
+            'from': next((h['value'] for h in headers if h['name'].lower() == 'from'), ''),
+            'list_unsubscribe': next((h['value'] for h in headers if h['name'].lower() == 'list-unsubscribe'), ''),
+            'precedence': next((h['value'] for h in headers if h['name'].lower() == 'precedence'), ''),
+            'body': self._get_email_body(msg['payload'])
+        }
+
+    def _get_email_body(self, payload):
+        """Extract email body from payload."""
+        # Bodies in other charsets (latin-1, windows-1252) still classify
+        # fine with the odd replacement character
+        if 'body' in payload and payload['body'].get('data'):
+            return base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='replace')
+        
+        if 'parts' in payload:
+            for part in payload['parts']:
+                if part['mimeType'] == 'text/plain' and part['body'].get('data'):
+                    return base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='replace')
+                elif part['mimeType'] == 'text/html' and part['body'].get('data'):
+                    return base64.urlsafe_b64decode(part['body']['data']).decode('utf-8', errors='replace')
+        
+        return ""
+
+    def _extract_company_from_email(self, from_header):
+        """Extract company name from email address."""
+        # Try to extract company name from email domain
+        email_match = re.search(r'@([^.]+)', from_header.lower())
+        if email_match:
+            domain = email_match.group(1)
+            # Exclude common email providers
+            common_domains = {'gmail', 'yahoo', 'hotmail', 'outlook', 'aol', 'icloud'}
+            if domain not in common_domains:
+                return domain.title()
+        return None
@@ -0,0 +1,149 @@
+"""Gmail access tokens refreshed ahead of expiry and written back.
+
+Syncs used to rebuild Credentials from the stored dict, so once the stored
+access token had expired every sync paid a refresh round trip, and the new
+token was thrown away afterwards. ``GmailTokenManager.get`` hands out
+credentials whose token is good for at least GMAIL_TOKEN_REFRESH_MARGIN
+seconds, refreshing and saving it (with its expiry) first when it isn't.
+
+Only one refresh per user is in flight: a per-user lock serializes threads
+in this process, and a lease on the stored credentials (see
+gmail_credentials) keeps other processes out. A background thread renews
+tokens that are about to expire for users who synced within
+GMAIL_TOKEN_ACTIVE_WINDOW, so their next sync doesn't wait on Google.
+"""
+from datetime import datetime, timedelta
+import os
+import logging
+import threading
+import time
+import weakref
+
+from google.auth.transport.requests import Request
+
+from gmail_client_pool import credentials_from_dict, credentials_to_dict
+
+logger = logging.getLogger(__name__)
+
+GMAIL_TOKEN_REFRESH_MARGIN = int(os.getenv('GMAIL_TOKEN_REFRESH_MARGIN', '300'))
+GMAIL_TOKEN_REFRESH_INTERVAL = int(os.getenv('GMAIL_TOKEN_REFRESH_INTERVAL', '60'))
+GMAIL_TOKEN_ACTIVE_WINDOW = int(os.getenv('GMAIL_TOKEN_ACTIVE_WINDOW', str(24 * 3600)))
+# How long a process may hold the right to refresh one user's token
+GMAIL_TOKEN_REFRESH_LEASE = 30
+
+
+def refresh_credentials(credentials_dict):
+    """Ask Google for a new access token; returns the updated credentials dict."""
+    credentials = credentials_from_dict(credentials_dict)
+    credentials.refresh(Request())
+    return dict(credentials_dict, **credentials_to_dict(credentials))
+
+
+class GmailTokenManager:
+    def __init__(self, store, refresher=refresh_credentials, margin=GMAIL_TOKEN_REFRESH_MARGIN,
+                 interval=GMAIL_TOKEN_REFRESH_INTERVAL, active_window=GMAIL_TOKEN_ACTIVE_WINDOW,
+                 lease=GMAIL_TOKEN_REFRESH_LEASE, clock=datetime.utcnow, sleep=time.sleep):
+        self.store = store
+        self.refresher = refresher
+        self.margin = timedelta(seconds=margin)
+        self.interval = interval
+        self.active_window = timedelta(seconds=active_window)
+        self.lease = lease
+        self._clock = clock
+        self._sleep = sleep
+        # Dropped once no thread holds them, so idle users cost nothing
+        self._locks = weakref.WeakValueDictionary()
+        self._locks_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshes = 0
+
+    def _lock_for(self, user_id):
+        with self._locks_lock:
+            lock = self._locks.get(str(user_id))
+            if lock is None:
+                lock = threading.Lock()
+                self._locks[str(user_id)] = lock
+            return lock
+
+    def _stale(self, credentials):
+        if not credentials.get('refresh_token'):
+            return False
+        # Older credentials have no recorded expiry; one refresh records it
+        expiry = credentials.get('expiry')
+        return not expiry or datetime.fromisoformat(expiry) - self._clock() < self.margin
+
+    def get(self, user_id):
+        """A user's credentials with a usable access token, or None if Gmail isn't connected."""
+        credentials = self.store.load(user_id)
+        if credentials is None:
+            return None
+        if self._stale(credentials):
+            credentials = self.refresh(user_id)
+        self.store.mark_used(user_id)
+        return credentials
+
+    def refresh(self, user_id):
+        """Refresh a user's token unless another thread or process just did."""
+        with self._lock_for(user_id):
+            # Whoever held the lock may have refreshed it already
+            credentials = self.store.load(user_id)
+            if credentials is None or not self._stale(credentials):
+                return credentials
+
+            if not self.store.claim_refresh(user_id, self.lease):
+                return self._wait_for_refresh(user_id, credentials)
+            try:
+                credentials = self.refresher(credentials)
+            except Exception:
+                self.store.release_refresh(user_id)
+                raise
+            self.store.save(user_id, credentials)
+            self.refreshes += 1
+            return credentials
+
+    def _wait_for_refresh(self, user_id, credentials):
+        """Another process holds the lease; wait for the token it stores."""
+        deadline = time.monotonic() + self.lease
+        while time.monotonic() < deadline:
+            self._sleep(0.2)
+            latest = self.store.load(user_id)
+            if latest is None or not self._stale(latest):
+                return latest
+        # Give up waiting; google-auth refreshes on a 401 if it has to
+        return credentials
+
+    def record(self, user_id, credentials):
+        """Save a token google-auth refreshed by itself during a sync."""
+        stored = self.store.load(user_id)
+        if stored is not None and stored.get('refresh_token') == credentials.refresh_token:
+            self.store.save(user_id, dict(stored, **credentials_to_dict(credentials)))
+
+    def refresh_due(self):
+        """Refresh every active user's token that expires within the margin; returns how many."""
+        now = self._clock()
+        before = self.refreshes
+        for user_id in self.store.due_for_refresh(now + self.margin, now - self.active_window):
+            try:
+                self.refresh(user_id)
+            except Exception as e:
+                logger.warning("Error refreshing Gmail token for user %s: %s", user_id, e)
+        return self.refreshes - before
+
+    def start(self):
+        """Start the background refresher (once)."""
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='gmail-token-refresh', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh_due()
+            except Exception:
+                logger.exception("Gmail token refresher error")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,235 @@
+"""Counters and latency histograms, served in Prometheus text format.
+
+A slow sync used to say nothing about where its time went. Each stage of
+a Gmail sync (profile, history and message listing, message fetches, body
+decoding, OpenAI calls, MongoDB writes) is now timed into
+``sync_stage_seconds``, messages are counted by outcome, and every Flask
+endpoint's latency goes into ``http_request_duration_seconds``. GET
+/metrics renders it all for Prometheus to scrape.
+
+Recording is cheap enough to leave on: a label lookup that hot paths do
+once up front (``metric.labels(...)``), a bisect into the buckets and a
+short lock. benchmarks/bench_instrumentation.py measures it.
+"""
+from bisect import bisect_left
+import threading
+import time
+
+from flask import g, request
+
+# Seconds; long enough at the top end for a whole sync
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Timer:
+    """Observes the time spent in a ``with`` block, whether or not it raised."""
+
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        # Bucket i counts observations <= buckets[i]; the last is +Inf
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """The series for these label values, created on first use."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _series(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key, child in self._series():
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+    def _render_child(self, key, child):
+        yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}'
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels):
+        """Context manager timing its block into the series for ``labels``."""
+        return self.labels(**labels).time()
+
+    def _render_child(self, key, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+            yield f'{self.name}_bucket{labels} {cumulative}'
+        labels = _format_labels(self.labelnames, key)
+        yield f'{self.name}_sum{labels} {_format_value(total)}'
+        yield f'{self.name}_count{labels} {count}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Metric {metric.name} is already registered')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+SYNC_STAGE_SECONDS = metrics.histogram(
+    'sync_stage_seconds', 'Time spent in each stage of a Gmail sync.', ['stage'])
+SYNC_MESSAGES = metrics.counter(
+    'sync_messages_total', 'Gmail messages handled by syncs, by outcome.', ['outcome'])
+SYNCS = metrics.counter(
+    'syncs_total', 'Gmail syncs run, by mode and outcome.', ['mode', 'outcome'])
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    'http_request_duration_seconds', 'Flask request latency until the response is returned.',
+    ['method', 'endpoint', 'status'])
+
+
+def instrument_app(app, histogram=HTTP_REQUEST_SECONDS):
+    """Time every request to ``app`` into ``histogram``, labelled by endpoint.
+
+    Streaming responses are timed until their first byte is ready, not until
+    the stream ends. Requests that match no route share the ``unmatched``
+    endpoint so scanners can't create a series per URL.
+    """
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    def observe(status):
+        started = g.pop('request_started', None)
+        if started is not None:
+            histogram.observe(time.perf_counter() - started, method=request.method,
+                              endpoint=request.endpoint or 'unmatched', status=status)
+
+    def record_response(response):
+        observe(response.status_code)
+        return response
+
+    def record_error(error):
+        # after_request doesn't run when a view raises
+        if error is not None:
+            observe(500)
+
+    app.before_request(start_timer)
+    app.after_request(record_response)
+    app.teardown_request(record_error)
+    return app
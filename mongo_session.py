@@ -0,0 +1,80 @@
+"""Server-side Flask sessions stored in MongoDB.
+
+An alternative to Flask-Session's filesystem backend that works across web
+replicas. The cookie holds only a random session id; the data lives in the
+``sessions`` collection, whose TTL index on ``expires_at`` (declared in
+db_indexes) removes abandoned sessions. Sessions are written only when
+their contents change, or when the expiry needs pushing back, which
+happens at most once per SESSION_REFRESH_INTERVAL.
+"""
+from datetime import datetime, timedelta
+import os
+import secrets
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+SESSION_REFRESH_INTERVAL = int(os.getenv('SESSION_REFRESH_INTERVAL', '3600'))
+
+
+class MongoSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+
+
+class MongoSessionInterface(SessionInterface):
+    def __init__(self, collection, refresh_interval=SESSION_REFRESH_INTERVAL):
+        self.collection = collection
+        self.refresh_interval = timedelta(seconds=refresh_interval)
+
+    def _new_session(self):
+        return MongoSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(app.session_cookie_name)
+        if not sid:
+            return self._new_session()
+
+        doc = self.collection.find_one({'_id': sid, 'expires_at': {'$gt': datetime.utcnow()}})
+        if doc is None:
+            return self._new_session()
+        return MongoSession(doc.get('data', {}), sid=sid, expires_at=doc['expires_at'])
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.collection.delete_one({'_id': session.sid})
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            return
+
+        now = datetime.utcnow()
+        expires_at = now + app.permanent_session_lifetime
+        needs_refresh = session.expires_at is None or session.expires_at - now < app.permanent_session_lifetime - self.refresh_interval
+        if not (session.modified or session.new or needs_refresh):
+            return
+
+        self.collection.update_one(
+            {'_id': session.sid},
+            {'$set': {'data': dict(session), 'expires_at': expires_at, 'updated_at': now}},
+            upsert=True
+        )
+        response.set_cookie(
+            app.session_cookie_name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
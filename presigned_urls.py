@@ -0,0 +1,85 @@
+"""Cache of presigned S3 download URLs.
+
+Signing is local CPU work in boto3 but it isn't free, and the dashboard used
+to sign every resume on every load even though each URL stays valid for an
+hour. URLs are cached per ``s3_key`` and re-signed once they're within
+PRESIGNED_URL_REFRESH_MARGIN of expiring, so a URL handed out is always
+usable for at least that long.
+"""
+from collections import OrderedDict
+import os
+import threading
+import time
+
+PRESIGNED_URL_TTL = int(os.getenv('PRESIGNED_URL_TTL', '3600'))
+PRESIGNED_URL_REFRESH_MARGIN = int(os.getenv('PRESIGNED_URL_REFRESH_MARGIN', '300'))
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv('PRESIGNED_URL_CACHE_SIZE', '4096'))
+
+
+class PresignedUrlCache:
+    def __init__(self, s3_client, bucket, ttl=PRESIGNED_URL_TTL, refresh_margin=PRESIGNED_URL_REFRESH_MARGIN,
+                 max_entries=PRESIGNED_URL_CACHE_SIZE, clock=time.time):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.ttl = ttl
+        self.refresh_margin = min(refresh_margin, ttl // 2)
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, s3_key):
+        """Return ``(url, expires_at)`` for an object, signing it if needed."""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(s3_key)
+            if entry and entry[1] - now > self.refresh_margin:
+                self._entries.move_to_end(s3_key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        url = self.s3.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': self.bucket,
+                'Key': s3_key
+            },
+            ExpiresIn=self.ttl
+        )
+        entry = (url, now + self.ttl)
+        with self._lock:
+            self._entries[s3_key] = entry
+            self._entries.move_to_end(s3_key)
+            self._evict(now)
+        return entry
+
+    def url(self, s3_key):
+        return self.get(s3_key)[0]
+
+    def invalidate(self, s3_key):
+        with self._lock:
+            self._entries.pop(s3_key, None)
+
+    def _evict(self, now):
+        if len(self._entries) <= self.max_entries:
+            return
+        # Entries past their refresh point would be re-signed anyway, so
+        # drop those before evicting by recency
+        stale = [key for key, (_, expires_at) in self._entries.items() if expires_at - now <= self.refresh_margin]
+        for key in stale:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self._entries)
+            }
@@ -0,0 +1,140 @@
+"""Per-user data versions and a cache of serialized API responses.
+
+Every write to a user's applications or resumes bumps a version counter in
+``data_versions``. Responses built from that data are cached as JSON bytes
+under (user, version, request) and tagged with an ETag derived from the
+same key, so a request with a matching If-None-Match gets a 304 without the
+response being built, and an unchanged response is never reserialized. A
+bump changes the key, so stale entries are simply never read again and age
+out of the LRU.
+"""
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+import hashlib
+import json
+import os
+import threading
+
+from bson.objectid import ObjectId
+from flask import Response, jsonify, make_response, request
+
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '512'))
+# Skip caching bodies larger than this; they'd crowd out everything else
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(1024 * 1024)))
+
+
+def get_data_version(collection, user_id):
+    doc = collection.find_one({'_id': ObjectId(user_id)}, {'version': 1})
+    return doc['version'] if doc else 0
+
+
+def bump_data_version(collection, user_id):
+    """Record that a user's applications or resumes changed."""
+    collection.update_one(
+        {'_id': ObjectId(user_id)},
+        {'$inc': {'version': 1}, '$set': {'updated_at': datetime.utcnow()}},
+        upsert=True
+    )
+
+
+def make_etag(user_id, version, key):
+    digest = hashlib.sha256(f'{user_id}\x1f{version}\x1f{key}'.encode('utf-8')).hexdigest()
+    return f'v{version}-{digest[:16]}'
+
+
+class ResponseCache:
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, user_id, version, key):
+        """Return the cached body bytes, or None."""
+        with self._lock:
+            body = self._entries.get((str(user_id), version, key))
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((str(user_id), version, key))
+            self.hits += 1
+            return body
+
+    def put(self, user_id, version, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._entries[(str(user_id), version, key)] = body
+            self._entries.move_to_end((str(user_id), version, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self._entries)
+            }
+
+
+def cached_json(cache, current_version, cacheable=None, attach=None):
+    """Decorator serving a JSON view from ``cache`` with ETag revalidation.
+
+    ``current_version()`` returns ``(user_id, version)`` for the request.
+    Successful responses are cached under that and the full path, so a
+    version bump invalidates them. Requests ``cacheable()`` rejects bypass
+    the cache.
+
+    ``attach(payload)`` adds what mustn't be cached, e.g. presigned URLs
+    that expire, to the decoded cached payload on every request. The view
+    then builds the payload without them, and the ETag also covers the
+    final body, so it changes when an attached URL is re-signed.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if cacheable is not None and not cacheable():
+                return view(*args, **kwargs)
+
+            user_id, version = current_version()
+            key = request.full_path
+            etag = make_etag(user_id, version, key)
+            if attach is None and request.if_none_match.contains(etag):
+                cache.record_not_modified()
+                response = Response(status=304)
+            else:
+                body = cache.get(user_id, version, key)
+                if body is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    body = response.get_data()
+                    cache.put(user_id, version, key, body)
+                if attach is not None:
+                    body = jsonify(attach(json.loads(body))).get_data()
+                    etag = make_etag(user_id, version, f'{key}\x1f{hashlib.sha256(body).hexdigest()}')
+                if attach is not None and request.if_none_match.contains(etag):
+                    cache.record_not_modified()
+                    response = Response(status=304)
+                else:
+                    response = Response(body, mimetype='application/json')
+
+            response.set_etag(etag)
+            # Browsers keep the body but revalidate it on every request
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,364 @@
+"""Resume uploads straight from the browser to S3, stored by content hash.
+
+``init_upload`` records a pending upload and returns a presigned POST for a
+server-chosen key, limited to the declared content type and to
+MAX_RESUME_BYTES. The browser posts the file to S3 itself, then calls
+``complete_upload``, which checks the object with a HEAD request and
+records the resume. The app server never handles the file bytes. Pending
+uploads that are never completed expire via a TTL index (db_indexes).
+
+When the client sends the file's SHA-256, the object is stored at
+``resumes/<user_id>/sha256/<hash>`` and S3 is asked to verify the checksum.
+A ``resume_blobs`` document per object counts the resumes that point at it,
+so uploading a file the user already has skips S3 entirely, and deleting a
+resume only deletes the object once nothing else references it. While
+that delete is in flight the blob is marked ``deleting``; an upload of the
+same content in that window is refused rather than recorded against an
+object that is about to disappear.
+``delete_resumes`` removes many resumes with one ``delete_many`` and
+DeleteObjects calls of up to DELETE_BATCH_SIZE keys, reporting the keys S3
+failed to delete.
+
+Invalid requests raise ValueError with a message meant for the API
+response.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+import base64
+import hashlib
+import logging
+import os
+import re
+import uuid
+
+from botocore.exceptions import ClientError
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+MAX_RESUME_BYTES = int(os.getenv('MAX_RESUME_BYTES', str(10 * 1024 * 1024)))
+UPLOAD_URL_TTL = int(os.getenv('UPLOAD_URL_TTL', '600'))
+PENDING_UPLOAD_TTL = 24 * 3600
+HASH_CHUNK_SIZE = 1024 * 1024
+# The most keys S3 accepts in one DeleteObjects request
+DELETE_BATCH_SIZE = 1000
+# Seconds after which a blob still marked deleting is assumed abandoned
+# (the deleting process died) and may be taken over by a new upload
+BLOB_DELETE_LEASE = 300
+
+CONTENT_TYPES = {
+    'application/pdf': '.pdf',
+    'application/msword': '.doc',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': '.docx',
+}
+
+
+def content_key(user_id, sha256):
+    return f"resumes/{user_id}/sha256/{sha256}"
+
+
+def hash_stream(stream, chunk_size=HASH_CHUNK_SIZE):
+    """SHA-256 hex digest and size of a file object, read in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class ResumeStorage:
+    def __init__(self, s3_client, bucket, uploads_collection, resumes_collection, blobs_collection,
+                 max_bytes=MAX_RESUME_BYTES, url_ttl=UPLOAD_URL_TTL, delete_batch_size=DELETE_BATCH_SIZE):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.uploads = uploads_collection
+        self.resumes = resumes_collection
+        self.blobs = blobs_collection
+        self.max_bytes = max_bytes
+        self.url_ttl = url_ttl
+        self.delete_batch_size = delete_batch_size
+
+    def init_upload(self, user_id, filename, content_type, size=None, sha256=None):
+        """Start an upload.
+
+        Returns the presigned POST and the upload id, or, when the user
+        already stored a file with this ``sha256``, ``{'duplicate': True,
+        'resume': ...}`` with the resume recorded and nothing to upload.
+        """
+        filename = os.path.basename(filename or '').strip()
+        if not filename:
+            raise ValueError('No file selected')
+        if content_type not in CONTENT_TYPES:
+            raise ValueError('Unsupported file type; upload a PDF, DOC or DOCX file')
+        if size is not None:
+            try:
+                size = int(size)
+            except (TypeError, ValueError):
+                raise ValueError('size must be a number')
+            if size < 1 or size > self.max_bytes:
+                raise ValueError(f'File must be between 1 byte and {self.max_bytes // (1024 * 1024)} MB')
+        if sha256 is not None:
+            sha256 = str(sha256).lower()
+            if not re.fullmatch(r'[0-9a-f]{64}', sha256):
+                raise ValueError('sha256 must be a hex SHA-256 digest')
+
+            blob = self._add_reference(content_key(user_id, sha256))
+            if blob:
+                resume = self._record_resume(user_id, filename, blob)
+                return {'duplicate': True, 'resume': resume}
+
+        # Server-chosen key, so uploads never overwrite each other
+        fields = {'Content-Type': content_type}
+        if sha256:
+            s3_key = content_key(user_id, sha256)
+            # S3 rejects the POST if the bytes don't hash to this
+            fields['x-amz-checksum-algorithm'] = 'SHA256'
+            fields['x-amz-checksum-sha256'] = base64.b64encode(bytes.fromhex(sha256)).decode('ascii')
+        else:
+            s3_key = f"resumes/{user_id}/{uuid.uuid4().hex}{CONTENT_TYPES[content_type]}"
+        post = self.s3.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=s3_key,
+            Fields=fields,
+            Conditions=[{name: value} for name, value in fields.items()] + [
+                ['content-length-range', 1, self.max_bytes]
+            ],
+            ExpiresIn=self.url_ttl
+        )
+        upload_id = self.uploads.insert_one({
+            'user_id': ObjectId(user_id),
+            'filename': filename,
+            'content_type': content_type,
+            's3_key': s3_key,
+            'sha256': sha256,
+            'created_at': datetime.utcnow()
+        }).inserted_id
+        return {
+            'duplicate': False,
+            'upload_id': str(upload_id),
+            'url': post['url'],
+            'fields': post['fields'],
+            'max_bytes': self.max_bytes,
+            'expires_in': self.url_ttl
+        }
+
+    def complete_upload(self, user_id, upload_id):
+        """Record the resume once its object is in S3; returns the new resume."""
+        try:
+            upload_id = ObjectId(upload_id)
+        except Exception:
+            raise ValueError('Invalid upload id')
+        upload = self.uploads.find_one({'_id': upload_id, 'user_id': ObjectId(user_id)})
+        if not upload:
+            raise ValueError('Upload not found or already completed')
+
+        head = self._head(upload['s3_key'])
+        if head is None:
+            raise ValueError('File has not been uploaded yet')
+        # S3 only reports the checksum when it verified one on upload
+        expected_checksum = upload.get('sha256') and base64.b64encode(bytes.fromhex(upload['sha256'])).decode('ascii')
+        if (head['ContentLength'] > self.max_bytes or head.get('ContentType') != upload['content_type'] or
+                (expected_checksum and head.get('ChecksumSHA256') not in (None, expected_checksum))):
+            # The POST policy should make this impossible; don't keep it if it happens
+            if not self.blobs.find_one({'_id': upload['s3_key']}):
+                self.s3.delete_object(Bucket=self.bucket, Key=upload['s3_key'])
+            self.uploads.delete_one({'_id': upload_id})
+            raise ValueError('Uploaded file does not match the upload request')
+
+        # Claim the upload so a repeated complete can't record it twice
+        if self.uploads.delete_one({'_id': upload_id}).deleted_count != 1:
+            raise ValueError('Upload not found or already completed')
+
+        blob = {
+            's3_key': upload['s3_key'],
+            'content_type': upload['content_type'],
+            'size': head['ContentLength'],
+            'sha256': upload.get('sha256')
+        }
+        if blob['sha256']:
+            blob = self._upsert_blob(user_id, blob)
+        return self._record_resume(user_id, upload['filename'], blob)
+
+    def store_stream(self, user_id, filename, content_type, stream):
+        """Store a file the server received itself (the legacy /api/upload).
+
+        The stream is hashed first and only sent to S3 if the user doesn't
+        already have the same content. Returns ``(resume, uploaded)``.
+        """
+        sha256, size = hash_stream(stream)
+        s3_key = content_key(user_id, sha256)
+        blob = self._add_reference(s3_key)
+        uploaded = blob is None
+        if uploaded:
+            stream.seek(0)
+            extra_args = {'ContentType': content_type} if content_type else None
+            self.s3.upload_fileobj(stream, self.bucket, s3_key, ExtraArgs=extra_args)
+            blob = self._upsert_blob(user_id, {
+                's3_key': s3_key,
+                'content_type': content_type,
+                'size': size,
+                'sha256': sha256
+            })
+        return self._record_resume(user_id, filename, blob), uploaded
+
+    def delete_resume(self, user_id, resume_id):
+        """Delete a user's resume; returns ``(resume, object_deleted)``.
+
+        ``resume`` is None when there was no such resume for the user.
+        """
+        resume = self.resumes.find_one_and_delete({'_id': ObjectId(resume_id), 'user_id': ObjectId(user_id)})
+        if not resume:
+            return None, False
+        keys = self._release([resume])
+        for s3_key in keys:
+            self.s3.delete_object(Bucket=self.bucket, Key=s3_key)
+        self._forget_blobs(keys)
+        return resume, bool(keys)
+
+    def delete_resumes(self, user_id, resume_ids=None):
+        """Delete several of a user's resumes, or all of them when ``resume_ids`` is None.
+
+        Returns the ids removed from the database, the S3 keys deleted and,
+        per key, any error S3 reported. A key that failed is left in the
+        bucket but no longer referenced.
+        """
+        query = {'user_id': ObjectId(user_id)}
+        if resume_ids is not None:
+            try:
+                query['_id'] = {'$in': [ObjectId(resume_id) for resume_id in resume_ids]}
+            except Exception:
+                raise ValueError('Invalid resume id')
+
+        else:
+            # Uploads still in progress would otherwise be completed afterwards
+            self.uploads.delete_many(query)
+
+        resumes = list(self.resumes.find(query, {'s3_key': 1, 'sha256': 1}))
+        if resumes:
+            self.resumes.delete_many({'_id': {'$in': [resume['_id'] for resume in resumes]}})
+        released = sorted(self._release(resumes))
+        deleted_keys, errors = self.delete_objects(released)
+        self._forget_blobs(released)
+        for error in errors:
+            logger.warning("Failed to delete S3 object %s: %s %s", error['key'], error['code'], error['message'])
+        return {
+            'deleted_ids': [str(resume['_id']) for resume in resumes],
+            'deleted_keys': deleted_keys,
+            'errors': errors
+        }
+
+    def delete_objects(self, keys):
+        """Delete S3 objects in DeleteObjects batches; returns ``(deleted_keys, errors)``."""
+        deleted_keys, errors = [], []
+        for start in range(0, len(keys), self.delete_batch_size):
+            batch = keys[start:start + self.delete_batch_size]
+            try:
+                # Quiet mode only lists the keys that failed
+                response = self.s3.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+            except ClientError as e:
+                error = e.response.get('Error', {})
+                errors.extend({'key': key, 'code': error.get('Code'), 'message': error.get('Message')}
+                              for key in batch)
+                continue
+            failed = {error['Key']: error for error in response.get('Errors', [])}
+            errors.extend({'key': key, 'code': error.get('Code'), 'message': error.get('Message')}
+                          for key, error in failed.items())
+            deleted_keys.extend(key for key in batch if key not in failed)
+        return deleted_keys, errors
+
+    def _release(self, resumes):
+        """Drop the references deleted ``resumes`` held; returns the keys nothing uses any more.
+
+        Blobs left without references are marked deleting, not removed, so
+        no upload can reference them again until ``_forget_blobs`` runs
+        after their objects are deleted.
+        """
+        counts = Counter(resume['s3_key'] for resume in resumes if resume.get('sha256'))
+        unreferenced = set()
+        if counts:
+            self.blobs.bulk_write([
+                UpdateOne({'_id': s3_key}, {'$inc': {'refcount': -count}}) for s3_key, count in counts.items()
+            ], ordered=False)
+            # _add_reference only matches refcount > 0, so nothing can take
+            # these back once they're marked
+            unreferenced_blobs = {'_id': {'$in': list(counts)}, 'refcount': {'$lte': 0}}
+            self.blobs.update_many(unreferenced_blobs, {'$set': {'deleting': True, 'deleting_at': datetime.utcnow()}})
+            unreferenced.update(blob['_id'] for blob in self.blobs.find(unreferenced_blobs, {'_id': 1}))
+
+        # Older rows share a key when the same filename was uploaded twice
+        legacy = {resume['s3_key'] for resume in resumes if not resume.get('sha256')}
+        if legacy:
+            unreferenced.update(legacy - set(self.resumes.distinct('s3_key', {'s3_key': {'$in': list(legacy)}})))
+        return unreferenced
+
+    def _forget_blobs(self, keys):
+        """Remove the blob documents of objects ``_release`` handed out for deletion."""
+        if keys:
+            self.blobs.delete_many({'_id': {'$in': list(keys)}, 'deleting': True})
+
+    def _add_reference(self, s3_key):
+        """Count one more resume against an existing object; None if there is none."""
+        return self.blobs.find_one_and_update(
+            {'_id': s3_key, 'refcount': {'$gt': 0}},
+            {'$inc': {'refcount': 1}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _upsert_blob(self, user_id, blob):
+        """Count a reference to an object just written to S3, creating its blob if needed.
+
+        Raises ValueError if the object at that key is being deleted, since
+        the delete may remove what was just written.
+        """
+        fields = {
+            'user_id': ObjectId(user_id),
+            'sha256': blob['sha256'],
+            'size': blob['size'],
+            'content_type': blob['content_type'],
+            'created_at': datetime.utcnow()
+        }
+        try:
+            return self.blobs.find_one_and_update(
+                {'_id': blob['s3_key'], 'deleting': {'$exists': False}},
+                {'$inc': {'refcount': 1}, '$setOnInsert': fields},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            pass
+        # A delete that never finished doesn't block the content for good
+        abandoned = self.blobs.find_one_and_update(
+            {'_id': blob['s3_key'], 'deleting_at': {'$lt': datetime.utcnow() - timedelta(seconds=BLOB_DELETE_LEASE)}},
+            {'$set': dict(fields, refcount=1), '$unset': {'deleting': '', 'deleting_at': ''}},
+            return_document=ReturnDocument.AFTER
+        )
+        if abandoned is None:
+            raise ValueError('An earlier copy of this file is still being deleted; upload it again in a moment')
+        return abandoned
+
+    def _record_resume(self, user_id, filename, blob):
+        resume_data = {
+            'filename': filename,
+            's3_key': blob.get('s3_key', blob.get('_id')),
+            'content_type': blob['content_type'],
+            'size': blob['size'],
+            'sha256': blob.get('sha256'),
+            'upload_date': datetime.utcnow(),
+            'user_id': ObjectId(user_id)
+        }
+        resume_data['_id'] = self.resumes.insert_one(resume_data).inserted_id
+        return resume_data
+
+    def _head(self, s3_key):
+        try:
+            return self.s3.head_object(Bucket=self.bucket, Key=s3_key, ChecksumMode='ENABLED')
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
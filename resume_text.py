@@ -0,0 +1,324 @@
+"""Text extraction and full-text search for resumes.
+
+After a resume is recorded, ``ResumeIndexer.submit`` queues it on a small
+thread pool, so the upload request never waits for extraction. The worker
+downloads the file, extracts its text (PDF via pypdf, DOCX from its XML),
+and stores the normalized text in ``resume_texts`` and one document per
+distinct term in ``resume_terms``, an inverted index read by ``search``.
+The resume's ``text_status`` records how far it got: pending, processing,
+indexed, empty (no extractable text, e.g. a scanned PDF), unsupported
+(legacy .doc) or failed. Resumes sharing content (see resume_storage) reuse
+the text already extracted for it.
+
+The queue lives only in memory, so a thread started by ``start`` looks
+for resumes left pending or processing for RESUME_TEXT_STALE_AFTER seconds
+(say, by a worker that restarted) and for resumes never queued, and
+submits them again. Each resume is claimed with a conditional update, so
+workers don't extract it twice.
+
+Search results are ranked with BM25 over the user's own resumes.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import io
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+import zipfile
+import xml.etree.ElementTree as ET
+
+from bson.objectid import ObjectId
+
+from resume_storage import CONTENT_TYPES
+
+logger = logging.getLogger(__name__)
+
+RESUME_TEXT_WORKERS = int(os.getenv('RESUME_TEXT_WORKERS', '2'))
+# Larger files are left unindexed rather than read into memory
+RESUME_TEXT_MAX_BYTES = int(os.getenv('RESUME_TEXT_MAX_BYTES', str(20 * 1024 * 1024)))
+# Seconds before an extraction that never finished is retried, and between
+# looks for such extractions
+RESUME_TEXT_STALE_AFTER = int(os.getenv('RESUME_TEXT_STALE_AFTER', '900'))
+RESUME_TEXT_RETRY_INTERVAL = int(os.getenv('RESUME_TEXT_RETRY_INTERVAL', '300'))
+# Keeps a text document well inside MongoDB's 16 MB limit
+MAX_TEXT_CHARS = 200000
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+PDF = 'application/pdf'
+DOCX = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+EXTENSIONS = {extension: content_type for content_type, extension in CONTENT_TYPES.items()}
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+# Keeps terms like c++, c# and node.js whole
+TOKEN_RE = re.compile(r'[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*')
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it of on or that the this to was were will with
+""".split())
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+def normalize_text(text):
+    """Unicode-normalize text and collapse runs of whitespace, keeping line breaks."""
+    text = unicodedata.normalize('NFKC', text)
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def tokenize(text):
+    """Lowercase search terms in ``text``, without stopwords."""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def extract_pdf_text(body):
+    # Imported here to keep it off the app's startup path
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(body))
+    return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+
+def extract_docx_text(body):
+    with zipfile.ZipFile(io.BytesIO(body)) as docx:
+        document = docx.read('word/document.xml')
+
+    parts = []
+    for _, element in ET.iterparse(io.BytesIO(document)):
+        if element.tag == WORD_NS + 't':
+            parts.append(element.text or '')
+        elif element.tag == WORD_NS + 'tab':
+            parts.append('\t')
+        elif element.tag in (WORD_NS + 'p', WORD_NS + 'br'):
+            parts.append('\n')
+    return ''.join(parts)
+
+
+def extract_text(body, content_type):
+    """Normalized text of a resume file; raises UnsupportedFormat for other types."""
+    if content_type == PDF:
+        text = extract_pdf_text(body)
+    elif content_type == DOCX:
+        text = extract_docx_text(body)
+    else:
+        raise UnsupportedFormat(content_type)
+    return normalize_text(text)[:MAX_TEXT_CHARS]
+
+
+def content_type_of(resume):
+    """The resume's stored content type, or one guessed from its filename for older rows."""
+    if resume.get('content_type') in CONTENT_TYPES:
+        return resume['content_type']
+    return EXTENSIONS.get(os.path.splitext(resume.get('filename', ''))[1].lower())
+
+
+def snippet(text, terms, width=160):
+    """A line-free excerpt of ``text`` around the first matched term."""
+    match = re.search(r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')', text, re.IGNORECASE)
+    start = max(0, match.start() - width // 3) if match else 0
+    excerpt = ' '.join(text[start:start + width].split())
+    return ('...' if start else '') + excerpt + ('...' if start + width < len(text) else '')
+
+
+class ResumeIndexer:
+    def __init__(self, s3_client, bucket, resumes_collection, texts_collection, terms_collection,
+                 max_workers=RESUME_TEXT_WORKERS, max_bytes=RESUME_TEXT_MAX_BYTES, executor=None, on_change=None,
+                 stale_after=RESUME_TEXT_STALE_AFTER, retry_interval=RESUME_TEXT_RETRY_INTERVAL,
+                 clock=datetime.utcnow):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.resumes = resumes_collection
+        self.texts = texts_collection
+        self.terms = terms_collection
+        self.max_bytes = max_bytes
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='resume-text')
+        # Called with the user id whenever a resume's text_status changes,
+        # so cached responses showing it are invalidated
+        self.on_change = on_change
+        self.stale_after = timedelta(seconds=stale_after)
+        self.retry_interval = retry_interval
+        self._clock = clock
+        self._stop = threading.Event()
+        self._thread = None
+
+    def submit(self, resume):
+        """Mark a newly recorded resume pending and index it in the background."""
+        self._set_status(resume, 'pending')
+        return self.executor.submit(self._run, resume)
+
+    def _run(self, resume):
+        # A retry elsewhere may have taken it since it was queued
+        claimed = self.resumes.update_one(
+            {'_id': resume['_id'], 'text_status': 'pending'},
+            {'$set': {'text_status': 'processing', 'text_status_at': self._clock()}}
+        ).matched_count
+        if not claimed:
+            return 'skipped'
+        if self.on_change is not None:
+            self.on_change(resume['user_id'])
+        try:
+            return self.index(resume)
+        except Exception as e:
+            logger.warning("Error extracting text from resume %s: %s", resume['_id'], e)
+            self._set_status(resume, 'failed', str(e))
+            return 'failed'
+
+    def index(self, resume):
+        """Extract and index one resume now; returns its new text_status."""
+        text = self._known_text(resume)
+        if text is None:
+            content_type = content_type_of(resume)
+            if content_type not in (PDF, DOCX):
+                return self._set_status(resume, 'unsupported')
+            obj = self.s3.get_object(Bucket=self.bucket, Key=resume['s3_key'])
+            if obj['ContentLength'] > self.max_bytes:
+                obj['Body'].close()
+                return self._set_status(resume, 'unsupported')
+            text = extract_text(obj['Body'].read(), content_type)
+
+        term_counts = Counter(tokenize(text))
+        self.remove([resume['_id']])
+        self.texts.insert_one({
+            '_id': resume['_id'],
+            'user_id': resume['user_id'],
+            'sha256': resume.get('sha256'),
+            'text': text,
+            'length': sum(term_counts.values()),
+            'extracted_at': datetime.utcnow()
+        })
+        if term_counts:
+            self.terms.insert_many([
+                {'user_id': resume['user_id'], 'resume_id': resume['_id'], 'term': term, 'tf': count}
+                for term, count in term_counts.items()
+            ])
+
+        # Deleted while it was being extracted
+        if not self.resumes.count_documents({'_id': resume['_id']}, limit=1):
+            self.remove([resume['_id']])
+            return 'deleted'
+        return self._set_status(resume, 'indexed' if term_counts else 'empty')
+
+    def _known_text(self, resume):
+        """Text already extracted from another of the user's resumes with the same content."""
+        if not resume.get('sha256'):
+            return None
+        doc = self.texts.find_one(
+            {'user_id': resume['user_id'], 'sha256': resume['sha256'], '_id': {'$ne': resume['_id']}},
+            {'text': 1}
+        )
+        return doc['text'] if doc else None
+
+    def _set_status(self, resume, status, error=None):
+        self.resumes.update_one(
+            {'_id': resume['_id']},
+            {'$set': {'text_status': status, 'text_error': error, 'text_status_at': self._clock()}}
+        )
+        if self.on_change is not None:
+            self.on_change(resume['user_id'])
+        return status
+
+    def retry_stale(self):
+        """Submit again every resume whose extraction was lost; returns how many.
+
+        That's one left pending or processing for ``stale_after``, or one
+        recorded that long ago that was never queued at all.
+        """
+        cutoff = self._clock() - self.stale_after
+        stale = {'$or': [
+            {'text_status': {'$in': ['pending', 'processing']}, 'text_status_at': {'$not': {'$gte': cutoff}}},
+            {'text_status': {'$exists': False}, 'upload_date': {'$lt': cutoff}}
+        ]}
+        retried = 0
+        for resume in list(self.resumes.find(stale)):
+            # Claimed first so other workers' retries leave it alone
+            claimed = self.resumes.update_one(
+                {'$and': [{'_id': resume['_id']}, stale]},
+                {'$set': {'text_status': 'pending', 'text_status_at': self._clock()}}
+            ).matched_count
+            if claimed:
+                logger.info("Retrying text extraction for resume %s", resume['_id'])
+                self.executor.submit(self._run, resume)
+                retried += 1
+        return retried
+
+    def start(self):
+        """Start the background thread retrying lost extractions (once)."""
+        if self._thread is None and self.retry_interval > 0:
+            self._thread = threading.Thread(target=self._retry_loop, name='resume-text-retry', daemon=True)
+            self._thread.start()
+
+    def _retry_loop(self):
+        while True:
+            try:
+                self.retry_stale()
+            except Exception:
+                logger.exception("Error retrying resume text extraction")
+            if self._stop.wait(self.retry_interval):
+                return
+
+    def remove(self, resume_ids):
+        """Drop the text and index entries of deleted resumes."""
+        resume_ids = [ObjectId(resume_id) for resume_id in resume_ids]
+        if resume_ids:
+            self.texts.delete_many({'_id': {'$in': resume_ids}})
+            self.terms.delete_many({'resume_id': {'$in': resume_ids}})
+
+    def search(self, user_id, query, limit=SEARCH_LIMIT):
+        """Rank a user's resumes against ``query``.
+
+        Returns ``[{'resume_id', 'score', 'matched_terms', 'snippet'}]``,
+        best match first.
+        """
+        terms = list(dict.fromkeys(tokenize(query or '')))
+        if not terms:
+            raise ValueError('Enter a search term')
+        user_id = ObjectId(user_id)
+
+        postings = list(self.terms.find(
+            {'user_id': user_id, 'term': {'$in': terms}},
+            {'resume_id': 1, 'term': 1, 'tf': 1}
+        ))
+        if not postings:
+            return []
+
+        lengths = {doc['_id']: doc['length'] for doc in self.texts.find({'user_id': user_id}, {'length': 1})}
+        average_length = (sum(lengths.values()) / len(lengths) if lengths else 0) or 1
+        document_frequency = Counter(posting['term'] for posting in postings)
+
+        scores = Counter()
+        matched = {}
+        for posting in postings:
+            resume_id = posting['resume_id']
+            df = document_frequency[posting['term']]
+            idf = math.log(1 + (len(lengths) - df + 0.5) / (df + 0.5))
+            norm = 1 - BM25_B + BM25_B * lengths.get(resume_id, average_length) / average_length
+            scores[resume_id] += idf * posting['tf'] * (BM25_K1 + 1) / (posting['tf'] + BM25_K1 * norm)
+            matched.setdefault(resume_id, []).append(posting['term'])
+
+        ranked = scores.most_common(limit)
+        texts = {doc['_id']: doc['text'] for doc in self.texts.find(
+            {'_id': {'$in': [resume_id for resume_id, _ in ranked]}}, {'text': 1}
+        )}
+        return [{
+            'resume_id': resume_id,
+            'score': round(score, 4),
+            'matched_terms': sorted(matched[resume_id], key=terms.index),
+            'snippet': snippet(texts.get(resume_id, ''), matched[resume_id])
+        } for resume_id, score in ranked]
+
+    def shutdown(self, wait=True):
+        self._stop.set()
+        if self._thread is not None and wait:
+            self._thread.join()
+        self.executor.shutdown(wait=wait)
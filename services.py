@@ -0,0 +1,132 @@
+"""Lazily created handles to the services the app talks to.
+
+Importing the app used to connect to MongoDB, build the S3 and OpenAI
+clients and import the Google API libraries, so a cold start paid for all
+of them and a worker couldn't boot at all while Atlas was unreachable.
+Each service is now a ``LazyService`` that builds its client on first use,
+exactly once even when several request threads get there together. A
+factory that raises isn't cached, so the next use tries again.
+
+``LazyProxy`` stands in for a client (or a single MongoDB collection) in
+code that expects the object itself, resolving it on first attribute
+access. ``ServiceRegistry.health`` runs every service's check in parallel
+for the /healthz endpoint.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import os
+import threading
+import time
+
+HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', '3'))
+
+_UNSET = object()
+
+
+class LazyService:
+    def __init__(self, name, factory, check=None, required=True):
+        self.name = name
+        self.required = required
+        self._factory = factory
+        self._check = check
+        self._value = _UNSET
+        self._lock = threading.Lock()
+
+    def get(self):
+        value = self._value
+        if value is _UNSET:
+            with self._lock:
+                if self._value is _UNSET:
+                    self._value = self._factory()
+                value = self._value
+        return value
+
+    @property
+    def initialized(self):
+        return self._value is not _UNSET
+
+    def reset(self):
+        """Forget the client so the next ``get`` builds a new one."""
+        with self._lock:
+            self._value = _UNSET
+
+    def check(self):
+        """Build the client if needed and run the health check.
+
+        Returns ``'ok'``, or ``'disabled'`` when the factory returned None
+        (e.g. no API key configured); raises if the service is unusable.
+        """
+        value = self.get()
+        if value is None:
+            return 'disabled'
+        if self._check is not None:
+            self._check(value)
+        return 'ok'
+
+
+class LazyProxy:
+    """Forwards attribute and item access to ``service.get()``."""
+
+    def __init__(self, service):
+        object.__setattr__(self, '_service', service)
+
+    def __getattr__(self, name):
+        return getattr(self._service.get(), name)
+
+    def __getitem__(self, key):
+        return self._service.get()[key]
+
+    def __repr__(self):
+        return f'<LazyProxy {self._service.name}>'
+
+
+class ServiceRegistry:
+    def __init__(self, health_timeout=HEALTH_CHECK_TIMEOUT):
+        self.health_timeout = health_timeout
+        self._services = OrderedDict()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def register(self, name, factory, check=None, required=True):
+        """Declare a service; ``required`` ones decide readiness."""
+        service = LazyService(name, factory, check, required)
+        self._services[name] = service
+        return service
+
+    def __getitem__(self, name):
+        return self._services[name]
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2 * len(self._services) or 1,
+                                                    thread_name_prefix='health-check')
+            return self._executor
+
+    def health(self):
+        """Check every service at once; returns ``(ready, {name: result})``.
+
+        Each result has ``status`` (ok, disabled, error or timeout),
+        ``required``, ``latency_ms`` and, on failure, ``error``.
+        """
+        def timed_check(service):
+            start = time.perf_counter()
+            status = service.check()
+            return status, (time.perf_counter() - start) * 1000
+
+        futures = [(service, self._pool().submit(timed_check, service)) for service in self._services.values()]
+        deadline = time.monotonic() + self.health_timeout
+        results = OrderedDict()
+        for service, future in futures:
+            result = {'required': service.required}
+            try:
+                status, latency_ms = future.result(timeout=max(0, deadline - time.monotonic()))
+                result.update(status=status, latency_ms=round(latency_ms, 1))
+            except FutureTimeoutError:
+                result.update(status='timeout', error=f'No answer within {self.health_timeout:g}s')
+            except Exception as e:
+                result.update(status='error', error=str(e))
+            results[service.name] = result
+
+        ready = all(result['status'] in ('ok', 'disabled') for result in results.values() if result['required'])
+        return ready, results
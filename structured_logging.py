@@ -0,0 +1,162 @@
+"""JSON logs written off the request thread, tagged with a request id.
+
+Handlers used to be ``print()`` calls: a synchronous stdout write on the
+request thread for every dashboard load and every email a sync looked at.
+``configure_logging`` routes the root logger through a QueueHandler, so a
+log call only builds the record and enqueues it; a QueueListener thread
+formats each one as a JSON line and writes it.
+
+Every record carries the ``request_id`` of the request that logged it,
+taken from an incoming X-Request-ID header or generated, and echoed back
+in the response. Fields passed with ``extra=`` become JSON keys. Per-email
+debug events are logged with ``extra={'sample': True}`` and only
+LOG_SAMPLE_RATE of them are kept, so DEBUG can be turned on for a busy
+sync without writing a line per email.
+"""
+import atexit
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+
+from flask import g, request
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.1'))
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+# Accept a caller's id only if it's short and can't inject into log lines
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+request_id_var = ContextVar('request_id', default=None)
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with extra= fields as top-level keys."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key != 'sample':
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request id while still on the logging thread."""
+
+    def filter(self, record):
+        request_id = request_id_var.get()
+        if request_id is not None:
+            record.request_id = request_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep ``rate`` of the records logged with ``extra={'sample': True}``."""
+
+    def __init__(self, rate=LOG_SAMPLE_RATE, random=random.random):
+        super().__init__()
+        self.rate = rate
+        self._random = random
+
+    def filter(self, record):
+        if not getattr(record, 'sample', False):
+            return True
+        if self._random() >= self.rate:
+            return False
+        record.sample_rate = self.rate
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Enqueue records without formatting them on the calling thread.
+
+    The stock ``prepare`` runs the full formatter so the record pickles;
+    here only the message is merged and a traceback rendered, and the JSON
+    is built by the listener.
+    """
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level=LOG_LEVEL, stream=None, sample_rate=LOG_SAMPLE_RATE):
+    """Send the root logger's records through a queue to a JSON stream handler.
+
+    Like ``logging.basicConfig`` this does nothing if the root logger
+    already has handlers (e.g. from gunicorn's --log-config), and calling it
+    again is harmless. Returns the QueueListener, or None if it stood aside.
+    """
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None or root.handlers:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+    records = queue.SimpleQueue()
+    handler = NonBlockingQueueHandler(records)
+    handler.addFilter(SamplingFilter(sample_rate))
+    handler.addFilter(RequestIdFilter())
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    # Flush what's queued when the process exits
+    atexit.register(_listener.stop)
+    return _listener
+
+
+def init_request_ids(app):
+    """Give each request to ``app`` an id, set for logging and echoed in the response."""
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        g.request_id_token = request_id_var.set(request_id)
+
+    def echo_request_id(response):
+        request_id = request_id_var.get()
+        if request_id is not None:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+
+    def clear_request_id(error):
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            request_id_var.reset(token)
+
+    app.before_request(assign_request_id)
+    app.after_request(echo_request_id)
+    app.teardown_request(clear_request_id)
+    return app
@@ -0,0 +1,48 @@
+"""Per-user Gmail sync checkpoints.
+
+A checkpoint records the mailbox historyId at the start of the last
+successful sync plus the ids of the messages it already processed, so the
+next sync only has to look at what Gmail added since then.
+"""
+from datetime import datetime
+from bson.objectid import ObjectId
+
+# Upper bound on remembered message ids per user; only ids from recent
+# history windows matter for skipping replays.
+MAX_SEEN_MESSAGE_IDS = 1000
+
+
+def load_checkpoint(collection, user_id):
+    """Return the user's checkpoint document, or None before the first sync."""
+    return collection.find_one({'_id': ObjectId(user_id)})
+
+
+def save_checkpoint(collection, user_id, history_id, message_ids, mode):
+    """Store the checkpoint left by a sync.
+
+    Incremental syncs add their ids to the ones already remembered; a full
+    scan replaces them. A ``history_id`` of None means the next sync has to
+    be a full scan.
+    """
+    seen = list(message_ids)
+    if mode == 'incremental':
+        previous = load_checkpoint(collection, user_id)
+        if previous:
+            recent = set(seen)
+            seen = [i for i in previous.get('message_ids', []) if i not in recent] + seen
+
+    collection.update_one(
+        {'_id': ObjectId(user_id)},
+        {'$set': {
+            'history_id': history_id,
+            'message_ids': seen[-MAX_SEEN_MESSAGE_IDS:],
+            'mode': mode,
+            'updated_at': datetime.utcnow()
+        }},
+        upsert=True
+    )
+
+
+def clear_checkpoint(collection, user_id):
+    """Forget the checkpoint, e.g. when the user connects a different mailbox."""
+    collection.delete_one({'_id': ObjectId(user_id)})
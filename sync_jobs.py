@@ -0,0 +1,190 @@
+"""Background jobs for Gmail sync.
+
+A sync is recorded in the ``sync_jobs`` collection and run on a small
+thread pool, so the HTTP request that starts it returns straight away and
+the client polls the job for progress. Each user has at most one active
+job: the unique partial index on ``user_id`` (declared in db_indexes) makes
+a second submit return the job that is already running. Jobs whose
+heartbeat stops, e.g. because the process restarted mid-sync, are marked
+failed after SYNC_JOB_STALE_SECONDS so the user can start a new one.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import contextvars
+import logging
+import os
+import time
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+SYNC_JOB_WORKERS = int(os.getenv('SYNC_JOB_WORKERS', '2'))
+SYNC_JOB_STALE_SECONDS = int(os.getenv('SYNC_JOB_STALE_SECONDS', '600'))
+# Minimum gap between progress writes for one job
+SYNC_JOB_PROGRESS_INTERVAL = float(os.getenv('SYNC_JOB_PROGRESS_INTERVAL', '1.0'))
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def serialize_job(job):
+    """The fields of a job document the API exposes."""
+    return {
+        'id': str(job['_id']),
+        'status': job['status'],
+        'processed': job.get('processed', 0),
+        'total': job.get('total', 0),
+        'found': job.get('found', 0),
+        'new': job.get('new', 0),
+        'result': job.get('result'),
+        'error': job.get('error'),
+        'created_at': job['created_at'].isoformat(),
+        'finished_at': job['finished_at'].isoformat() if job.get('finished_at') else None
+    }
+
+
+class SyncJobQueue:
+    """Runs one sync job per user on a thread pool, tracked in MongoDB."""
+
+    def __init__(self, collection, max_workers=SYNC_JOB_WORKERS, stale_after=SYNC_JOB_STALE_SECONDS,
+                 progress_interval=SYNC_JOB_PROGRESS_INTERVAL, executor=None):
+        self.collection = collection
+        self.stale_after = stale_after
+        self.progress_interval = progress_interval
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sync-job')
+
+    def submit(self, user_id, run, params=None):
+        """Queue ``run(on_progress)`` for a user unless a job is already active.
+
+        ``run`` returns the job's result dict; ``params`` are stored on the
+        job for reference only, so don't put credentials in them.
+        Returns ``(job, created)``.
+        """
+        job, created = self._insert(user_id, params, 'queued')
+        if created:
+            # Run in a copy of this context so the job logs under the request's id
+            self.executor.submit(contextvars.copy_context().run, self._run, job['_id'], run)
+        return job, created
+
+    def claim(self, user_id, params=None):
+        """Take a user's active slot for a sync the caller runs itself, e.g. a streamed one.
+
+        Returns ``(job, created)`` like ``submit``. When ``created``, report
+        through ``progress_callback(job['_id'])`` (which also keeps the job
+        from looking stale) and always ``release`` it afterwards.
+        """
+        return self._insert(user_id, params, 'running')
+
+    def _insert(self, user_id, params, status):
+        user_id = ObjectId(user_id)
+        now = datetime.utcnow()
+        job = {
+            '_id': ObjectId(),
+            'user_id': user_id,
+            'status': status,
+            'active': True,
+            'params': params or {},
+            'processed': 0,
+            'total': 0,
+            'found': 0,
+            'new': 0,
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now,
+            'finished_at': None
+        }
+        try:
+            self.collection.insert_one(job)
+        except DuplicateKeyError:
+            existing = self.collection.find_one({'user_id': user_id, 'active': True})
+            if existing and not self._expire_if_stale(existing):
+                return existing, False
+            # The previous job was stale or finished in between; try once more
+            try:
+                self.collection.insert_one(job)
+            except DuplicateKeyError:
+                return self.collection.find_one({'user_id': user_id, 'active': True}), False
+        return job, True
+
+    def get(self, job_id, user_id):
+        """Return a user's job by id, or None."""
+        try:
+            job_id = ObjectId(job_id)
+        except Exception:
+            return None
+        job = self.collection.find_one({'_id': job_id, 'user_id': ObjectId(user_id)})
+        if job and job.get('active'):
+            self._expire_if_stale(job)
+            job = self.collection.find_one({'_id': job_id})
+        return job
+
+    def active_job(self, user_id):
+        return self.collection.find_one({'user_id': ObjectId(user_id), 'active': True})
+
+    def _expire_if_stale(self, job):
+        """Mark an active job failed if it stopped reporting; True if it did."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        if job['updated_at'] > cutoff:
+            return False
+        result = self.collection.update_one(
+            {'_id': job['_id'], 'active': True, 'updated_at': job['updated_at']},
+            {'$set': {'status': 'failed', 'error': 'Sync stopped responding', 'finished_at': datetime.utcnow()},
+             '$unset': {'active': ''}}
+        )
+        return result.modified_count == 1
+
+    def _update(self, job_id, fields):
+        fields['updated_at'] = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {'_id': job_id, 'active': True},
+            {'$set': fields},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def progress_callback(self, job_id):
+        """``on_progress(processed, total, found)`` that records a job's progress."""
+        last_write = [0.0]
+
+        def on_progress(processed, total, found=0):
+            # Throttled, so a fast sync doesn't turn into a write per email
+            now = time.monotonic()
+            if processed < total and now - last_write[0] < self.progress_interval:
+                return
+            last_write[0] = now
+            self._update(job_id, {'processed': processed, 'total': total, 'found': found})
+
+        return on_progress
+
+    def release(self, job_id, result=None, error=None):
+        """Finish a claimed job, freeing the user's slot; a no-op once it's finished."""
+        now = datetime.utcnow()
+        fields = {'finished_at': now, 'updated_at': now}
+        if error is None:
+            fields.update({'status': 'completed', 'result': result, 'new': (result or {}).get('new_added', 0)})
+        else:
+            fields.update({'status': 'failed', 'error': error})
+        self.collection.update_one({'_id': job_id, 'active': True}, {'$set': fields, '$unset': {'active': ''}})
+
+    def _run(self, job_id, run):
+        if not self._update(job_id, {'status': 'running', 'started_at': datetime.utcnow()}):
+            return
+        on_progress = self.progress_callback(job_id)
+
+        try:
+            result = run(on_progress)
+        except Exception as e:
+            logger.error("Sync job %s failed: %s", job_id, e, extra={'job_id': str(job_id)})
+            self._finish(job_id, {'status': 'failed', 'error': str(e)})
+            return
+        self._finish(job_id, {'status': 'completed', 'result': result, 'new': result.get('new_added', 0)})
+
+    def _finish(self, job_id, fields):
+        now = datetime.utcnow()
+        fields.update({'finished_at': now, 'updated_at': now})
+        self.collection.update_one({'_id': job_id}, {'$set': fields, '$unset': {'active': ''}})
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,46 @@
+import pytest
+
+
+class Clock:
+    """A monotonic clock the test moves by hand; ``sleep`` advances it."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class CountingCollection:
+    """Wraps a collection and records the name of every method called on it."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.calls = []
+
+    def count(self, name):
+        return self.calls.count(name)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.collection, name)
+        if not callable(attribute):
+            return attribute
+
+        def wrapper(*args, **kwargs):
+            self.calls.append(name)
+            return attribute(*args, **kwargs)
+        return wrapper
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def counting_collection():
+    """Wraps a collection in a CountingCollection."""
+    return CountingCollection
@@ -0,0 +1,165 @@
+"""In-memory stand-in for the Gmail API client used by GmailService.
+
+Mirrors the slice of ``googleapiclient`` that the service touches:
+``users().messages().list/get``, ``users().history().list``,
+``users().getProfile``, ``new_batch_http_request`` and the ``.execute()``
+calling convention, so batching, per-message failures and incremental sync
+can be exercised without network access.
+"""
+import base64
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+def make_http_error(status, reason='error'):
+    resp = httplib2.Response({'status': status})
+    resp.reason = reason
+    return HttpError(resp, reason.encode('utf-8'))
+
+
+def make_message(message_id, subject, body='', sender='jobs@acme.com',
+                 date='Mon, 06 May 2024 10:00:00 +0000', extra_headers=None):
+    headers = [
+        {'name': 'Subject', 'value': subject},
+        {'name': 'From', 'value': sender},
+        {'name': 'Date', 'value': date},
+    ]
+    headers.extend(extra_headers or [])
+    return {
+        'id': message_id,
+        'payload': {
+            'headers': headers,
+            'mimeType': 'text/plain',
+            'body': {'data': base64.urlsafe_b64encode(body.encode('utf-8')).decode('ascii')},
+        },
+    }
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class FakeBatch:
+    def __init__(self, gmail, callback):
+        self._gmail = gmail
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._requests.append((request_id, request))
+
+    def execute(self):
+        self._gmail.batch_sizes.append(len(self._requests))
+        if self._gmail.fail_batches:
+            raise self._gmail.fail_batches.pop(0)
+        for request_id, request in self._requests:
+            try:
+                response = request.execute()
+            except HttpError as e:
+                self._callback(request_id, None, e)
+            else:
+                self._callback(request_id, response, None)
+
+
+class _Messages:
+    def __init__(self, gmail):
+        self._gmail = gmail
+
+    def list(self, userId, q=None, maxResults=100, pageToken=None):
+        def run():
+            self._gmail.list_calls += 1
+            ids = self._gmail.list_ids()[:maxResults]
+            return {'messages': [{'id': i, 'threadId': i} for i in ids]} if ids else {}
+        return _Request(run)
+
+    def get(self, userId, id, format='full'):
+        def run():
+            self._gmail.get_calls += 1
+            if id in self._gmail.errors:
+                raise self._gmail.errors[id]
+            if id not in self._gmail.messages:
+                raise make_http_error(404, 'Not Found')
+            return self._gmail.messages[id]
+        return _Request(run)
+
+
+class _History:
+    def __init__(self, gmail):
+        self._gmail = gmail
+
+    def list(self, userId, startHistoryId, historyTypes=None, pageToken=None):
+        def run():
+            self._gmail.history_calls += 1
+            start = int(startHistoryId)
+            if start < self._gmail.oldest_history_id:
+                raise make_http_error(404, 'Requested entity was not found.')
+            records = [r for r in self._gmail.history if int(r['id']) > start]
+            offset = int(pageToken or 0)
+            page = records[offset:offset + self._gmail.history_page_size]
+            response = {'history': page, 'historyId': str(self._gmail.history_id)}
+            if offset + self._gmail.history_page_size < len(records):
+                response['nextPageToken'] = str(offset + self._gmail.history_page_size)
+            return response
+        return _Request(run)
+
+
+class _Users:
+    def __init__(self, gmail):
+        self._gmail = gmail
+
+    def messages(self):
+        return _Messages(self._gmail)
+
+    def history(self):
+        return _History(self._gmail)
+
+    def getProfile(self, userId):
+        return _Request(lambda: {'emailAddress': 'me@example.com', 'historyId': str(self._gmail.history_id)})
+
+
+class FakeGmail:
+    """A mailbox plus call counters; pass it as ``GmailService.service``."""
+
+    def __init__(self, messages=(), errors=None):
+        self.messages = {}
+        self.history = []
+        self.history_id = 1000
+        self.oldest_history_id = 0
+        self.history_page_size = 100
+        for message in messages:
+            self.add_message(message)
+        self.errors = dict(errors or {})
+        self.fail_batches = []
+        self.batch_sizes = []
+        self.list_calls = 0
+        self.get_calls = 0
+        self.history_calls = 0
+
+    def add_message(self, message, label_ids=('INBOX',)):
+        """Deliver a message, recording a messageAdded history entry."""
+        self.history_id += 1
+        self.messages[message['id']] = message
+        self.history.append({
+            'id': str(self.history_id),
+            'messagesAdded': [{'message': {'id': message['id'], 'labelIds': list(label_ids)}}],
+        })
+
+    def expire_history(self):
+        """Drop all history, as Gmail does after roughly a week."""
+        self.oldest_history_id = self.history_id
+        self.history = []
+
+    def list_ids(self):
+        # Gmail lists newest first
+        return list(reversed(list(self.messages)))
+
+    def users(self):
+        return _Users(self)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
@@ -0,0 +1,83 @@
+"""Offline stand-in for ``openai.OpenAI`` used by the classification tests.
+
+Only ``chat.completions.create`` is implemented. Each call sleeps for
+``latency`` seconds to model the API round trip, can be made to answer 429
+a number of times, and records how many calls were in flight at once.
+"""
+from types import SimpleNamespace
+import json
+import re
+import threading
+import time
+
+
+class FakeRateLimitError(Exception):
+    """Looks like ``openai.RateLimitError`` to code that checks ``status_code``."""
+
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__('Rate limit reached')
+        headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+def classify(content):
+    """Call anything mentioning an application a confident job application."""
+    is_application = 'application' in content.lower()
+    return {
+        'is_job_application': is_application,
+        'is_job_alert': False,
+        'company_name': 'Acme' if is_application else None,
+        'position': 'Engineer' if is_application else None,
+        'status': 'Applied' if is_application else None,
+        'confidence': 90 if is_application else 10
+    }
+
+
+def default_responder(messages):
+    """Answer single-email prompts with an object and batch prompts with an array."""
+    content = messages[-1]['content']
+    parts = re.split(r'=== Email (\d+) ===\n', content)
+    if len(parts) == 1:
+        return json.dumps(classify(content))
+    results = []
+    for index, email in zip(parts[1::2], parts[2::2]):
+        results.append(dict(classify(email), index=int(index)))
+    return json.dumps(results)
+
+
+class FakeOpenAI:
+    def __init__(self, latency=0.0, rate_limited_calls=0, responder=default_responder):
+        self.latency = latency
+        self.rate_limited_calls = rate_limited_calls
+        self.responder = responder
+        self.calls = 0
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.requests.append(messages)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            limited = self.rate_limited_calls > 0
+            if limited:
+                self.rate_limited_calls -= 1
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if limited:
+                raise FakeRateLimitError()
+            content = self.responder(messages)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=sum(len(m['content']) for m in messages) // 4)
+        )
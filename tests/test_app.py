@@ -1,119 +1,243 @@
+import importlib
+
+import boto3
+import mongomock
 import pytest
-from app import app, db, User, Resume, Application
-from werkzeug.security import generate_password_hash
+import requests
+from bson.objectid import ObjectId
+from moto import mock_aws
+
+from db_indexes import ensure_indexes
+
+BUCKET = 'resume-tracker-test'
+PDF = 'application/pdf'
+
+# Read by app.py at import: no startup index build or retry thread, and
+# sessions in (mock) MongoDB rather than flask_session/
+ENVIRONMENT = {
+    'S3_BUCKET_NAME': BUCKET,
+    'ENSURE_INDEXES_ON_STARTUP': '0',
+    'RESUME_TEXT_RETRY_INTERVAL': '0',
+    'SESSION_BACKEND': 'mongodb'
+}
+
+
+@pytest.fixture(scope='module')
+def server():
+    """The app module, wired to mongomock and a moto S3 bucket."""
+    with mock_aws(), pytest.MonkeyPatch.context() as patch:
+        for name, value in ENVIRONMENT.items():
+            patch.setenv(name, value)
+        server = importlib.import_module('app')
+        s3 = boto3.client('s3', region_name='us-east-1',
+                          aws_access_key_id='testing', aws_secret_access_key='testing')
+        s3.create_bucket(Bucket=BUCKET)
+        mongo = mongomock.MongoClient()
+        ensure_indexes(mongo.resume_tracker)
+        patch.setattr(server.mongo, '_value', mongo)
+        patch.setattr(server.s3_service, '_value', s3)
+        patch.setattr(server.openai_client, '_value', None)
+        yield server
+        server.resume_indexer.executor.shutdown(wait=True)
+
 
 @pytest.fixture
-def client():
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    app.config['WTF_CSRF_ENABLED'] = False
-    
-    with app.test_client() as client:
-        with app.app_context():
-            db.create_all()
-            # Create test user
-            test_user = User(
-                email='test@example.com',
-                password_hash=generate_password_hash('testpassword')
-            )
-            db.session.add(test_user)
-            db.session.commit()
-        yield client
-        with app.app_context():
-            db.drop_all()
-
-def test_index_page(client):
-    response = client.get('/')
-    assert response.status_code == 200
-    assert b'Welcome to Resume Tracker' in response.data
+def client(server):
+    """A test client logged in as a new user; ``client.user_id`` is theirs."""
+    client = server.app.test_client()
+    name = str(ObjectId())
+    response = client.post('/api/register', json={
+        'username': name, 'email': f'{name}@example.com', 'password': 'secret'
+    })
+    assert response.status_code == 201
+    client.user_id = response.get_json()['user']['id']
+    return client
 
-def test_login_page(client):
-    response = client.get('/login')
-    assert response.status_code == 200
-    assert b'Login' in response.data
 
-def test_register_page(client):
-    response = client.get('/register')
-    assert response.status_code == 200
-    assert b'Create Account' in response.data
-
-def test_user_registration(client):
-    response = client.post('/register', data={
-        'email': 'newuser@example.com',
-        'password': 'newpassword',
-        'confirm_password': 'newpassword'
-    }, follow_redirects=True)
+def upload(client, body, filename='cv.pdf'):
+    """Upload a resume the way the browser does; returns the complete response."""
+    init = client.post('/api/upload/init', json={'filename': filename, 'content_type': PDF, 'size': len(body)})
+    assert init.status_code == 201
+    upload = init.get_json()
+    fields = dict(upload['fields'], **{'Content-Type': PDF})
+    assert requests.post(upload['url'], data=fields, files={'file': (filename, body)}).status_code in (200, 204)
+    return client.post('/api/upload/complete', json={'upload_id': upload['upload_id']})
+
+
+def test_index(server):
+    response = server.app.test_client().get('/')
+
     assert response.status_code == 200
-    
-    with app.app_context():
-        user = User.query.filter_by(email='newuser@example.com').first()
-        assert user is not None
-
-def test_user_login(client):
-    response = client.post('/login', data={
-        'email': 'test@example.com',
-        'password': 'testpassword'
-    }, follow_redirects=True)
+    assert response.get_json()['status'] == 'ok'
+
+
+def test_healthz_reports_each_service(server):
+    response = server.app.test_client().get('/healthz')
+
     assert response.status_code == 200
-    assert b'Dashboard' in response.data
-
-def test_protected_routes(client):
-    # Test accessing protected route without login
-    response = client.get('/dashboard', follow_redirects=True)
-    assert b'Login' in response.data
-    
-    # Login first
-    client.post('/login', data={
-        'email': 'test@example.com',
-        'password': 'testpassword'
-    })
-    
-    # Test accessing protected route after login
-    response = client.get('/dashboard')
+    body = response.get_json()
+    assert body['status'] == 'ok'
+    assert body['services']['mongodb']['status'] == 'ok'
+    assert body['services']['s3']['status'] == 'ok'
+    assert body['services']['openai'] == dict(body['services']['openai'], status='disabled', required=False)
+
+
+def test_healthz_is_unavailable_without_s3(server, monkeypatch):
+    monkeypatch.setattr(server, 'BUCKET_NAME', None)
+
+    response = server.app.test_client().get('/healthz')
+
+    assert response.status_code == 503
+    assert response.get_json()['services']['s3'] == dict(
+        response.get_json()['services']['s3'], status='error', error='S3_BUCKET_NAME not set')
+
+
+def test_metrics_include_request_latency(server):
+    test_client = server.app.test_client()
+    test_client.get('/')
+
+    response = test_client.get('/metrics')
+
     assert response.status_code == 200
-    assert b'Your Applications' in response.data
+    assert response.content_type.startswith('text/plain')
+    assert 'http_request_duration_seconds_count{method="GET",endpoint="api.index",status="200"}' in response.get_data(as_text=True)
+
+
+def test_api_routes_need_a_login(server):
+    response = server.app.test_client().post('/api/upload/init', json={'filename': 'cv.pdf', 'content_type': PDF})
+
+    assert response.status_code == 302
+
+
+def test_upload_is_recorded_once(client, server):
+    response = upload(client, b'%PDF-1.4 cv')
+
+    assert response.status_code == 201
+    resume = response.get_json()['resume']
+    assert resume['filename'] == 'cv.pdf'
+    stored = server.db.resumes.find_one({'_id': ObjectId(resume['id'])})
+    assert str(stored['user_id']) == client.user_id
+    assert server.db.resume_uploads.count_documents({'user_id': ObjectId(client.user_id)}) == 0
+
+
+def test_duplicate_complete_is_rejected(client):
+    init = client.post('/api/upload/init', json={'filename': 'cv.pdf', 'content_type': PDF, 'size': 4}).get_json()
+    fields = dict(init['fields'], **{'Content-Type': PDF})
+    requests.post(init['url'], data=fields, files={'file': ('cv.pdf', b'%PDF')})
+
+    assert client.post('/api/upload/complete', json={'upload_id': init['upload_id']}).status_code == 201
+    response = client.post('/api/upload/complete', json={'upload_id': init['upload_id']})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Upload not found or already completed'}
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'filename': 'cv.exe', 'content_type': 'application/x-msdownload'}, 'Unsupported file type'),
+    ({'filename': 'cv.pdf', 'content_type': PDF, 'size': 'big'}, 'size must be a number'),
+    ({}, 'No file selected'),
+])
+def test_upload_init_rejects_bad_requests(client, body, error):
+    response = client.post('/api/upload/init', json=body)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith(error)
+
+
+def test_complete_before_the_file_is_uploaded(client):
+    init = client.post('/api/upload/init', json={'filename': 'cv.pdf', 'content_type': PDF}).get_json()
+
+    response = client.post('/api/upload/complete', json={'upload_id': init['upload_id']})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'File has not been uploaded yet'}
+
+
+def test_upload_survives_text_extraction_failing_to_queue(client, server, monkeypatch):
+    def submit(resume):
+        raise RuntimeError('executor shut down')
+    monkeypatch.setattr(server.resume_indexer, 'submit', submit)
+
+    response = upload(client, b'%PDF queued later')
+
+    assert response.status_code == 201
+    assert server.db.resumes.count_documents({'user_id': ObjectId(client.user_id)}) == 1
+
+
+def test_resume_url_downloads_the_file(client):
+    resume = upload(client, b'%PDF download me').get_json()['resume']
+
+    response = client.get(f"/api/resume/{resume['id']}/url")
 
-def test_resume_upload(client):
-    # Login first
-    client.post('/login', data={
-        'email': 'test@example.com',
-        'password': 'testpassword'
-    })
-    
-    # Test resume upload page
-    response = client.get('/upload')
     assert response.status_code == 200
-    assert b'Upload Resume' in response.data
+    assert response.get_json()['expires_at'].endswith('Z')
+    assert requests.get(response.get_json()['url']).content == b'%PDF download me'
+
+
+def test_resume_url_is_only_for_the_owner(client, server):
+    resume = upload(client, b'%PDF mine').get_json()['resume']
+    other = server.app.test_client()
+    name = str(ObjectId())
+    other.post('/api/register', json={'username': name, 'email': f'{name}@example.com', 'password': 'secret'})
+
+    assert other.get(f"/api/resume/{resume['id']}/url").status_code == 404
+    assert client.get(f'/api/resume/{ObjectId()}/url').status_code == 404
+
+
+def test_bulk_delete_removes_listed_resumes(client, server):
+    first, second = (upload(client, f'%PDF {i}'.encode(), f'cv{i}.pdf').get_json()['resume'] for i in range(2))
+
+    response = client.post('/api/resumes/delete', json={'ids': [first['id']]})
 
-def test_application_creation(client):
-    # Login first
-    client.post('/login', data={
-        'email': 'test@example.com',
-        'password': 'testpassword'
-    })
-    
-    # Create a test resume first
-    with app.app_context():
-        resume = Resume(
-            filename='test.pdf',
-            s3_key='test/test.pdf',
-            user_id=1
-        )
-        db.session.add(resume)
-        db.session.commit()
-    
-    # Test new application page
-    response = client.get('/application/new')
     assert response.status_code == 200
-    assert b'New Job Application' in response.data
-    
-    # Test creating a new application
-    response = client.post('/application/new', data={
-        'company': 'Test Company',
-        'position': 'Test Position',
-        'status': 'applied',
-        'resume_id': '1',
-        'notes': 'Test notes'
-    }, follow_redirects=True)
+    assert response.get_json() == {'deleted_count': 1, 'deleted_ids': [first['id']], 'deleted_objects': 1, 'errors': []}
+    remaining = server.db.resumes.find({'user_id': ObjectId(client.user_id)})
+    assert [str(resume['_id']) for resume in remaining] == [second['id']]
+
+
+@pytest.mark.parametrize('body, error', [
+    ({}, 'Provide a list of resume ids or all: true'),
+    ({'ids': 'all'}, 'Provide a list of resume ids or all: true'),
+    ({'ids': ['nope']}, 'Invalid resume id'),
+])
+def test_bulk_delete_rejects_bad_requests(client, body, error):
+    response = client.post('/api/resumes/delete', json=body)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+
+def test_account_clear_removes_applications_and_resumes(client, server):
+    upload(client, b'%PDF clear me')
+    server.db.applications.insert_many([
+        {'user_id': ObjectId(client.user_id), 'company': 'Acme', 'email_id': f'm{i}'} for i in range(2)
+    ])
+
+    response = client.post('/api/account/clear')
+
     assert response.status_code == 200
-    assert b'Application added successfully' in response.data 
\ No newline at end of file
+    assert response.get_json() == dict(response.get_json(), applications_deleted=2, resumes_deleted=1,
+                                       objects_deleted=1, errors=[])
+    assert client.get('/api/applications').get_json()['items'] == []
+    assert client.get('/api/resumes').get_json()['items'] == []
+    assert client.get('/api/check-auth').status_code == 200
+
+
+def test_resume_pages_follow_the_cursor(client):
+    for i in range(3):
+        upload(client, f'%PDF page {i}'.encode(), f'cv{i}.pdf')
+
+    first = client.get('/api/resumes?limit=2&sort=filename&order=asc').get_json()
+    second = client.get(f"/api/resumes?limit=2&sort=filename&order=asc&cursor={first['next_cursor']}").get_json()
+
+    assert [resume['filename'] for resume in first['items'] + second['items']] == ['cv0.pdf', 'cv1.pdf', 'cv2.pdf']
+    assert all(resume['url'].startswith('https://') for resume in first['items'])
+    assert second['next_cursor'] is None
+
+
+@pytest.mark.parametrize('path', ['/api/applications', '/api/resumes'])
+def test_invalid_cursor_is_rejected(client, path):
+    response = client.get(f'{path}?cursor=not-a-cursor')
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
@@ -0,0 +1,145 @@
+import mongomock
+from bson.objectid import ObjectId
+
+from application_stats import (aggregate_stats, get_metrics, rebuild_stats, record_applications,
+                               reset_stats, stats_version, week_start)
+from applications_store import save_synced_applications
+
+USER_ID = str(ObjectId())
+
+
+def make_application(email_id, status='Applied', application_date='2024-05-08T10:00:00+00:00'):
+    return {
+        'company': 'Acme',
+        'position': 'Engineer',
+        'status': status,
+        'status_color': 'primary',
+        'application_date': application_date,
+        'source': 'Gmail (AI Analysis)',
+        'email_id': email_id,
+        'confidence': 90
+    }
+
+
+def test_week_start_is_the_iso_monday():
+    assert week_start('2024-05-08T10:00:00+00:00') == '2024-05-06'
+    assert week_start('2024-05-06') == '2024-05-06'
+    assert week_start('2024-05-12T23:00:00-04:00') == '2024-05-06'
+    assert week_start('not a date') is None
+    assert week_start(None) is None
+
+
+def test_aggregation_groups_by_status_and_week():
+    db = mongomock.MongoClient().resume_tracker
+    save_synced_applications(db.applications, USER_ID, [
+        make_application('a'),
+        make_application('b', 'Interview', '2024-05-10T09:00:00+00:00'),
+        make_application('c', 'Rejected', '2024-05-14T09:00:00+00:00'),
+    ])
+    db.applications.insert_one(dict(make_application('d'), user_id=ObjectId()))
+
+    stats = aggregate_stats(db.applications, USER_ID)
+
+    assert stats == {
+        'total': 3,
+        'by_status': {'Applied': 1, 'Interview': 1, 'Rejected': 1},
+        'weekly': {'2024-05-06': 2, '2024-05-13': 1}
+    }
+
+
+def test_metrics_are_built_once_then_read_from_counters(counting_collection):
+    db = mongomock.MongoClient().resume_tracker
+    stats = counting_collection(db.application_stats)
+    save_synced_applications(db.applications, USER_ID, [make_application('a', 'Interview')])
+
+    first = get_metrics(stats, db.applications, USER_ID)
+    version = stats_version(stats, USER_ID)
+    new = save_synced_applications(db.applications, USER_ID, [
+        make_application('b', 'Offer'), make_application('c', 'Rejected', '2024-05-20T09:00:00+00:00')
+    ])
+    record_applications(stats, db.applications, USER_ID, new, version)
+    stats.calls.clear()
+    second = get_metrics(stats, db.applications, USER_ID)
+    reads = stats.count('find_one')
+
+    assert first['total'] == 1
+    assert second == {
+        'total': 3,
+        'interview': 1,
+        'offer': 1,
+        'rejected': 1,
+        'success_rate': 66.7,
+        'by_status': {'Interview': 1, 'Offer': 1, 'Rejected': 1},
+        'weekly': [{'week_start': '2024-05-06', 'count': 2}, {'week_start': '2024-05-20', 'count': 1}]
+    }
+    assert second == get_metrics(stats, db.applications, USER_ID, refresh=True)
+    assert reads == 1
+
+
+def test_record_without_counters_rebuilds_them():
+    db = mongomock.MongoClient().resume_tracker
+    version = stats_version(db.application_stats, USER_ID)
+    new = save_synced_applications(db.applications, USER_ID, [make_application('a')])
+
+    record_applications(db.application_stats, db.applications, USER_ID, new, version)
+
+    assert db.application_stats.find_one()['total'] == 1
+    assert get_metrics(db.application_stats, db.applications, USER_ID)['total'] == 1
+
+
+def test_rebuild_after_sync_inserted_is_not_counted_twice():
+    db = mongomock.MongoClient().resume_tracker
+    version = stats_version(db.application_stats, USER_ID)
+    new = save_synced_applications(db.applications, USER_ID, [make_application('a')])
+    get_metrics(db.application_stats, db.applications, USER_ID)
+
+    record_applications(db.application_stats, db.applications, USER_ID, new, version)
+
+    assert get_metrics(db.application_stats, db.applications, USER_ID)['total'] == 1
+
+
+def test_rebuild_that_missed_a_sync_does_not_overwrite_it():
+    db = mongomock.MongoClient().resume_tracker
+    save_synced_applications(db.applications, USER_ID, [make_application('a')])
+    version = stats_version(db.application_stats, USER_ID)
+
+    class SyncDuringAggregation:
+        """Lets a sync insert and count an application while a rebuild aggregates."""
+
+        def __init__(self):
+            self.synced = False
+
+        def aggregate(self, pipeline):
+            result = list(db.applications.aggregate(pipeline))
+            if not self.synced:
+                self.synced = True
+                new = save_synced_applications(db.applications, USER_ID, [make_application('b')])
+                record_applications(db.application_stats, db.applications, USER_ID, new, version)
+            return result
+
+    rebuild_stats(db.application_stats, SyncDuringAggregation(), USER_ID)
+
+    assert get_metrics(db.application_stats, db.applications, USER_ID)['total'] == 2
+
+
+def test_reset_zeroes_counters():
+    db = mongomock.MongoClient().resume_tracker
+    save_synced_applications(db.applications, USER_ID, [make_application('a')])
+    get_metrics(db.application_stats, db.applications, USER_ID)
+
+    db.applications.delete_many({})
+    reset_stats(db.application_stats, USER_ID)
+
+    metrics = get_metrics(db.application_stats, db.applications, USER_ID)
+    assert metrics['total'] == 0 and metrics['weekly'] == [] and metrics['success_rate'] == 0.0
+
+
+def test_status_with_dot_is_stored_safely():
+    db = mongomock.MongoClient().resume_tracker
+    get_metrics(db.application_stats, db.applications, USER_ID)
+
+    record_applications(db.application_stats, db.applications, USER_ID,
+                        [make_application('a', 'Applied.'), make_application('b', None)],
+                        stats_version(db.application_stats, USER_ID))
+
+    assert get_metrics(db.application_stats, db.applications, USER_ID)['by_status'] == {'Applied_': 1, 'Unknown': 1}
@@ -0,0 +1,110 @@
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
+
+from applications_store import save_synced_applications
+from db_indexes import ensure_indexes
+
+
+def make_collection():
+    db = mongomock.MongoClient().resume_tracker
+    ensure_indexes(db)
+    return db.applications
+
+
+def make_application(email_id, company='Acme'):
+    return {
+        'company': company,
+        'position': 'Engineer',
+        'status': 'Applied',
+        'status_color': 'primary',
+        'application_date': '2024-05-06T10:00:00+00:00',
+        'source': 'Gmail (AI Analysis)',
+        'email_id': email_id,
+        'confidence': 90
+    }
+
+
+def test_new_applications_are_inserted_in_one_bulk_write(counting_collection):
+    collection = counting_collection(make_collection())
+    user_id = str(ObjectId())
+
+    new = save_synced_applications(collection, user_id, [make_application(f'm{i}') for i in range(10)])
+
+    assert collection.calls == ['bulk_write']
+    assert len(new) == 10
+    stored = collection.collection.find_one({'email_id': 'm3'})
+    assert stored['user_id'] == ObjectId(user_id)
+    assert str(stored['_id']) == new[3]['id']
+
+
+def test_existing_applications_are_left_alone():
+    collection = make_collection()
+    user_id = str(ObjectId())
+    save_synced_applications(collection, user_id, [make_application('m1', company='Original')])
+
+    new = save_synced_applications(collection, user_id, [
+        make_application('m1', company='Changed'),
+        make_application('m2'),
+        make_application('m2'),
+    ])
+
+    assert [a['email_id'] for a in new] == ['m2']
+    assert collection.count_documents({}) == 2
+    assert collection.find_one({'email_id': 'm1'})['company'] == 'Original'
+
+
+def test_same_email_is_separate_per_user():
+    collection = make_collection()
+
+    save_synced_applications(collection, str(ObjectId()), [make_application('m1')])
+    new = save_synced_applications(collection, str(ObjectId()), [make_application('m1')])
+
+    assert len(new) == 1
+
+
+def test_unique_index_rejects_duplicates():
+    collection = make_collection()
+    user_id = ObjectId()
+    collection.insert_one({'user_id': user_id, 'email_id': 'm1'})
+
+    with pytest.raises(Exception):
+        collection.insert_one({'user_id': user_id, 'email_id': 'm1'})
+    # Manually added applications have no email_id and aren't constrained
+    collection.insert_one({'user_id': user_id, 'company': 'A'})
+    collection.insert_one({'user_id': user_id, 'company': 'B'})
+
+
+class RacingCollection:
+    """bulk_write fails the way MongoDB does when another sync inserted first."""
+
+    def __init__(self, error_code=11000):
+        self.error_code = error_code
+
+    def bulk_write(self, operations, ordered=True):
+        inserted = operations[1]._doc['$setOnInsert']['_id']
+        raise BulkWriteError({
+            'writeErrors': [{'index': 0, 'code': self.error_code, 'errmsg': 'E11000 duplicate key error'}],
+            'upserted': [{'index': 1, '_id': inserted}],
+            'nUpserted': 1
+        })
+
+
+def test_duplicate_key_errors_count_as_already_present():
+    new = save_synced_applications(RacingCollection(), str(ObjectId()), [make_application('m1'), make_application('m2')])
+
+    assert [a['email_id'] for a in new] == ['m2']
+
+
+def test_other_write_errors_are_raised():
+    with pytest.raises(BulkWriteError):
+        save_synced_applications(RacingCollection(error_code=121), str(ObjectId()),
+                                 [make_application('m1'), make_application('m2')])
+
+
+def test_nothing_to_save(counting_collection):
+    collection = counting_collection(make_collection())
+
+    assert save_synced_applications(collection, str(ObjectId()), []) == []
+    assert collection.calls == []
@@ -0,0 +1,148 @@
+import mongomock
+from bson.objectid import ObjectId
+
+from classification_cache import ClassificationCache, content_hash
+from gmail_service import GmailService, InvalidAnalysisError
+from fake_gmail import FakeGmail, make_message
+from fake_openai import FakeOpenAI, default_responder
+from test_gmail_service import make_service
+
+RESULT = {'is_job_application': True, 'is_job_alert': False, 'confidence': 90}
+USER_ID = str(ObjectId())
+
+
+def make_collection():
+    return mongomock.MongoClient().resume_tracker.classification_cache
+
+
+def test_content_hash_ignores_case_and_whitespace():
+    assert content_hash('Your Application', 'jobs@acme.com', 'Thanks  for\napplying') == \
+        content_hash('your application', 'JOBS@acme.com', 'thanks for applying')
+    assert content_hash('Your Application', 'jobs@acme.com', 'a') != \
+        content_hash('Your Application', 'jobs@other.com', 'a')
+
+
+def test_content_hash_ignores_text_the_model_never_sees():
+    body = 'x' * 1500
+    assert content_hash('s', 'f', body + 'tail one') == content_hash('s', 'f', body + 'tail two')
+
+
+def test_hit_by_content():
+    cache = ClassificationCache()
+    cache.put(USER_ID, 'Application received', 'jobs@acme.com', 'body', RESULT)
+
+    # Same templated email delivered again as a different message
+    assert cache.get(USER_ID, 'Application received', 'jobs@acme.com', 'body') == RESULT
+    assert cache.get(USER_ID, 'Something else', 'jobs@acme.com', 'body') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_users_never_share_classifications():
+    collection = make_collection()
+    ClassificationCache(collection).put(USER_ID, 'Application received', 'jobs@acme.com', 'body', RESULT)
+    other = str(ObjectId())
+
+    assert ClassificationCache(collection).get(other, 'Application received', 'jobs@acme.com', 'body') is None
+    cache = ClassificationCache(collection)
+    cache.put(USER_ID, 'Application received', 'jobs@acme.com', 'body', RESULT)
+    assert cache.get(other, 'Application received', 'jobs@acme.com', 'body') is None
+
+
+def test_repeated_content_keeps_one_small_document():
+    collection = make_collection()
+    cache = ClassificationCache(collection)
+
+    for _ in range(3):
+        cache.put(USER_ID, 'We regret to inform you', 'jobs@acme.com', 'body', RESULT)
+
+    docs = list(collection.find())
+    assert len(docs) == 1
+    assert set(docs[0]) == {'_id', 'user_id', 'result', 'created_at'}
+
+
+def test_lru_evicts_oldest_entries():
+    cache = ClassificationCache(max_entries=2)
+    cache.put(USER_ID, 'one', 'f', 'b', RESULT)
+    cache.put(USER_ID, 'two', 'f', 'b', RESULT)
+    cache.get(USER_ID, 'one', 'f', 'b')
+    cache.put(USER_ID, 'three', 'f', 'b', RESULT)
+
+    assert cache.get(USER_ID, 'two', 'f', 'b') is None
+    assert cache.get(USER_ID, 'one', 'f', 'b') == RESULT
+
+
+def test_expired_memory_entries_are_misses():
+    cache = ClassificationCache(ttl=0)
+    cache.put(USER_ID, 'one', 'f', 'b', RESULT)
+
+    assert cache.get(USER_ID, 'one', 'f', 'b') is None
+
+
+def test_results_survive_in_mongo():
+    collection = make_collection()
+    ClassificationCache(collection).put(USER_ID, 'one', 'f', 'b', RESULT)
+
+    fresh = ClassificationCache(collection)
+    assert fresh.get(USER_ID, 'changed', 'f', 'b') is None
+    assert fresh.get(USER_ID, 'one', 'f', 'b') == RESULT
+    assert fresh.stats()['memory_hits'] == 0
+    assert fresh.get(USER_ID, 'one', 'f', 'b') == RESULT
+    assert fresh.stats()['memory_hits'] == 1
+
+
+def test_repeat_sync_makes_no_openai_calls():
+    cache = ClassificationCache(make_collection())
+    gmail = FakeGmail([make_message(f'm{i}', f'Application {i}') for i in range(5)])
+
+    first = make_service(gmail, classification_cache=cache.for_user(USER_ID))
+    first.fetch_job_application_emails()
+    second = make_service(gmail, classification_cache=cache.for_user(USER_ID))
+    applications = second.fetch_job_application_emails()
+
+    assert len(first.analyzed) == 5
+    assert second.analyzed == []
+    assert len(applications) == 5
+
+
+def test_unparseable_reply_is_not_cached():
+    replies = iter(['Sorry, I cannot help with that.', None])
+
+    def responder(messages):
+        reply = next(replies)
+        return reply if reply is not None else default_responder(messages)
+
+    openai_client = FakeOpenAI(responder=responder)
+    cache = ClassificationCache(make_collection())
+    service = GmailService(openai_client, classification_cache=cache.for_user(USER_ID), use_heuristics=False)
+    email = {'message_id': 'm1', 'subject': 'Application received', 'body': 'Thanks for applying',
+             'from': 'jobs@acme.com'}
+
+    [(_, error)] = service.classify_emails([email])
+    [(analysis, _)] = service.classify_emails([email])
+
+    assert isinstance(error, InvalidAnalysisError)
+    assert analysis['is_job_application'] is True
+    assert openai_client.calls == 2
+    assert cache.get(USER_ID, 'Application received', 'jobs@acme.com', 'Thanks for applying') == analysis
+
+
+def test_email_with_unparseable_reply_is_retried_next_sync():
+    replies = iter(['{"answer": "maybe"}'])
+
+    def responder(messages):
+        return next(replies, None) or default_responder(messages)
+
+    openai_client = FakeOpenAI(responder=responder)
+    cache = ClassificationCache(make_collection())
+    gmail = FakeGmail([make_message('m1', 'Application received')])
+    service = GmailService(openai_client, classification_cache=cache.for_user(USER_ID), max_workers=1)
+    service.service = gmail
+
+    assert service.fetch_job_application_emails() == []
+    assert service.history_id is None
+    retry = GmailService(openai_client, classification_cache=cache.for_user(USER_ID), max_workers=1)
+    retry.service = gmail
+
+    assert [a['email_id'] for a in retry.fetch_job_application_emails()] == ['m1']
+    assert openai_client.calls == 2
@@ -0,0 +1,201 @@
+import json
+import random
+import time
+
+import pytest
+
+from classification_pipeline import RateLimiter, TokenBucket, call_with_backoff, ordered_map
+from gmail_service import GmailService
+from fake_gmail import FakeGmail, make_message
+from fake_openai import FakeOpenAI, FakeRateLimitError, default_responder
+
+
+def test_token_bucket_allows_burst_then_paces(clock):
+    bucket = TokenBucket(60, clock=clock, sleep=clock.sleep)
+
+    for _ in range(60):
+        assert bucket.acquire() == 0
+    # One unit per second once the burst is spent
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_token_bucket_queues_concurrent_callers(clock):
+    bucket = TokenBucket(60, capacity=1, clock=clock)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.reserve() == pytest.approx(2.0)
+
+
+def test_rate_limiter_waits_for_the_tighter_limit():
+    waits = []
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=600, sleep=waits.append)
+
+    limiter.acquire(600)
+    limiter.acquire(60)
+
+    assert waits == [pytest.approx(6.0, rel=0.01)]
+    assert limiter.waited == pytest.approx(6.0, rel=0.01)
+
+
+def test_backoff_retries_rate_limits_with_jitter():
+    sleeps = []
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise FakeRateLimitError()
+        return 'ok'
+
+    assert call_with_backoff(flaky, base_delay=1.0, sleep=sleeps.append) == 'ok'
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1.0 and 0 <= sleeps[1] <= 2.0
+
+
+def test_backoff_honours_retry_after_and_gives_up():
+    sleeps = []
+
+    def limited():
+        raise FakeRateLimitError(retry_after=7)
+
+    with pytest.raises(FakeRateLimitError):
+        call_with_backoff(limited, max_retries=2, sleep=sleeps.append)
+    assert sleeps == [7.0, 7.0]
+
+
+def test_backoff_does_not_retry_other_errors():
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError('bad request')
+
+    with pytest.raises(ValueError):
+        call_with_backoff(broken, sleep=lambda s: None)
+    assert len(calls) == 1
+
+
+def test_ordered_map_keeps_input_order():
+    def slow_square(n):
+        time.sleep(random.uniform(0, 0.01))
+        if n == 3:
+            raise ValueError('three')
+        return n * n
+
+    results = list(ordered_map(slow_square, iter(range(20)), max_workers=6))
+
+    assert [item for item, _, _ in results] == list(range(20))
+    assert results[4][1] == 16
+    assert isinstance(results[3][2], ValueError)
+
+
+def test_sync_classifies_concurrently_in_order():
+    gmail = FakeGmail([make_message(f'm{i:02d}', f'Application {i}') for i in range(24)])
+    openai_client = FakeOpenAI(latency=0.02, rate_limited_calls=2)
+    service = GmailService(openai_client, max_workers=8, classification_batch_size=1)
+    service.service = gmail
+
+    applications = service.fetch_job_application_emails()
+
+    assert [a['email_id'] for a in applications] == gmail.list_ids()
+    assert openai_client.max_in_flight > 1
+    assert openai_client.calls == 26
+
+
+BATCH_CORPUS = [
+    ('Your application to Acme', 'Thanks for applying to the Engineer role.'),
+    ('Weekly newsletter', 'Ten tips for your career.'),
+    ('Application received - Globex', 'We received your application.'),
+    ('New jobs for you', 'Jobs matching your profile.'),
+    ('Thank you for your application', 'Our team will review it.'),
+]
+
+
+def make_batch_service(openai_client, **kwargs):
+    gmail = FakeGmail([make_message(f'm{i}', subject, body) for i, (subject, body) in enumerate(BATCH_CORPUS)])
+    service = GmailService(openai_client, max_workers=1, **kwargs)
+    service.service = gmail
+    return service
+
+
+def decision_fields(applications_or_results):
+    return [
+        (r['is_job_application'], r['is_job_alert'], r['confidence'])
+        for r in applications_or_results
+    ]
+
+
+def test_batch_path_matches_single_path():
+    emails = [
+        {'message_id': f'm{i}', 'subject': subject, 'from': 'jobs@acme.com', 'body': body}
+        for i, (subject, body) in enumerate(BATCH_CORPUS)
+    ]
+    single_client = FakeOpenAI()
+    single = GmailService(single_client, classification_batch_size=1)
+    batch_client = FakeOpenAI()
+    batch = GmailService(batch_client, classification_batch_size=5)
+
+    single_results = [analysis for analysis, _ in single.classify_emails(emails[:1])] + [
+        single.analyze_email_with_openai(e['subject'], e['body'], e['from']) for e in emails[1:]
+    ]
+    batch_results = [analysis for analysis, _ in batch.classify_emails(emails)]
+
+    assert decision_fields(batch_results) == decision_fields(single_results)
+    assert batch_client.calls == 1
+    assert single_client.calls == 5
+
+
+def test_batching_cuts_request_count():
+    openai_client = FakeOpenAI()
+    service = make_batch_service(openai_client, classification_batch_size=2)
+
+    applications = service.fetch_job_application_emails()
+
+    assert openai_client.calls == 3
+    assert [a['email_id'] for a in applications] == ['m4', 'm2', 'm0']
+
+
+def test_unparseable_batch_falls_back_to_single_requests():
+    def responder(messages):
+        if '=== Email' in messages[-1]['content']:
+            return 'Sorry, I cannot help with that.'
+        return default_responder(messages)
+
+    openai_client = FakeOpenAI(responder=responder)
+    service = make_batch_service(openai_client, classification_batch_size=5)
+
+    applications = service.fetch_job_application_emails()
+
+    assert openai_client.calls == 1 + 5
+    assert [a['email_id'] for a in applications] == ['m4', 'm2', 'm0']
+
+
+def test_partial_batch_response_only_retries_missing_emails():
+    def responder(messages):
+        content = messages[-1]['content']
+        if '=== Email' not in content:
+            return default_responder(messages)
+        results = json.loads(default_responder(messages))
+        results[1]['confidence'] = 'high'
+        return json.dumps([r for r in results if r['index'] != 3])
+
+    openai_client = FakeOpenAI(responder=responder)
+    service = make_batch_service(openai_client, classification_batch_size=5)
+
+    service.fetch_job_application_emails()
+
+    assert openai_client.calls == 1 + 2
+
+
+def test_groups_respect_token_budget():
+    service = GmailService(classification_batch_size=10, classification_token_budget=1200)
+    emails = [
+        {'message_id': str(i), 'subject': 'Application', 'from': 'a@b.com', 'body': 'x' * 1500}
+        for i in range(4)
+    ]
+
+    groups = list(service._iter_classification_groups(iter(emails)))
+
+    assert [len(group) for group in groups] == [1, 1, 1, 1]
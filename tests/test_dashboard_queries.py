@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+
+from dashboard_queries import MAX_PAGE_SIZE, encode_cursor, page_applications, page_resumes
+from db_indexes import ensure_indexes
+
+USER_ID = ObjectId()
+
+
+def make_db(applications=(), resumes=()):
+    db = mongomock.MongoClient().resume_tracker
+    ensure_indexes(db)
+    for application in applications:
+        db.applications.insert_one(dict(application, user_id=USER_ID))
+    for resume in resumes:
+        db.resumes.insert_one(dict(resume, user_id=USER_ID))
+    return db
+
+
+def make_application(i, status='Applied', company=None, day=None):
+    return {
+        'company': company or f'Company {i:02d}',
+        'position': 'Engineer',
+        'status': status,
+        'status_color': 'primary',
+        'application_date': f"2024-05-{day or (i % 28) + 1:02d}T10:00:00+00:00",
+        'source': 'Gmail (AI Analysis)',
+        'email_id': f'm{i}',
+        'confidence': 90
+    }
+
+
+def collect(fetch, args):
+    pages = []
+    args = dict(args)
+    while True:
+        page = fetch(args)
+        pages.append(page)
+        if not page['next_cursor']:
+            return pages
+        args['cursor'] = page['next_cursor']
+
+
+def test_pages_cover_every_application_once_newest_first():
+    # Several applications share a date, so _id has to break ties
+    db = make_db([make_application(i, day=(i // 3) + 1) for i in range(20)])
+
+    pages = collect(lambda args: page_applications(db.applications, USER_ID, args), {'limit': '7'})
+
+    items = [item for page in pages for item in page['items']]
+    assert [len(page['items']) for page in pages] == [7, 7, 6]
+    assert len({item['id'] for item in items}) == 20
+    dates = [item['application_date'] for item in items]
+    assert dates == sorted(dates, reverse=True)
+    assert pages[-1]['has_more'] is False
+
+
+def test_ascending_company_sort_with_missing_values():
+    applications = [make_application(i) for i in range(5)]
+    applications[2].pop('company')
+    db = make_db(applications)
+
+    pages = collect(lambda args: page_applications(db.applications, USER_ID, args),
+                    {'limit': '2', 'sort': 'company', 'order': 'asc'})
+
+    companies = [item['company'] for page in pages for item in page['items']]
+    assert companies == [None, 'Company 00', 'Company 01', 'Company 03', 'Company 04']
+
+
+def test_projection_returns_only_requested_fields():
+    db = make_db([make_application(1)])
+
+    page = page_applications(db.applications, USER_ID, {'fields': 'company,status'})
+
+    assert page['items'] == [{'id': page['items'][0]['id'], 'company': 'Company 01', 'status': 'Applied'}]
+
+
+def test_filters_by_status_company_and_date():
+    db = make_db([
+        make_application(1, status='Interview', company='Acme', day=3),
+        make_application(2, status='Rejected', company='Acme Labs', day=10),
+        make_application(3, status='Interview', company='Globex', day=10),
+        make_application(4, status='Applied', company='acme', day=20),
+    ])
+
+    def companies(args):
+        return sorted(item['company'] for item in page_applications(db.applications, USER_ID, args)['items'])
+
+    assert companies({'status': 'Interview'}) == ['Acme', 'Globex']
+    assert companies({'status': 'Interview,Rejected'}) == ['Acme', 'Acme Labs', 'Globex']
+    assert companies({'company': 'acme'}) == ['Acme', 'Acme Labs', 'acme']
+    assert companies({'date_from': '2024-05-10', 'date_to': '2024-05-10'}) == ['Acme Labs', 'Globex']
+    assert companies({'company': 'a.me'}) == []
+
+
+def test_other_users_applications_are_not_returned():
+    db = make_db([make_application(1)])
+    db.applications.insert_one(dict(make_application(2), user_id=ObjectId()))
+
+    assert len(page_applications(db.applications, USER_ID, {})['items']) == 1
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'limit': 'ten'}, 'limit must be a number'),
+    ({'limit': '0'}, 'limit must be at least 1'),
+    ({'sort': 'position'}, 'sort must be one of'),
+    ({'order': 'sideways'}, 'order must be asc or desc'),
+    ({'fields': 'company,user_id'}, 'Unknown fields: user_id'),
+    ({'date_from': 'May 1'}, 'date_from must be a date'),
+    ({'cursor': 'garbage'}, 'Invalid cursor'),
+    ({'cursor': encode_cursor('company', 'Acme', ObjectId())}, 'Cursor does not match'),
+])
+def test_invalid_parameters_raise_value_error(args, message):
+    db = make_db()
+    with pytest.raises(ValueError, match=message):
+        page_applications(db.applications, USER_ID, args)
+
+
+def test_page_size_is_capped():
+    db = make_db([make_application(i) for i in range(MAX_PAGE_SIZE + 5)])
+
+    page = page_applications(db.applications, USER_ID, {'limit': '1000'})
+
+    assert len(page['items']) == MAX_PAGE_SIZE and page['has_more']
+
+
+def test_resume_pages_by_upload_date_with_extra_fields():
+    now = datetime(2024, 5, 1)
+    db = make_db(resumes=[
+        {'filename': f'cv-{i}.pdf', 's3_key': f'resumes/u/cv-{i}.pdf', 'upload_date': now + timedelta(days=i)}
+        for i in range(5)
+    ])
+
+    pages = collect(lambda args: page_resumes(db.resumes, USER_ID, args, extra_fields=('s3_key',)), {'limit': '2'})
+
+    items = [item for page in pages for item in page['items']]
+    assert [item['filename'] for item in items] == [f'cv-{i}.pdf' for i in reversed(range(5))]
+    assert items[0]['s3_key'] == 'resumes/u/cv-4.pdf'
+    assert items[0]['upload_date'] == '2024-05-05T00:00:00'
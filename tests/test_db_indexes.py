@@ -0,0 +1,140 @@
+import time
+
+import mongomock
+from pymongo.errors import ConfigurationError, ServerSelectionTimeoutError
+
+from db_indexes import HOT_QUERIES, INDEXES, IndexBootstrap, check_query_plans, ensure_indexes, plan_stages
+
+
+class UnreachableDB:
+    """Fails like an unreachable cluster for the first ``outages`` collection lookups."""
+
+    def __init__(self, outages, error):
+        self.db = mongomock.MongoClient().resume_tracker
+        self.outages = outages
+        self.error = error
+        self.lookups = 0
+
+    def __getitem__(self, name):
+        self.lookups += 1
+        if self.outages > 0:
+            self.outages -= 1
+            raise self.error
+        return self.db[name]
+
+
+def test_ensure_indexes_is_idempotent():
+    db = mongomock.MongoClient().resume_tracker
+
+    assert ensure_indexes(db) == []
+    assert ensure_indexes(db) == []
+
+    for collection_name, specs in INDEXES.items():
+        names = set(db[collection_name].index_information())
+        assert {options['name'] for _, options in specs} <= names
+    assert db.users.index_information()['email_unique']['unique'] is True
+    assert db.users.index_information()['username_unique']['unique'] is True
+
+
+def test_failed_index_is_reported_and_others_still_built():
+    db = mongomock.MongoClient().resume_tracker
+    db.users.insert_many([
+        {'email': 'dup@example.com', 'username': 'a'},
+        {'email': 'dup@example.com', 'username': 'b'},
+    ])
+
+    failures = ensure_indexes(db)
+
+    assert [(collection, name) for collection, name, _ in failures] == [('users', 'email_unique')]
+    assert 'username_unique' in db.users.index_information()
+
+
+def test_unreachable_mongodb_fails_every_index_at_once():
+    db = UnreachableDB(outages=1, error=ConfigurationError('The DNS query name does not exist'))
+
+    failures = ensure_indexes(db)
+
+    assert db.lookups == 1
+    assert len(failures) == sum(len(specs) for specs in INDEXES.values())
+
+
+def test_bootstrap_retries_only_failed_indexes():
+    db = mongomock.MongoClient().resume_tracker
+    db.users.insert_many([
+        {'email': 'dup@example.com', 'username': 'a'},
+        {'email': 'dup@example.com', 'username': 'b'},
+    ])
+    bootstrap = IndexBootstrap(db)
+
+    assert not bootstrap.ensure_once()
+    assert bootstrap.status()['pending'] == ['users.email_unique']
+    db.users.delete_one({'username': 'b'})
+
+    assert bootstrap.ensure_once()
+    assert bootstrap.status() == {'ensured': True, 'pending': [], 'attempts': 2, 'error': None}
+
+
+def test_bootstrap_keeps_trying_until_mongodb_answers():
+    db = UnreachableDB(outages=2, error=ServerSelectionTimeoutError('No servers found'))
+    bootstrap = IndexBootstrap(db, initial_delay=0.01, max_delay=0.02)
+
+    bootstrap.start()
+    deadline = time.monotonic() + 5
+    while not bootstrap.ensured and time.monotonic() < deadline:
+        time.sleep(0.01)
+    bootstrap.stop()
+
+    assert bootstrap.ensured
+    assert bootstrap.attempts == 3
+    assert 'email_unique' in db.db.users.index_information()
+
+
+def test_plan_stages_walks_classic_and_sbe_plans():
+    classic = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}
+    sbe = {'queryPlan': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}}}
+    union = {'stage': 'SUBPLAN', 'inputStage': {'stage': 'OR', 'inputStages': [
+        {'stage': 'IXSCAN'}, {'stage': 'COLLSCAN'}
+    ]}}
+
+    assert plan_stages(classic) == ['FETCH', 'IXSCAN']
+    assert plan_stages(sbe) == ['FETCH', 'IXSCAN']
+    assert plan_stages(union) == ['SUBPLAN', 'OR', 'IXSCAN', 'COLLSCAN']
+
+
+class ExplainingDB:
+    """Answers explain() with ``stage`` for one collection, IXSCAN otherwise."""
+
+    def __init__(self, slow_collection, stage='COLLSCAN'):
+        self.slow_collection = slow_collection
+        self.stage = stage
+
+    def __getitem__(self, name):
+        stage = self.stage if name == self.slow_collection else 'IXSCAN'
+        plan = {'queryPlanner': {'winningPlan': {'stage': 'FETCH', 'inputStage': {'stage': stage}}}}
+
+        class Cursor:
+            def sort(self, spec):
+                return self
+
+            def explain(self):
+                return plan
+
+        class Collection:
+            def find(self, query):
+                return Cursor()
+
+        return Collection()
+
+
+def test_check_query_plans_flags_collection_scans():
+    report = check_query_plans(ExplainingDB('resumes'))
+
+    failing = [name for name, _, ok in report if not ok]
+    assert failing and all('resume' in name for name in failing)
+
+
+def test_check_query_plans_flags_in_memory_sorts():
+    report = check_query_plans(ExplainingDB('applications', stage='SORT'))
+
+    failing = [name for name, _, ok in report if not ok]
+    assert failing == [name for name, collection, _, _ in HOT_QUERIES if collection == 'applications']
@@ -0,0 +1,79 @@
+import json
+import os
+
+from email_heuristics import evaluate, pre_classify
+from gmail_service import GmailService
+from fake_gmail import FakeGmail, make_message
+from fake_openai import FakeOpenAI
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'fixtures', 'heuristic_corpus.json')
+UNSUBSCRIBE = [{'name': 'List-Unsubscribe', 'value': '<https://example.com/u>'}, {'name': 'Precedence', 'value': 'bulk'}]
+
+
+def load_corpus():
+    with open(CORPUS) as f:
+        return json.load(f)
+
+
+def test_local_decisions_agree_with_ai_labels():
+    report = evaluate(GmailService(), load_corpus())
+
+    assert report['mistakes'] == []
+    assert report['precision'] == 1.0
+    assert report['negative_precision'] == 1.0
+    assert report['avoided_rate'] >= 0.3
+
+
+def test_ambiguous_emails_are_left_to_the_model():
+    service = GmailService()
+    email = {
+        'subject': 'Update on your application',
+        'from': 'HR <hr@umbrella.com>',
+        'body': 'Thank you for applying for the QA Engineer position. Unfortunately we will not be moving forward.'
+    }
+
+    assert pre_classify(service, email) is None
+
+
+def test_clear_confirmation_is_decided_locally():
+    email = {
+        'subject': 'Application received: Data Analyst',
+        'from': 'Acme Careers <careers@acmecorp.com>',
+        'body': 'Thank you for your application for the Data Analyst position.'
+    }
+
+    analysis = pre_classify(GmailService(), email)
+
+    assert analysis['is_job_application'] is True
+    assert analysis['position'] == 'Data Analyst'
+    assert analysis['confidence'] > 70
+
+
+def test_sync_skips_openai_for_local_decisions():
+    gmail = FakeGmail([
+        make_message('alert', '25 new jobs for Software Engineer', 'New jobs matching your search. Apply now.',
+                     sender='Indeed <alert@indeed.com>', extra_headers=UNSUBSCRIBE),
+        make_message('card', 'Your credit card application is approved', 'Approved.', sender='offers@bigbank.com'),
+        make_message('maybe', 'Your application status', 'Still in review.', sender='careers@wonka.com'),
+    ])
+    openai_client = FakeOpenAI()
+    service = GmailService(openai_client, classification_batch_size=1)
+    service.service = gmail
+
+    applications = service.fetch_job_application_emails()
+
+    assert openai_client.calls == 1
+    assert service.llm_calls_avoided == 2
+    assert [a['email_id'] for a in applications] == ['maybe']
+
+
+def test_heuristics_can_be_turned_off():
+    gmail = FakeGmail([make_message('card', 'Your credit card application', 'Approved.')])
+    openai_client = FakeOpenAI()
+    service = GmailService(openai_client, classification_batch_size=1, use_heuristics=False)
+    service.service = gmail
+
+    service.fetch_job_application_emails()
+
+    assert openai_client.calls == 1
+    assert service.llm_calls_avoided == 0
@@ -0,0 +1,163 @@
+import pytest
+
+from gmail_client_pool import GmailServicePool, build_gmail_service, credentials_from_dict
+
+CREDENTIALS = {
+    'token': 'access-token',
+    'refresh_token': 'refresh-token',
+    'token_uri': 'https://oauth2.googleapis.com/token',
+    'client_id': 'client-id',
+    'client_secret': 'client-secret',
+    'scopes': ['https://www.googleapis.com/auth/gmail.readonly']
+}
+
+
+class CountingBuilder:
+    """Stands in for build_gmail_service, counting the clients it builds."""
+
+    def __init__(self):
+        self.built = []
+
+    def __call__(self, credentials):
+        client = object()
+        self.built.append((client, credentials))
+        return client
+
+
+def make_pool(**kwargs):
+    builder = CountingBuilder()
+    return GmailServicePool(builder=builder, **kwargs), builder
+
+
+def test_builds_a_gmail_client_from_the_bundled_discovery_document():
+    service = build_gmail_service(credentials_from_dict(CREDENTIALS))
+
+    request = service.users().messages().list(userId='me', q='subject:job')
+    assert request.uri.startswith('https://gmail.googleapis.com/gmail/v1/users/me/messages')
+
+
+def test_repeat_syncs_reuse_the_client():
+    pool, builder = make_pool()
+
+    with pool.acquire('user-1', CREDENTIALS) as first:
+        pass
+    with pool.acquire('user-1', dict(CREDENTIALS, token='newer-access-token')) as second:
+        pass
+
+    assert first is second
+    assert len(builder.built) == 1
+    assert pool.stats()['hits'] == 1
+
+
+def test_clients_are_not_shared_between_users_or_credentials():
+    pool, builder = make_pool()
+
+    with pool.acquire('user-1', CREDENTIALS):
+        pass
+    with pool.acquire('user-2', CREDENTIALS):
+        pass
+    with pool.acquire('user-1', dict(CREDENTIALS, refresh_token='reconnected')):
+        pass
+
+    assert len(builder.built) == 3
+
+
+def test_concurrent_syncs_get_separate_clients():
+    pool, builder = make_pool()
+
+    with pool.acquire('user-1', CREDENTIALS) as first:
+        with pool.acquire('user-1', CREDENTIALS) as second:
+            assert first is not second
+    with pool.acquire('user-1', CREDENTIALS):
+        pass
+
+    assert len(builder.built) == 2
+    assert pool.stats()['idle'] == 2
+
+
+def test_client_is_dropped_when_the_sync_fails():
+    pool, builder = make_pool()
+
+    with pytest.raises(RuntimeError):
+        with pool.acquire('user-1', CREDENTIALS):
+            raise RuntimeError('connection reset')
+    with pool.acquire('user-1', CREDENTIALS):
+        pass
+
+    assert len(builder.built) == 2
+
+
+def test_idle_clients_expire(clock):
+    pool, builder = make_pool(idle_ttl=60, clock=clock)
+
+    with pool.acquire('user-1', CREDENTIALS):
+        pass
+    clock.now = 61
+    with pool.acquire('user-1', CREDENTIALS):
+        pass
+
+    assert len(builder.built) == 2
+
+
+def test_credentials_that_cannot_refresh_are_not_pooled():
+    pool, builder = make_pool()
+    no_refresh = dict(CREDENTIALS, refresh_token=None)
+
+    for _ in range(2):
+        with pool.acquire('user-1', no_refresh):
+            pass
+
+    assert len(builder.built) == 2
+
+
+def test_pool_is_bounded():
+    pool, builder = make_pool(max_entries=2)
+
+    for user_id in ('user-1', 'user-2', 'user-3'):
+        with pool.acquire(user_id, CREDENTIALS):
+            pass
+    with pool.acquire('user-1', CREDENTIALS):
+        pass
+
+    assert len(builder.built) == 4
+    assert pool.stats()['idle'] == 2
+
+
+def test_pooled_client_takes_on_a_newer_stored_token():
+    pool, builder = make_pool()
+    with pool.acquire('user-1', dict(CREDENTIALS, expiry='2024-05-01T12:00:00')):
+        pass
+
+    with pool.acquire('user-1', dict(CREDENTIALS, token='renewed', expiry='2024-05-01T13:00:00')):
+        pass
+
+    credentials = builder.built[0][1]
+    assert credentials.token == 'renewed'
+    assert credentials.expiry.isoformat() == '2024-05-01T13:00:00'
+
+
+def test_token_refreshed_during_use_is_reported():
+    pool, builder = make_pool()
+    refreshed = []
+
+    with pool.acquire('user-1', CREDENTIALS, on_refresh=refreshed.append):
+        pass
+    with pool.acquire('user-1', CREDENTIALS, on_refresh=refreshed.append):
+        builder.built[0][1].token = 'refreshed-mid-sync'
+
+    assert [credentials.token for credentials in refreshed] == ['refreshed-mid-sync']
+
+
+def test_invalidate_drops_a_users_clients():
+    pool, builder = make_pool()
+    with pool.acquire('user-1', CREDENTIALS):
+        pass
+    with pool.acquire('user-2', CREDENTIALS):
+        pass
+
+    pool.invalidate('user-1')
+
+    assert pool.stats()['idle'] == 1
+    with pool.acquire('user-1', CREDENTIALS):
+        pass
+    assert len(builder.built) == 3
@@ -0,0 +1,68 @@
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+from cryptography.fernet import Fernet
+
+from gmail_credentials import GmailCredentialStore, load_keys
+
+CREDENTIALS = {
+    'token': 'access-token',
+    'refresh_token': 'refresh-token',
+    'token_uri': 'https://oauth2.googleapis.com/token',
+    'client_id': 'client-id',
+    'client_secret': 'client-secret',
+    'scopes': ['https://www.googleapis.com/auth/gmail.readonly']
+}
+
+
+def make_store(keys):
+    return GmailCredentialStore(mongomock.MongoClient().resume_tracker.gmail_credentials, keys)
+
+
+def test_credentials_are_stored_encrypted():
+    store = make_store([Fernet(Fernet.generate_key())])
+    user_id = str(ObjectId())
+
+    store.save(user_id, CREDENTIALS)
+
+    doc = store.collection.find_one({'_id': ObjectId(user_id)})
+    assert b'refresh-token' not in doc['credentials']
+    assert store.load(user_id) == CREDENTIALS
+    assert store.exists(user_id)
+
+
+def test_missing_and_deleted_credentials():
+    store = make_store([Fernet(Fernet.generate_key())])
+    user_id = str(ObjectId())
+
+    assert store.load(user_id) is None
+    store.save(user_id, CREDENTIALS)
+    store.delete(user_id)
+
+    assert store.load(user_id) is None and not store.exists(user_id)
+
+
+def test_keys_can_be_rotated():
+    old, new = Fernet(Fernet.generate_key()), Fernet(Fernet.generate_key())
+    store = make_store([old])
+    user_id = str(ObjectId())
+    store.save(user_id, CREDENTIALS)
+
+    rotated = GmailCredentialStore(store.collection, [new, old])
+    assert rotated.load(user_id) == CREDENTIALS
+    rotated.rotate(user_id)
+
+    assert GmailCredentialStore(store.collection, [new]).load(user_id) == CREDENTIALS
+    assert GmailCredentialStore(store.collection, [Fernet(Fernet.generate_key())]).load(user_id) is None
+
+
+def test_load_keys(monkeypatch):
+    key = Fernet.generate_key().decode()
+    monkeypatch.setenv('GMAIL_CREDENTIALS_KEY', f'{key}, {Fernet.generate_key().decode()}')
+    assert len(load_keys('secret')) == 2
+
+    monkeypatch.delenv('GMAIL_CREDENTIALS_KEY')
+    derived = load_keys('secret')
+    assert derived[0].decrypt(load_keys('secret')[0].encrypt(b'x')) == b'x'
+    with pytest.raises(ValueError):
+        load_keys(None)
@@ -0,0 +1,291 @@
+import base64
+
+import pytest
+
+from gmail_service import GmailService
+from instrumentation import SYNC_MESSAGES, SYNC_STAGE_SECONDS
+from fake_gmail import FakeGmail, make_http_error, make_message
+
+
+class FakeClassifier(GmailService):
+    """GmailService whose AI step is a canned answer instead of OpenAI."""
+
+    def __init__(self, **kwargs):
+        # One email per request so every email goes through the override
+        kwargs.setdefault('classification_batch_size', 1)
+        super().__init__(**kwargs)
+        self.analyzed = []
+
+    def analyze_email_with_openai(self, subject, body, from_header):
+        self.analyzed.append(subject)
+        return {
+            'is_job_application': 'application' in subject.lower(),
+            'is_job_alert': False,
+            'company_name': 'Acme',
+            'position': 'Engineer',
+            'status': 'Applied',
+            'confidence': 90
+        }
+
+
+def make_service(gmail, **kwargs):
+    service = FakeClassifier(**kwargs)
+    service.service = gmail
+    return service
+
+
+def test_messages_are_fetched_in_batches():
+    gmail = FakeGmail([make_message(f'm{i}', f'Application {i}') for i in range(12)])
+    service = make_service(gmail, batch_size=5)
+
+    batches = list(service.iter_message_batches([f'm{i}' for i in range(12)]))
+
+    assert gmail.batch_sizes == [5, 5, 2]
+    assert [len(batch) for batch in batches] == [5, 5, 2]
+    assert [message_id for batch in batches for message_id, _, _ in batch] == [f'm{i}' for i in range(12)]
+
+
+def test_batch_size_is_capped_at_gmail_limit():
+    service = make_service(FakeGmail(), batch_size=500)
+    assert service.batch_size == 100
+
+
+def test_failed_message_does_not_abort_batch():
+    gmail = FakeGmail(
+        [make_message('a', 'Application A'), make_message('b', 'Application B')],
+        errors={'a': make_http_error(429, 'Rate Limit Exceeded')}
+    )
+    service = make_service(gmail)
+
+    results = list(service.iter_messages(['a', 'b', 'missing']))
+
+    assert results[0][0] == 'a' and results[0][1] is None and results[0][2].resp.status == 429
+    assert results[1][0] == 'b' and results[1][1]['id'] == 'b' and results[1][2] is None
+    assert results[2][0] == 'missing' and results[2][2].resp.status == 404
+
+
+def test_failed_batch_reports_every_message():
+    gmail = FakeGmail([make_message('a', 'Application A'), make_message('b', 'Application B')])
+    gmail.fail_batches.append(ConnectionError('connection reset'))
+    service = make_service(gmail, batch_size=1)
+
+    results = list(service.iter_messages(['a', 'b']))
+
+    assert isinstance(results[0][2], ConnectionError)
+    assert results[1][1]['id'] == 'b'
+
+
+def test_fetch_job_application_emails_uses_batches():
+    gmail = FakeGmail([
+        make_message('m1', 'Your application to Acme', body='Thanks for applying'),
+        make_message('m2', 'Weekly job opportunities'),
+        make_message('m3', 'Credit card application approved'),
+        make_message('m4', 'Application received'),
+    ], errors={'m4': make_http_error(500, 'Backend Error')})
+    service = make_service(gmail, batch_size=2)
+
+    applications = service.fetch_job_application_emails()
+
+    assert gmail.list_calls == 1
+    assert gmail.batch_sizes == [2, 2]
+    assert [a['email_id'] for a in applications] == ['m1']
+    assert 'Credit card application approved' not in service.analyzed
+    assert applications[0]['application_date'].startswith('2024-05-06')
+
+
+def test_sync_stages_are_timed():
+    gmail = FakeGmail([
+        make_message('m1', 'Application received'),
+        make_message('m2', 'Job alert: new openings'),
+    ])
+    service = make_service(gmail)
+    stages = ('gmail_profile', 'gmail_list', 'gmail_get', 'decode')
+    before = {stage: SYNC_STAGE_SECONDS.labels(stage=stage).count for stage in stages}
+    accepted = SYNC_MESSAGES.labels(outcome='application').value
+
+    service.fetch_job_application_emails()
+
+    assert {stage: SYNC_STAGE_SECONDS.labels(stage=stage).count - before[stage] for stage in stages} == {
+        'gmail_profile': 1, 'gmail_list': 1, 'gmail_get': 1, 'decode': 2
+    }
+    assert SYNC_MESSAGES.labels(outcome='application').value == accepted + 1
+
+
+def test_uninitialized_service_raises():
+    with pytest.raises(Exception):
+        list(GmailService().iter_message_batches(['a']))
+
+
+def test_first_sync_is_a_full_scan():
+    gmail = FakeGmail([make_message('m1', 'Application received')])
+    service = make_service(gmail)
+
+    service.fetch_job_application_emails()
+
+    assert service.sync_mode == 'full'
+    assert service.history_id == str(gmail.history_id)
+    assert service.seen_message_ids == ['m1']
+    assert gmail.list_calls == 1 and gmail.history_calls == 0
+
+
+def test_incremental_sync_only_fetches_new_messages():
+    gmail = FakeGmail([make_message(f'old{i}', f'Application {i}') for i in range(20)])
+    first = make_service(gmail)
+    first.fetch_job_application_emails()
+    checkpoint = {'history_id': first.history_id, 'message_ids': first.seen_message_ids}
+
+    gmail.add_message(make_message('new1', 'Your application to Acme'))
+    gmail.add_message(make_message('promo', 'Big sale this weekend'))
+    gmail.add_message(make_message('sent', 'Re: application'), label_ids=('SENT',))
+    gmail.get_calls = 0
+    service = make_service(gmail)
+
+    applications = service.fetch_job_application_emails(checkpoint=checkpoint)
+
+    assert service.sync_mode == 'incremental'
+    assert gmail.list_calls == 1
+    assert gmail.get_calls == 2
+    assert service.analyzed == ['Your application to Acme']
+    assert [a['email_id'] for a in applications] == ['new1']
+    assert service.history_id == str(gmail.history_id)
+
+
+def test_incremental_sync_skips_already_seen_messages():
+    gmail = FakeGmail()
+    gmail.add_message(make_message('m1', 'Application received'))
+    service = make_service(gmail)
+
+    service.fetch_job_application_emails(checkpoint={'history_id': '1000', 'message_ids': ['m1']})
+
+    assert gmail.get_calls == 0
+    assert service.analyzed == []
+
+
+def test_expired_checkpoint_falls_back_to_full_scan():
+    gmail = FakeGmail([make_message('m1', 'Application received')])
+    checkpoint = {'history_id': '1000', 'message_ids': []}
+    gmail.expire_history()
+    service = make_service(gmail)
+
+    applications = service.fetch_job_application_emails(checkpoint=checkpoint)
+
+    assert service.sync_mode == 'full'
+    assert gmail.list_calls == 1
+    assert [a['email_id'] for a in applications] == ['m1']
+
+
+def test_failed_message_keeps_checkpoint_in_place():
+    gmail = FakeGmail()
+    gmail.add_message(make_message('ok', 'Application A'))
+    gmail.add_message(make_message('bad', 'Application B'))
+    gmail.errors['bad'] = make_http_error(500, 'Backend Error')
+    service = make_service(gmail)
+
+    service.fetch_job_application_emails(checkpoint={'history_id': '1000', 'message_ids': []})
+
+    assert service.history_id == '1000'
+    assert service.seen_message_ids == ['ok']
+
+
+def test_deleted_message_does_not_hold_the_checkpoint():
+    gmail = FakeGmail()
+    gmail.add_message(make_message('ok', 'Application A'))
+    gmail.add_message(make_message('deleted', 'Application B'))
+    del gmail.messages['deleted']
+    service = make_service(gmail)
+
+    service.fetch_job_application_emails(checkpoint={'history_id': '1000', 'message_ids': []})
+
+    assert service.history_id == str(gmail.history_id)
+    assert service.seen_message_ids == ['ok', 'deleted']
+
+
+def test_body_in_another_charset_is_classified():
+    gmail = FakeGmail()
+    message = make_message('latin', 'Application received')
+    message['payload']['body']['data'] = base64.urlsafe_b64encode('Merci, équipe'.encode('latin-1')).decode('ascii')
+    gmail.add_message(message)
+    service = make_service(gmail)
+
+    applications = service.fetch_job_application_emails()
+
+    assert [a['email_id'] for a in applications] == ['latin']
+    assert service.history_id == str(gmail.history_id)
+    assert service.seen_message_ids == ['latin']
+
+
+def test_unparseable_message_is_skipped_as_seen():
+    gmail = FakeGmail()
+    gmail.add_message(make_message('ok', 'Application A'))
+    gmail.add_message({'id': 'broken', 'payload': {}})
+    service = make_service(gmail)
+
+    service.fetch_job_application_emails(checkpoint={'history_id': '1000', 'message_ids': []})
+
+    assert service.history_id == str(gmail.history_id)
+    assert service.seen_message_ids == ['ok', 'broken']
+
+
+def test_messages_beyond_one_sync_are_left_for_the_next():
+    gmail = FakeGmail()
+    gmail.add_message(make_message('early', 'Your application to Acme'))
+    for i in range(120):
+        gmail.add_message(make_message(f'promo{i}', f'Big sale {i}'))
+    first = make_service(gmail)
+
+    first.fetch_job_application_emails(checkpoint={'history_id': '1000', 'message_ids': []})
+    second = make_service(gmail)
+    applications = second.fetch_job_application_emails(checkpoint={
+        'history_id': first.history_id, 'message_ids': first.seen_message_ids
+    })
+
+    assert first.history_id == '1000' and 'early' not in first.seen_message_ids
+    assert [a['email_id'] for a in applications] == ['early']
+    assert second.history_id == str(gmail.history_id)
+
+
+def test_history_is_paged():
+    gmail = FakeGmail()
+    gmail.history_page_size = 2
+    for i in range(5):
+        gmail.add_message(make_message(f'm{i}', f'Application {i}'))
+    service = make_service(gmail)
+
+    assert service.list_added_message_ids('1000') == [f'm{i}' for i in range(5)]
+    assert gmail.history_calls == 3
+
+
+def test_progress_is_reported_for_every_message():
+    gmail = FakeGmail([make_message(f'm{i}', f'Application {i}') for i in range(3)] +
+                      [make_message('x', 'Newsletter')])
+    service = make_service(gmail)
+    progress = []
+
+    service.fetch_job_application_emails(on_progress=lambda *args: progress.append(args))
+
+    assert progress[0] == (0, 4, 0)
+    assert progress[-1] == (4, 4, 3)
+    assert [processed for processed, _, _ in progress] == sorted(processed for processed, _, _ in progress)
+
+
+def test_sync_events_stream_one_email_at_a_time():
+    gmail = FakeGmail([make_message('x', 'Newsletter')] +
+                      [make_message(f'm{i}', f'Application {i}') for i in range(12)])
+    service = make_service(gmail, batch_size=5, max_workers=1)
+
+    events = service.iter_sync_events()
+    start = next(events)
+    first = next(events)
+
+    assert start == {'type': 'start', 'mode': 'full', 'processed': 0, 'total': 13}
+    assert first['type'] == 'email' and first['processed'] == 1
+    assert first['application']['email_id'] == first['message_id']
+    # Only the first Gmail batch has been fetched so far
+    assert gmail.batch_sizes == [5]
+
+    rest = list(events)
+    assert gmail.batch_sizes == [5, 5, 3]
+    emails = [first] + [event for event in rest if event['type'] == 'email']
+    assert len(emails) == 13
+    assert sum(1 for event in emails if event['application'] is None) == 1
+    assert rest[-1] == {'type': 'done', 'mode': 'full', 'processed': 13, 'total': 13, 'found': 12}
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+import threading
+import time
+
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+from cryptography.fernet import Fernet
+
+from gmail_credentials import GmailCredentialStore
+from gmail_tokens import GmailTokenManager
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+CREDENTIALS = {
+    'token': 'token-0',
+    'refresh_token': 'refresh-token',
+    'token_uri': 'https://oauth2.googleapis.com/token',
+    'client_id': 'client-id',
+    'client_secret': 'client-secret',
+    'scopes': ['https://www.googleapis.com/auth/gmail.readonly']
+}
+
+
+class CountingRefresher:
+    """Stands in for Google's token endpoint, issuing numbered one-hour tokens."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, credentials):
+        with self._lock:
+            self.calls += 1
+            number = self.calls
+        time.sleep(self.delay)
+        return dict(credentials, token=f'token-{number}', expiry=(NOW + timedelta(hours=1)).isoformat())
+
+
+def make_manager(expiry, refresher=None, **kwargs):
+    store = GmailCredentialStore(mongomock.MongoClient().resume_tracker.gmail_credentials,
+                                 [Fernet(Fernet.generate_key())])
+    user_id = str(ObjectId())
+    store.save(user_id, dict(CREDENTIALS, expiry=expiry.isoformat() if expiry else None))
+    kwargs.setdefault('sleep', lambda seconds: None)
+    manager = GmailTokenManager(store, refresher=refresher or CountingRefresher(), clock=lambda: NOW, **kwargs)
+    return manager, user_id
+
+
+def test_fresh_token_is_used_as_is():
+    manager, user_id = make_manager(NOW + timedelta(minutes=30))
+
+    assert manager.get(user_id)['token'] == 'token-0'
+    assert manager.refresher.calls == 0
+
+
+def test_expiring_token_is_refreshed_and_saved():
+    manager, user_id = make_manager(NOW + timedelta(minutes=2))
+
+    credentials = manager.get(user_id)
+
+    assert credentials['token'] == 'token-1'
+    stored = manager.store.load(user_id)
+    assert stored['token'] == 'token-1'
+    assert stored['expiry'] == (NOW + timedelta(hours=1)).isoformat()
+    # The next sync uses the saved token
+    assert manager.get(user_id)['token'] == 'token-1'
+    assert manager.refresher.calls == 1
+
+
+def test_credentials_without_expiry_are_refreshed_once():
+    manager, user_id = make_manager(None)
+
+    manager.get(user_id)
+    manager.get(user_id)
+
+    assert manager.refresher.calls == 1
+
+
+def test_concurrent_refreshes_for_a_user_are_serialized():
+    manager, user_id = make_manager(NOW - timedelta(minutes=1), refresher=CountingRefresher(delay=0.05))
+    tokens = []
+
+    threads = [threading.Thread(target=lambda: tokens.append(manager.get(user_id)['token'])) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert manager.refresher.calls == 1
+    assert tokens == ['token-1'] * 6
+
+
+def test_refresh_held_by_another_process_is_awaited():
+    manager, user_id = make_manager(NOW - timedelta(minutes=1))
+    assert manager.store.claim_refresh(user_id, 30)
+
+    def other_process_finishes(seconds):
+        manager.store.save(user_id, dict(CREDENTIALS, token='from-other-process',
+                                         expiry=(NOW + timedelta(hours=1)).isoformat()))
+
+    manager._sleep = other_process_finishes
+
+    assert manager.get(user_id)['token'] == 'from-other-process'
+    assert manager.refresher.calls == 0
+
+
+def test_failed_refresh_releases_the_lease():
+    def revoked(credentials):
+        raise RuntimeError('invalid_grant')
+
+    manager, user_id = make_manager(NOW - timedelta(minutes=1), refresher=revoked)
+
+    with pytest.raises(RuntimeError):
+        manager.get(user_id)
+    assert manager.store.claim_refresh(user_id, 30)
+
+
+def test_background_pass_refreshes_only_active_users():
+    manager, active = make_manager(NOW + timedelta(minutes=1))
+    idle = str(ObjectId())
+    manager.store.save(idle, dict(CREDENTIALS, expiry=(NOW + timedelta(minutes=1)).isoformat()))
+    manager.store.mark_used(active)
+
+    assert manager.refresh_due() == 1
+    assert manager.store.load(active)['token'] == 'token-1'
+    assert manager.store.load(idle)['token'] == 'token-0'
+
+
+def test_token_refreshed_during_a_sync_is_recorded():
+    manager, user_id = make_manager(NOW + timedelta(minutes=30))
+
+    class Refreshed:
+        token = 'refreshed-by-google-auth'
+        refresh_token = 'refresh-token'
+        token_uri = CREDENTIALS['token_uri']
+        client_id = CREDENTIALS['client_id']
+        client_secret = CREDENTIALS['client_secret']
+        scopes = CREDENTIALS['scopes']
+        expiry = NOW + timedelta(hours=1)
+
+    manager.record(user_id, Refreshed())
+
+    assert manager.store.load(user_id)['token'] == 'refreshed-by-google-auth'
@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+from flask import Flask
+
+from instrumentation import MetricsRegistry, instrument_app
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('stage_seconds', 'Stage time.', ['stage'], buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, stage='openai')
+
+    assert registry.render().splitlines() == [
+        '# HELP stage_seconds Stage time.',
+        '# TYPE stage_seconds histogram',
+        'stage_seconds_bucket{stage="openai",le="0.1"} 2',
+        'stage_seconds_bucket{stage="openai",le="1.0"} 3',
+        'stage_seconds_bucket{stage="openai",le="+Inf"} 4',
+        'stage_seconds_sum{stage="openai"} 3.65',
+        'stage_seconds_count{stage="openai"} 4',
+    ]
+
+
+def test_counter_escapes_label_values():
+    registry = MetricsRegistry()
+    counter = registry.counter('messages_total', 'Messages.', ['outcome'])
+
+    counter.inc(outcome='say "hi"\n')
+    counter.inc(2, outcome='say "hi"\n')
+
+    assert 'messages_total{outcome="say \\"hi\\"\\n"} 3' in registry.render()
+
+
+def test_timer_observes_blocks_that_raise():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('stage_seconds', 'Stage time.', ['stage'])
+
+    with pytest.raises(RuntimeError):
+        with histogram.time(stage='gmail_get'):
+            raise RuntimeError('connection reset')
+
+    assert histogram.labels(stage='gmail_get').count == 1
+
+
+def test_metric_names_are_unique():
+    registry = MetricsRegistry()
+    registry.counter('syncs_total', 'Syncs.')
+
+    with pytest.raises(ValueError):
+        registry.histogram('syncs_total', 'Syncs.')
+
+
+def test_concurrent_increments_are_not_lost():
+    registry = MetricsRegistry()
+    counter = registry.counter('messages_total', 'Messages.').labels()
+
+    def work():
+        for _ in range(10000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value == 40000
+
+
+def test_requests_are_timed_per_endpoint():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('http_request_duration_seconds', 'Latency.', ['method', 'endpoint', 'status'])
+    app = Flask(__name__)
+
+    @app.route('/api/applications/<item_id>')
+    def application(item_id):
+        return {'id': item_id}
+
+    @app.route('/api/broken')
+    def broken():
+        raise RuntimeError('boom')
+
+    instrument_app(app, histogram)
+    client = app.test_client()
+    client.get('/api/applications/1')
+    client.get('/api/applications/2')
+    client.get('/wp-login.php')
+    client.get('/api/broken')
+
+    assert histogram.labels(method='GET', endpoint='application', status=200).count == 2
+    assert histogram.labels(method='GET', endpoint='unmatched', status=404).count == 1
+    assert histogram.labels(method='GET', endpoint='broken', status=500).count == 1
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from flask import Flask, jsonify, session
+
+from db_indexes import ensure_indexes
+from mongo_session import MongoSessionInterface
+
+
+@pytest.fixture
+def setup(counting_collection):
+    db = mongomock.MongoClient().resume_tracker
+    ensure_indexes(db)
+    sessions = counting_collection(db.sessions)
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    app.session_interface = MongoSessionInterface(sessions, refresh_interval=3600)
+
+    @app.route('/set/<value>')
+    def set_value(value):
+        session['value'] = value
+        return jsonify({})
+
+    @app.route('/get')
+    def get_value():
+        return jsonify({'value': session.get('value')})
+
+    @app.route('/clear')
+    def clear():
+        session.clear()
+        return jsonify({})
+
+    return app.test_client(), sessions
+
+
+def session_cookie(response):
+    return [header for header in response.headers.getlist('Set-Cookie') if header.startswith('session=')]
+
+
+def test_session_round_trips_through_mongodb(setup):
+    client, sessions = setup
+
+    client.get('/set/hello')
+
+    assert client.get('/get').get_json() == {'value': 'hello'}
+    doc = sessions.collection.find_one()
+    assert doc['data'] == {'value': 'hello'}
+    assert len(doc['_id']) >= 40
+
+
+def test_unchanged_sessions_are_not_written(setup):
+    client, sessions = setup
+    client.get('/set/hello')
+
+    for _ in range(5):
+        response = client.get('/get')
+
+    assert sessions.count('update_one') == 1
+    assert session_cookie(response) == []
+
+
+def test_empty_sessions_are_never_stored(setup):
+    client, sessions = setup
+
+    response = client.get('/get')
+
+    assert sessions.count('update_one') == 0
+    assert session_cookie(response) == []
+
+
+def test_expiry_is_refreshed_once_the_interval_passes(setup):
+    client, sessions = setup
+    client.get('/set/hello')
+    lifetime = timedelta(days=31)
+    sessions.collection.update_many({}, {'$set': {'expires_at': datetime.utcnow() + lifetime - timedelta(hours=2)}})
+
+    response = client.get('/get')
+
+    assert sessions.count('update_one') == 2
+    assert session_cookie(response)
+    assert sessions.collection.find_one()['expires_at'] > datetime.utcnow() + lifetime - timedelta(minutes=1)
+
+
+def test_expired_session_starts_fresh(setup):
+    client, sessions = setup
+    client.get('/set/hello')
+    sessions.collection.update_many({}, {'$set': {'expires_at': datetime.utcnow() - timedelta(seconds=1)}})
+
+    assert client.get('/get').get_json() == {'value': None}
+
+
+def test_cleared_session_is_deleted(setup):
+    client, sessions = setup
+    client.get('/set/hello')
+
+    client.get('/clear')
+
+    assert sessions.collection.count_documents({}) == 0
+    assert client.get('/get').get_json() == {'value': None}
@@ -0,0 +1,85 @@
+import boto3
+import pytest
+import requests
+from moto import mock_aws
+
+from presigned_urls import PresignedUrlCache
+
+BUCKET = 'resume-tracker-test'
+
+
+class CountingS3:
+    """Wraps an S3 client and counts signing calls."""
+
+    def __init__(self, client):
+        self.client = client
+        self.signed = []
+
+    def generate_presigned_url(self, *args, **kwargs):
+        self.signed.append(kwargs['Params']['Key'])
+        return self.client.generate_presigned_url(*args, **kwargs)
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1',
+                              aws_access_key_id='testing', aws_secret_access_key='testing')
+        client.create_bucket(Bucket=BUCKET)
+        yield CountingS3(client)
+
+
+def test_url_is_signed_once_and_reused(s3, clock):
+    cache = PresignedUrlCache(s3, BUCKET, ttl=3600, refresh_margin=300, clock=clock)
+
+    first = cache.url('resumes/u1/cv.pdf')
+    second = cache.url('resumes/u1/cv.pdf')
+
+    assert first == second
+    assert s3.signed == ['resumes/u1/cv.pdf']
+    assert cache.stats()['hits'] == 1
+
+
+def test_cached_url_downloads_the_object(s3):
+    s3.client.put_object(Bucket=BUCKET, Key='resumes/u1/cv.pdf', Body=b'resume')
+    cache = PresignedUrlCache(s3, BUCKET)
+
+    assert requests.get(cache.url('resumes/u1/cv.pdf')).content == b'resume'
+
+
+def test_url_is_refreshed_before_it_expires(s3, clock):
+    cache = PresignedUrlCache(s3, BUCKET, ttl=3600, refresh_margin=300, clock=clock)
+    _, expires_at = cache.get('resumes/u1/cv.pdf')
+
+    clock.now += 3600 - 301
+    assert cache.get('resumes/u1/cv.pdf')[1] == expires_at
+    clock.now += 2
+    _, refreshed = cache.get('resumes/u1/cv.pdf')
+
+    assert refreshed == clock.now + 3600
+    assert len(s3.signed) == 2
+
+
+def test_cache_is_bounded_and_drops_expiring_entries_first(s3, clock):
+    cache = PresignedUrlCache(s3, BUCKET, ttl=3600, refresh_margin=300, max_entries=2, clock=clock)
+    cache.url('old')
+    clock.now += 3400
+    cache.url('a')
+    cache.url('old')  # re-signed, so it's fresh again
+    cache.url('b')
+
+    assert cache.stats()['entries'] == 2
+    cache.url('old')
+    assert s3.signed == ['old', 'a', 'old', 'b']
+
+    cache.url('c')
+    assert cache.stats()['entries'] == 2
+
+
+def test_invalidate_forces_a_new_signature(s3, clock):
+    cache = PresignedUrlCache(s3, BUCKET, clock=clock)
+    cache.url('resumes/u1/cv.pdf')
+    cache.invalidate('resumes/u1/cv.pdf')
+    cache.url('resumes/u1/cv.pdf')
+
+    assert len(s3.signed) == 2
@@ -0,0 +1,137 @@
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+from flask import Flask, jsonify, request
+
+from response_cache import ResponseCache, bump_data_version, cached_json, get_data_version
+
+USER_ID = str(ObjectId())
+
+
+@pytest.fixture
+def setup():
+    db = mongomock.MongoClient().resume_tracker
+    cache = ResponseCache()
+    built = []
+    app = Flask(__name__)
+
+    def current_version():
+        return USER_ID, get_data_version(db.data_versions, USER_ID)
+
+    @app.route('/items')
+    @cached_json(cache, current_version, cacheable=lambda: request.args.get('fresh') != '1')
+    def items():
+        built.append(request.full_path)
+        if request.args.get('fail'):
+            return jsonify({'error': 'nope'}), 500
+        return jsonify({'items': [1, 2, 3], 'built': len(built)})
+
+    return app.test_client(), db, cache, built
+
+
+def test_repeat_requests_are_served_from_cache(setup):
+    client, _, cache, built = setup
+
+    first = client.get('/items')
+    second = client.get('/items')
+
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    assert len(built) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_matching_etag_returns_304_without_building(setup):
+    client, _, cache, built = setup
+    etag = client.get('/items').headers['ETag']
+
+    response = client.get('/items', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    assert len(built) == 1
+    assert cache.stats()['not_modified'] == 1
+
+
+def test_version_bump_invalidates(setup):
+    client, db, _, built = setup
+    etag = client.get('/items').headers['ETag']
+
+    bump_data_version(db.data_versions, USER_ID)
+    response = client.get('/items', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['built'] == 2
+    assert get_data_version(db.data_versions, USER_ID) == 1
+
+
+def test_query_string_is_part_of_the_key(setup):
+    client, _, _, built = setup
+
+    client.get('/items?page=1')
+    client.get('/items?page=2')
+    client.get('/items?page=1')
+
+    assert built == ['/items?page=1', '/items?page=2']
+
+
+def test_errors_and_uncacheable_requests_are_not_cached(setup):
+    client, _, cache, built = setup
+
+    assert client.get('/items?fail=1').status_code == 500
+    assert client.get('/items?fail=1').status_code == 500
+    fresh = client.get('/items?fresh=1')
+
+    assert len(built) == 3
+    assert 'ETag' not in fresh.headers
+    assert cache.stats()['entries'] == 0
+
+
+def test_attached_parts_are_added_per_request_and_tagged():
+    db = mongomock.MongoClient().resume_tracker
+    cache = ResponseCache()
+    built = []
+    signatures = iter(['sig1', 'sig1', 'sig2'])
+    app = Flask(__name__)
+
+    def current_version():
+        return USER_ID, get_data_version(db.data_versions, USER_ID)
+
+    def attach(payload):
+        payload['url'] = f"https://bucket/{payload['key']}?{next(signatures)}"
+        return payload
+
+    @app.route('/resumes')
+    @cached_json(cache, current_version, attach=attach)
+    def resumes():
+        built.append(request.full_path)
+        return jsonify({'key': 'resume.pdf'})
+
+    client = app.test_client()
+    first = client.get('/resumes')
+    same = client.get('/resumes', headers={'If-None-Match': first.headers['ETag']})
+    resigned = client.get('/resumes', headers={'If-None-Match': first.headers['ETag']})
+
+    assert first.get_json() == {'key': 'resume.pdf', 'url': 'https://bucket/resume.pdf?sig1'}
+    assert same.status_code == 304
+    assert resigned.status_code == 200 and resigned.get_json()['url'].endswith('sig2')
+    assert resigned.headers['ETag'] != first.headers['ETag']
+    assert len(built) == 1
+
+
+def test_cache_is_bounded_and_skips_large_bodies():
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+
+    cache.put(USER_ID, 0, '/a', b'a')
+    cache.put(USER_ID, 0, '/b', b'b')
+    cache.get(USER_ID, 0, '/a')
+    cache.put(USER_ID, 0, '/c', b'c')
+    cache.put(USER_ID, 0, '/big', b'x' * 11)
+
+    assert cache.get(USER_ID, 0, '/a') == b'a'
+    assert cache.get(USER_ID, 0, '/b') is None
+    assert cache.get(USER_ID, 0, '/big') is None
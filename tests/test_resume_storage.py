@@ -0,0 +1,359 @@
+import base64
+import hashlib
+import io
+import json
+from datetime import datetime, timedelta
+
+import boto3
+import mongomock
+import pytest
+import requests
+from bson.objectid import ObjectId
+from moto import mock_aws
+
+from db_indexes import ensure_indexes
+from resume_storage import ResumeStorage
+
+BUCKET = 'resume-tracker-test'
+PDF = 'application/pdf'
+USER_ID = str(ObjectId())
+
+
+@pytest.fixture
+def storage():
+    with mock_aws():
+        s3 = boto3.client('s3', region_name='us-east-1',
+                          aws_access_key_id='testing', aws_secret_access_key='testing')
+        s3.create_bucket(Bucket=BUCKET)
+        db = mongomock.MongoClient().resume_tracker
+        ensure_indexes(db)
+        yield ResumeStorage(s3, BUCKET, db.resume_uploads, db.resumes, db.resume_blobs, max_bytes=1024)
+
+
+def post_file(upload, body, content_type=PDF):
+    fields = dict(upload['fields'], **{'Content-Type': content_type})
+    return requests.post(upload['url'], data=fields, files={'file': ('resume.pdf', body)})
+
+
+def test_browser_upload_is_recorded_after_complete(storage):
+    upload = storage.init_upload(USER_ID, 'My CV.pdf', PDF, 12)
+
+    assert post_file(upload, b'%PDF-1.4 cv').status_code in (200, 204)
+    resume = storage.complete_upload(USER_ID, upload['upload_id'])
+
+    assert resume['filename'] == 'My CV.pdf'
+    assert resume['s3_key'].startswith(f'resumes/{USER_ID}/') and resume['s3_key'].endswith('.pdf')
+    assert resume['size'] == len(b'%PDF-1.4 cv')
+    assert storage.resumes.count_documents({'user_id': ObjectId(USER_ID)}) == 1
+    assert storage.uploads.count_documents({}) == 0
+    body = storage.s3.get_object(Bucket=BUCKET, Key=resume['s3_key'])['Body'].read()
+    assert body == b'%PDF-1.4 cv'
+
+
+def test_each_upload_gets_its_own_key(storage):
+    first = storage.init_upload(USER_ID, 'cv.pdf', PDF)
+    second = storage.init_upload(USER_ID, 'cv.pdf', PDF)
+
+    assert first['fields']['key'] != second['fields']['key']
+
+
+def test_policy_limits_size_and_type(storage):
+    upload = storage.init_upload(USER_ID, 'cv.pdf', PDF)
+
+    policy = json.loads(base64.b64decode(upload['fields']['policy']))
+    assert ['content-length-range', 1, 1024] in policy['conditions']
+    assert {'Content-Type': PDF} in policy['conditions']
+    assert {'key': upload['fields']['key']} in policy['conditions']
+
+
+def test_complete_rejects_objects_that_break_the_policy(storage):
+    # moto doesn't enforce POST policies, so this exercises the HEAD check
+    upload = storage.init_upload(USER_ID, 'cv.pdf', PDF)
+    post_file(upload, b'x' * 2048)
+
+    with pytest.raises(ValueError, match='does not match'):
+        storage.complete_upload(USER_ID, upload['upload_id'])
+    assert storage.resumes.count_documents({}) == 0
+    assert storage.s3.list_objects_v2(Bucket=BUCKET)['KeyCount'] == 0
+
+
+def test_complete_before_upload_fails(storage):
+    upload = storage.init_upload(USER_ID, 'cv.pdf', PDF)
+
+    with pytest.raises(ValueError, match='not been uploaded'):
+        storage.complete_upload(USER_ID, upload['upload_id'])
+
+
+def test_complete_requires_the_uploading_user(storage):
+    upload = storage.init_upload(USER_ID, 'cv.pdf', PDF)
+    post_file(upload, b'%PDF')
+
+    with pytest.raises(ValueError, match='not found'):
+        storage.complete_upload(str(ObjectId()), upload['upload_id'])
+
+
+def test_complete_is_only_recorded_once(storage):
+    upload = storage.init_upload(USER_ID, 'cv.pdf', PDF)
+    post_file(upload, b'%PDF')
+    storage.complete_upload(USER_ID, upload['upload_id'])
+
+    with pytest.raises(ValueError, match='already completed'):
+        storage.complete_upload(USER_ID, upload['upload_id'])
+    assert storage.resumes.count_documents({}) == 1
+
+
+@pytest.mark.parametrize('filename, content_type, size, message', [
+    ('', PDF, None, 'No file selected'),
+    ('cv.exe', 'application/x-msdownload', None, 'Unsupported file type'),
+    ('cv.pdf', PDF, 0, 'between 1 byte'),
+    ('cv.pdf', PDF, 4096, 'between 1 byte'),
+])
+def test_init_validates_request(storage, filename, content_type, size, message):
+    with pytest.raises(ValueError, match=message):
+        storage.init_upload(USER_ID, filename, content_type, size)
+    assert storage.uploads.count_documents({}) == 0
+
+
+def sha256(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def object_count(storage):
+    return storage.s3.list_objects_v2(Bucket=BUCKET)['KeyCount']
+
+
+def test_hashed_upload_is_stored_by_content(storage):
+    body = b'%PDF-1.4 cv'
+    upload = storage.init_upload(USER_ID, 'cv.pdf', PDF, len(body), sha256(body))
+
+    assert upload['fields']['key'] == f'resumes/{USER_ID}/sha256/{sha256(body)}'
+    assert upload['fields']['x-amz-checksum-sha256'] == base64.b64encode(hashlib.sha256(body).digest()).decode()
+    policy = json.loads(base64.b64decode(upload['fields']['policy']))
+    assert {'x-amz-checksum-sha256': upload['fields']['x-amz-checksum-sha256']} in policy['conditions']
+
+    post_file(upload, body)
+    resume = storage.complete_upload(USER_ID, upload['upload_id'])
+    assert resume['sha256'] == sha256(body)
+    assert storage.blobs.find_one({'_id': resume['s3_key']})['refcount'] == 1
+
+
+def test_uploading_known_content_skips_s3(storage):
+    body = b'%PDF-1.4 cv'
+    first = storage.init_upload(USER_ID, 'cv.pdf', PDF, len(body), sha256(body))
+    post_file(first, body)
+    original = storage.complete_upload(USER_ID, first['upload_id'])
+
+    again = storage.init_upload(USER_ID, 'renamed.pdf', PDF, len(body), sha256(body).upper())
+
+    assert again['duplicate'] is True
+    assert again['resume']['filename'] == 'renamed.pdf'
+    assert again['resume']['s3_key'] == original['s3_key']
+    assert storage.uploads.count_documents({}) == 0
+    assert storage.resumes.count_documents({}) == 2
+    assert storage.blobs.find_one({'_id': original['s3_key']})['refcount'] == 2
+    assert object_count(storage) == 1
+
+
+def test_same_content_is_not_shared_between_users(storage):
+    body = b'%PDF-1.4 cv'
+    upload = storage.init_upload(USER_ID, 'cv.pdf', PDF, len(body), sha256(body))
+    post_file(upload, body)
+    storage.complete_upload(USER_ID, upload['upload_id'])
+
+    other = storage.init_upload(str(ObjectId()), 'cv.pdf', PDF, len(body), sha256(body))
+
+    assert other['duplicate'] is False
+
+
+def test_object_is_deleted_with_its_last_reference(storage):
+    first, _ = storage.store_stream(USER_ID, 'cv.pdf', PDF, io.BytesIO(b'%PDF same'))
+    second, uploaded = storage.store_stream(USER_ID, 'copy.pdf', PDF, io.BytesIO(b'%PDF same'))
+    assert uploaded is False
+    assert first['s3_key'] == second['s3_key']
+
+    resume, object_deleted = storage.delete_resume(USER_ID, first['_id'])
+    assert resume['_id'] == first['_id']
+    assert object_deleted is False
+    assert object_count(storage) == 1
+
+    _, object_deleted = storage.delete_resume(USER_ID, second['_id'])
+    assert object_deleted is True
+    assert object_count(storage) == 0
+    assert storage.blobs.count_documents({}) == 0
+
+
+def test_same_filename_different_content_gets_separate_objects(storage):
+    first, _ = storage.store_stream(USER_ID, 'cv.pdf', PDF, io.BytesIO(b'%PDF old'))
+    second, uploaded = storage.store_stream(USER_ID, 'cv.pdf', PDF, io.BytesIO(b'%PDF new'))
+
+    assert uploaded is True
+    assert first['s3_key'] != second['s3_key']
+    body = storage.s3.get_object(Bucket=BUCKET, Key=first['s3_key'])['Body'].read()
+    assert body == b'%PDF old'
+
+
+def test_delete_keeps_legacy_objects_other_rows_still_use(storage):
+    key = f'resumes/{USER_ID}/cv.pdf'
+    storage.s3.put_object(Bucket=BUCKET, Key=key, Body=b'%PDF')
+    ids = [storage.resumes.insert_one({'user_id': ObjectId(USER_ID), 'filename': 'cv.pdf', 's3_key': key}).inserted_id
+           for _ in range(2)]
+
+    assert storage.delete_resume(USER_ID, ids[0])[1] is False
+    assert storage.delete_resume(USER_ID, ids[1])[1] is True
+    assert object_count(storage) == 0
+
+
+def test_delete_requires_the_owner(storage):
+    resume, _ = storage.store_stream(USER_ID, 'cv.pdf', PDF, io.BytesIO(b'%PDF'))
+
+    assert storage.delete_resume(str(ObjectId()), resume['_id']) == (None, False)
+    assert object_count(storage) == 1
+
+
+def test_init_rejects_malformed_hash(storage):
+    with pytest.raises(ValueError, match='sha256'):
+        storage.init_upload(USER_ID, 'cv.pdf', PDF, 10, 'abc')
+
+
+class RecordingS3:
+    """Passes calls through to S3, recording DeleteObjects batches and failing chosen keys."""
+
+    def __init__(self, s3, fail_keys=()):
+        self.s3 = s3
+        self.fail_keys = set(fail_keys)
+        self.batches = []
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [obj['Key'] for obj in Delete['Objects']]
+        self.batches.append(keys)
+        kept = [{'Key': key} for key in keys if key not in self.fail_keys]
+        response = self.s3.delete_objects(Bucket=Bucket, Delete=dict(Delete, Objects=kept)) if kept else {}
+        response['Errors'] = [{'Key': key, 'Code': 'AccessDenied', 'Message': 'Access Denied'}
+                              for key in keys if key in self.fail_keys]
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.s3, name)
+
+
+def store(storage, count, user_id=USER_ID):
+    return [storage.store_stream(user_id, f'cv{i}.pdf', PDF, io.BytesIO(f'%PDF {i}'.encode()))[0] for i in range(count)]
+
+
+def test_bulk_delete_batches_keys(storage):
+    resumes = store(storage, 5)
+    storage.s3 = RecordingS3(storage.s3)
+    storage.delete_batch_size = 2
+
+    result = storage.delete_resumes(USER_ID, [str(resume['_id']) for resume in resumes[:4]])
+
+    assert [len(batch) for batch in storage.s3.batches] == [2, 2]
+    assert len(result['deleted_ids']) == 4
+    assert sorted(result['deleted_keys']) == sorted(resume['s3_key'] for resume in resumes[:4])
+    assert result['errors'] == []
+    assert storage.resumes.count_documents({}) == 1
+    assert object_count(storage) == 1
+
+
+def test_bulk_delete_reports_failed_keys(storage):
+    resumes = store(storage, 3)
+    storage.s3 = RecordingS3(storage.s3, fail_keys=[resumes[1]['s3_key']])
+
+    result = storage.delete_resumes(USER_ID)
+
+    assert result['errors'] == [{'key': resumes[1]['s3_key'], 'code': 'AccessDenied', 'message': 'Access Denied'}]
+    assert resumes[1]['s3_key'] not in result['deleted_keys']
+    assert len(result['deleted_keys']) == 2
+    assert storage.resumes.count_documents({}) == 0
+
+
+def test_bulk_delete_keeps_shared_objects(storage):
+    first, _ = storage.store_stream(USER_ID, 'cv.pdf', PDF, io.BytesIO(b'%PDF same'))
+    second, _ = storage.store_stream(USER_ID, 'copy.pdf', PDF, io.BytesIO(b'%PDF same'))
+
+    result = storage.delete_resumes(USER_ID, [str(first['_id'])])
+    assert result['deleted_keys'] == []
+    assert storage.blobs.find_one({'_id': second['s3_key']})['refcount'] == 1
+
+    result = storage.delete_resumes(USER_ID, [str(second['_id'])])
+    assert result['deleted_keys'] == [second['s3_key']]
+    assert object_count(storage) == 0
+
+
+def test_delete_all_only_touches_the_user(storage):
+    store(storage, 2)
+    other_user = str(ObjectId())
+    store(storage, 1, other_user)
+    storage.init_upload(USER_ID, 'pending.pdf', PDF)
+
+    result = storage.delete_resumes(USER_ID)
+
+    assert len(result['deleted_ids']) == 2
+    assert storage.uploads.count_documents({}) == 0
+    assert storage.resumes.count_documents({'user_id': ObjectId(other_user)}) == 1
+    assert object_count(storage) == 1
+
+
+def test_bulk_delete_rejects_bad_ids(storage):
+    with pytest.raises(ValueError, match='Invalid resume id'):
+        storage.delete_resumes(USER_ID, ['nope'])
+
+
+class InterleavingS3:
+    """Passes calls through to S3, running ``during_delete`` just before objects are deleted."""
+
+    def __init__(self, s3, during_delete):
+        self.s3 = s3
+        self.during_delete = during_delete
+
+    def delete_object(self, **kwargs):
+        self.during_delete()
+        return self.s3.delete_object(**kwargs)
+
+    def delete_objects(self, **kwargs):
+        self.during_delete()
+        return self.s3.delete_objects(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.s3, name)
+
+
+@pytest.mark.parametrize('bulk', [False, True])
+def test_reupload_during_delete_is_refused(storage, bulk):
+    resume, _ = storage.store_stream(USER_ID, 'cv.pdf', PDF, io.BytesIO(b'%PDF same'))
+    errors = []
+
+    def reupload():
+        with pytest.raises(ValueError, match='still being deleted') as error:
+            storage.store_stream(USER_ID, 'again.pdf', PDF, io.BytesIO(b'%PDF same'))
+        errors.append(error)
+
+    storage.s3 = InterleavingS3(storage.s3, reupload)
+    if bulk:
+        storage.delete_resumes(USER_ID, [str(resume['_id'])])
+    else:
+        storage.delete_resume(USER_ID, resume['_id'])
+
+    assert len(errors) == 1
+    assert storage.resumes.count_documents({}) == 0
+    assert storage.blobs.count_documents({}) == 0
+    assert object_count(storage) == 0
+
+    storage.s3 = storage.s3.s3
+    again, uploaded = storage.store_stream(USER_ID, 'again.pdf', PDF, io.BytesIO(b'%PDF same'))
+    assert uploaded is True
+    assert storage.s3.get_object(Bucket=BUCKET, Key=again['s3_key'])['Body'].read() == b'%PDF same'
+
+
+def test_abandoned_delete_does_not_block_the_content(storage):
+    resume, _ = storage.store_stream(USER_ID, 'cv.pdf', PDF, io.BytesIO(b'%PDF same'))
+    # As if the deleting process died between marking the blob and deleting the object
+    storage._release([storage.resumes.find_one_and_delete({'_id': resume['_id']})])
+    storage.blobs.update_one({'_id': resume['s3_key']}, {'$set': {'deleting_at': datetime.utcnow() - timedelta(hours=1)}})
+
+    again, uploaded = storage.store_stream(USER_ID, 'again.pdf', PDF, io.BytesIO(b'%PDF same'))
+
+    assert uploaded is True
+    blob = storage.blobs.find_one({'_id': again['s3_key']})
+    assert blob['refcount'] == 1 and 'deleting' not in blob
+    assert storage.store_stream(USER_ID, 'third.pdf', PDF, io.BytesIO(b'%PDF same'))[1] is False
@@ -0,0 +1,215 @@
+from datetime import datetime, timedelta
+import io
+import zipfile
+
+import boto3
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+from moto import mock_aws
+
+from db_indexes import ensure_indexes
+from resume_storage import ResumeStorage
+from resume_text import (DOCX, PDF, ResumeIndexer, extract_text, normalize_text, snippet, tokenize)
+
+BUCKET = 'resume-tracker-test'
+USER_ID = str(ObjectId())
+
+
+def make_pdf(*lines):
+    """A one-page PDF with each line drawn as text."""
+    content = 'BT /F1 12 Tf 72 720 Td ' + ' '.join(f'({line}) Tj 0 -16 Td' for line in lines) + ' ET'
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+        '/Resources << /Font << /F1 5 0 R >> >> >>',
+        f'<< /Length {len(content)} >>\nstream\n{content}\nendstream',
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    pdf = '%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += f'{number} 0 obj\n{body}\nendobj\n'
+    xref = len(pdf)
+    pdf += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'
+    pdf += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets)
+    pdf += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'
+    return pdf.encode('latin-1')
+
+
+def make_docx(*paragraphs):
+    body = ''.join(f'<w:p><w:r><w:t>{paragraph}</w:t></w:r></w:p>' for paragraph in paragraphs)
+    document = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f'<w:body>{body}</w:body></w:document>')
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as docx:
+        docx.writestr('word/document.xml', document)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def env():
+    with mock_aws():
+        s3 = boto3.client('s3', region_name='us-east-1',
+                          aws_access_key_id='testing', aws_secret_access_key='testing')
+        s3.create_bucket(Bucket=BUCKET)
+        db = mongomock.MongoClient().resume_tracker
+        ensure_indexes(db)
+        storage = ResumeStorage(s3, BUCKET, db.resume_uploads, db.resumes, db.resume_blobs)
+        indexer = ResumeIndexer(s3, BUCKET, db.resumes, db.resume_texts, db.resume_terms)
+        yield storage, indexer
+        indexer.shutdown()
+
+
+def add_resume(storage, filename, content_type, body, user_id=USER_ID):
+    return storage.store_stream(user_id, filename, content_type, io.BytesIO(body))[0]
+
+
+def test_extracts_pdf_text():
+    text = extract_text(make_pdf('Jane Doe', 'Senior Python Engineer'), PDF)
+
+    assert 'Jane Doe' in text
+    assert 'Senior Python Engineer' in text
+
+
+def test_extracts_docx_paragraphs():
+    text = extract_text(make_docx('Jane   Doe', 'Kubernetes and AWS'), DOCX)
+
+    assert text == 'Jane Doe\nKubernetes and AWS'
+
+
+def test_tokenize_keeps_technical_terms():
+    assert tokenize('Built APIs in C++, C# and Node.js for the team.') == [
+        'built', 'apis', 'c++', 'c#', 'node.js', 'team'
+    ]
+
+
+def test_normalize_text_collapses_whitespace():
+    assert normalize_text('  ﬁrst line \n\n\t second  ') == 'first line\nsecond'
+
+
+def test_snippet_centres_on_the_match():
+    text = 'x ' * 200 + 'kubernetes expert ' + 'y ' * 200
+
+    excerpt = snippet(text, ['kubernetes'])
+
+    assert 'kubernetes expert' in excerpt
+    assert excerpt.startswith('...') and excerpt.endswith('...')
+
+
+def test_submit_indexes_in_the_background(env):
+    storage, indexer = env
+    resume = add_resume(storage, 'cv.pdf', PDF, make_pdf('Python developer', 'Django and Flask'))
+
+    future = indexer.submit(resume)
+    assert future.result(timeout=10) == 'indexed'
+
+    resume = storage.resumes.find_one({'_id': resume['_id']})
+    assert resume['text_status'] == 'indexed'
+    text = indexer.texts.find_one({'_id': resume['_id']})
+    assert 'Django and Flask' in text['text']
+    assert indexer.terms.count_documents({'resume_id': resume['_id'], 'term': 'flask'}) == 1
+
+
+def test_status_changes_are_reported_for_the_user(env):
+    storage, indexer = env
+    changed = []
+    indexer.on_change = changed.append
+    resume = add_resume(storage, 'cv.pdf', PDF, make_pdf('Python developer'))
+
+    indexer.submit(resume).result(timeout=10)
+
+    assert changed == [resume['user_id']] * 3
+
+
+def test_lost_extractions_are_retried_once(env):
+    storage, indexer = env
+    lost = add_resume(storage, 'lost.pdf', PDF, make_pdf('Kubernetes'))
+    queued = add_resume(storage, 'queued.pdf', PDF, make_pdf('Terraform'))
+    never_queued = add_resume(storage, 'old.docx', DOCX, make_docx('Golang'))
+    now = datetime.utcnow()
+    storage.resumes.update_one({'_id': lost['_id']},
+                               {'$set': {'text_status': 'processing', 'text_status_at': now - timedelta(hours=1)}})
+    storage.resumes.update_one({'_id': queued['_id']}, {'$set': {'text_status': 'pending', 'text_status_at': now}})
+    storage.resumes.update_one({'_id': never_queued['_id']}, {'$set': {'upload_date': now - timedelta(hours=1)}})
+    other_worker = ResumeIndexer(indexer.s3, BUCKET, indexer.resumes, indexer.texts, indexer.terms)
+
+    retried = indexer.retry_stale() + other_worker.retry_stale()
+    indexer.executor.shutdown(wait=True)
+    other_worker.shutdown()
+
+    statuses = {doc['filename']: doc.get('text_status') for doc in storage.resumes.find()}
+    assert retried == 2
+    assert statuses == {'lost.pdf': 'indexed', 'queued.pdf': 'pending', 'old.docx': 'indexed'}
+    assert indexer.terms.count_documents({'term': 'kubernetes'}) == 1
+
+
+def test_search_ranks_by_relevance(env):
+    storage, indexer = env
+    strong = add_resume(storage, 'python.docx', DOCX, make_docx('Python engineer', 'Python, Flask, Python tooling'))
+    weak = add_resume(storage, 'java.docx', DOCX, make_docx('Java engineer', 'Some Python scripting'))
+    unrelated = add_resume(storage, 'design.docx', DOCX, make_docx('Product designer', 'Figma'))
+    for resume in (strong, weak, unrelated):
+        indexer.index(resume)
+
+    results = indexer.search(USER_ID, 'python flask')
+
+    assert [result['resume_id'] for result in results] == [strong['_id'], weak['_id']]
+    assert results[0]['score'] > results[1]['score']
+    assert results[0]['matched_terms'] == ['python', 'flask']
+    assert 'Python' in results[0]['snippet']
+
+
+def test_search_is_per_user(env):
+    storage, indexer = env
+    indexer.index(add_resume(storage, 'cv.docx', DOCX, make_docx('Python'), user_id=str(ObjectId())))
+
+    assert indexer.search(USER_ID, 'python') == []
+
+
+def test_search_needs_a_term(env):
+    _, indexer = env
+
+    with pytest.raises(ValueError, match='search term'):
+        indexer.search(USER_ID, 'the and')
+
+
+def test_same_content_reuses_extracted_text(env):
+    storage, indexer = env
+    body = make_docx('Go developer')
+    first = add_resume(storage, 'cv.docx', DOCX, body)
+    indexer.index(first)
+    second = add_resume(storage, 'copy.docx', DOCX, body)
+    storage.s3.delete_object(Bucket=BUCKET, Key=second['s3_key'])
+
+    # Reused, so the missing object is never read
+    assert indexer.index(second) == 'indexed'
+    assert len(indexer.search(USER_ID, 'go')) == 2
+
+
+def test_legacy_doc_is_unsupported(env):
+    storage, indexer = env
+    resume = add_resume(storage, 'cv.doc', 'application/msword', b'\xd0\xcf\x11\xe0')
+
+    assert indexer.index(resume) == 'unsupported'
+
+
+def test_extraction_failure_is_recorded(env):
+    storage, indexer = env
+    resume = add_resume(storage, 'cv.pdf', PDF, b'not a pdf')
+
+    assert indexer.submit(resume).result(timeout=10) == 'failed'
+    assert storage.resumes.find_one({'_id': resume['_id']})['text_status'] == 'failed'
+
+
+def test_resume_deleted_during_extraction_leaves_no_index(env):
+    storage, indexer = env
+    resume = add_resume(storage, 'cv.docx', DOCX, make_docx('Rust'))
+    storage.resumes.delete_one({'_id': resume['_id']})
+
+    assert indexer.index(resume) == 'deleted'
+    assert indexer.texts.count_documents({}) == 0
+    assert indexer.terms.count_documents({}) == 0
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import mongomock
+import pytest
+
+from services import LazyProxy, LazyService, ServiceRegistry
+
+
+class CountingFactory:
+    """Builds a value slowly, counting how many times it was asked to."""
+
+    def __init__(self, value, delay=0.0, failures=0):
+        self.value = value
+        self.delay = delay
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.calls <= self.failures:
+            raise ConnectionError('unreachable')
+        return self.value
+
+
+def test_service_is_built_once_under_concurrent_first_use():
+    factory = CountingFactory(object(), delay=0.05)
+    service = LazyService('slow', factory)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(service.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert factory.calls == 1
+    assert len(set(map(id, results))) == 1
+
+
+def test_nothing_is_built_until_first_use():
+    factory = CountingFactory('client')
+    service = LazyService('client', factory)
+
+    assert not service.initialized
+    assert factory.calls == 0
+    assert service.get() == 'client'
+    assert service.initialized
+
+
+def test_failed_build_is_retried():
+    factory = CountingFactory('client', failures=1)
+    service = LazyService('flaky', factory)
+
+    with pytest.raises(ConnectionError):
+        service.get()
+    assert service.get() == 'client'
+    assert factory.calls == 2
+
+
+def test_proxy_forwards_to_collection():
+    factory = CountingFactory(mongomock.MongoClient().resume_tracker.resumes)
+    resumes = LazyProxy(LazyService('resumes', factory))
+    assert factory.calls == 0
+
+    resumes.insert_one({'filename': 'cv.pdf'})
+
+    assert resumes.count_documents({}) == 1
+    assert factory.calls == 1
+
+
+def test_health_reports_each_service():
+    registry = ServiceRegistry()
+    registry.register('mongodb', lambda: 'client')
+    registry.register('openai', lambda: None, required=False)
+
+    def broken_check(client):
+        raise RuntimeError('no secrets file')
+
+    registry.register('gmail', lambda: 'libs', check=broken_check, required=False)
+
+    ready, checks = registry.health()
+
+    assert ready
+    assert checks['mongodb']['status'] == 'ok'
+    assert checks['openai']['status'] == 'disabled'
+    assert checks['gmail'] == {'required': False, 'status': 'error', 'error': 'no secrets file'}
+
+
+def test_required_failure_makes_not_ready():
+    registry = ServiceRegistry()
+    registry.register('mongodb', CountingFactory('client', failures=1))
+
+    ready, checks = registry.health()
+    assert not ready
+    assert checks['mongodb']['status'] == 'error'
+
+    # The next probe tries again
+    assert registry.health()[0]
+
+
+def test_slow_check_times_out():
+    registry = ServiceRegistry(health_timeout=0.05)
+    registry.register('s3', lambda: 'client', check=lambda client: time.sleep(0.5))
+    registry.register('mongodb', lambda: 'client')
+
+    start = time.monotonic()
+    ready, checks = registry.health()
+
+    assert time.monotonic() - start < 0.4
+    assert not ready
+    assert checks['s3']['status'] == 'timeout'
+    assert checks['mongodb']['status'] == 'ok'
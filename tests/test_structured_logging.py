@@ -0,0 +1,91 @@
+import json
+import logging
+import queue
+
+from flask import Flask
+
+from structured_logging import (JsonFormatter, NonBlockingQueueHandler, RequestIdFilter, SamplingFilter,
+                                init_request_ids, request_id_var)
+
+
+class ListHandler(logging.Handler):
+    """Collects the JSON lines a handler chain would have written."""
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(JsonFormatter())
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(json.loads(self.format(record)))
+
+
+def make_logger(*filters):
+    logger = logging.getLogger(f'test.{len(filters)}.{id(filters)}')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = ListHandler()
+    for log_filter in filters:
+        handler.addFilter(log_filter)
+    logger.addHandler(handler)
+    return logger, handler
+
+
+def test_records_are_json_with_extra_fields():
+    logger, handler = make_logger()
+
+    logger.info('Processed %d emails', 3, extra={'found': 1, 'sync_mode': 'full'})
+
+    line = handler.lines[0]
+    assert line['message'] == 'Processed 3 emails'
+    assert (line['level'], line['found'], line['sync_mode']) == ('INFO', 1, 'full')
+    assert 'args' not in line and 'sample' not in line
+
+
+def test_sampled_events_are_thinned_and_others_kept():
+    draws = iter([0.05, 0.5, 0.95])
+    logger, handler = make_logger(SamplingFilter(rate=0.1, random=lambda: next(draws)))
+
+    for _ in range(3):
+        logger.debug('Skipping email', extra={'sample': True})
+    logger.warning('Error fetching message')
+
+    assert [line['message'] for line in handler.lines] == ['Skipping email', 'Error fetching message']
+    assert handler.lines[0]['sample_rate'] == 0.1
+
+
+def test_queue_handler_defers_formatting_but_keeps_tracebacks():
+    records = queue.SimpleQueue()
+    logger = logging.getLogger('test.queue')
+    logger.propagate = False
+    logger.addHandler(NonBlockingQueueHandler(records))
+
+    try:
+        raise RuntimeError('connection reset')
+    except RuntimeError:
+        logger.exception('Error fetching emails for %s', 'user-1')
+
+    record = records.get_nowait()
+    assert record.msg == 'Error fetching emails for user-1' and record.args is None
+    line = json.loads(JsonFormatter().format(record))
+    assert 'RuntimeError: connection reset' in line['exception']
+
+
+def test_requests_are_tagged_with_an_id():
+    logger, handler = make_logger(RequestIdFilter())
+    app = Flask(__name__)
+
+    @app.route('/api/dashboard')
+    def dashboard():
+        logger.info('Dashboard loaded')
+        return {}
+
+    init_request_ids(app)
+    client = app.test_client()
+    echoed = client.get('/api/dashboard', headers={'X-Request-ID': 'lb-42'})
+    generated = client.get('/api/dashboard', headers={'X-Request-ID': '"bad" id, "level": "ERROR"'})
+
+    assert echoed.headers['X-Request-ID'] == 'lb-42'
+    assert len(generated.headers['X-Request-ID']) == 32
+    assert [line['request_id'] for line in handler.lines] == ['lb-42', generated.headers['X-Request-ID']]
+    assert request_id_var.get() is None
@@ -0,0 +1,51 @@
+import mongomock
+from bson.objectid import ObjectId
+
+from sync_checkpoints import load_checkpoint, save_checkpoint, clear_checkpoint, MAX_SEEN_MESSAGE_IDS
+
+
+def make_collection():
+    return mongomock.MongoClient().resume_tracker.gmail_sync_state
+
+
+def test_checkpoint_round_trip():
+    collection = make_collection()
+    user_id = str(ObjectId())
+
+    assert load_checkpoint(collection, user_id) is None
+    save_checkpoint(collection, user_id, '1234', ['a', 'b'], 'full')
+
+    checkpoint = load_checkpoint(collection, user_id)
+    assert checkpoint['history_id'] == '1234'
+    assert checkpoint['message_ids'] == ['a', 'b']
+
+
+def test_incremental_checkpoint_extends_seen_ids():
+    collection = make_collection()
+    user_id = str(ObjectId())
+    save_checkpoint(collection, user_id, '1', ['a', 'b'], 'full')
+
+    save_checkpoint(collection, user_id, '2', ['b', 'c'], 'incremental')
+
+    assert load_checkpoint(collection, user_id)['message_ids'] == ['a', 'b', 'c']
+
+
+def test_full_scan_replaces_seen_ids_and_caps_them():
+    collection = make_collection()
+    user_id = str(ObjectId())
+    save_checkpoint(collection, user_id, '1', ['a'], 'full')
+
+    ids = [str(i) for i in range(MAX_SEEN_MESSAGE_IDS + 10)]
+    save_checkpoint(collection, user_id, '2', ids, 'full')
+
+    assert load_checkpoint(collection, user_id)['message_ids'] == ids[-MAX_SEEN_MESSAGE_IDS:]
+
+
+def test_clear_checkpoint():
+    collection = make_collection()
+    user_id = str(ObjectId())
+    save_checkpoint(collection, user_id, '1', ['a'], 'full')
+
+    clear_checkpoint(collection, user_id)
+
+    assert load_checkpoint(collection, user_id) is None
@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+import threading
+
+import mongomock
+from bson.objectid import ObjectId
+
+from db_indexes import ensure_indexes
+from structured_logging import request_id_var
+from sync_jobs import SyncJobQueue, serialize_job
+
+
+def make_queue(**kwargs):
+    db = mongomock.MongoClient().resume_tracker
+    ensure_indexes(db)
+    kwargs.setdefault('progress_interval', 0)
+    return SyncJobQueue(db.sync_jobs, **kwargs)
+
+
+def test_job_runs_in_background_and_records_result():
+    queue = make_queue()
+    user_id = str(ObjectId())
+
+    def run(on_progress):
+        on_progress(1, 2, 1)
+        on_progress(2, 2, 1)
+        return {'new_added': 1, 'total_processed': 1}
+
+    job, created = queue.submit(user_id, run, params={'full': False})
+    queue.shutdown()
+
+    assert created
+    job = queue.get(str(job['_id']), user_id)
+    assert job['status'] == 'completed'
+    assert 'active' not in job
+    assert (job['processed'], job['total'], job['found'], job['new']) == (2, 2, 1, 1)
+    assert serialize_job(job)['result'] == {'new_added': 1, 'total_processed': 1}
+
+
+def test_job_runs_under_the_submitting_requests_id():
+    queue = make_queue()
+    token = request_id_var.set('req-1')
+    try:
+        job, _ = queue.submit(str(ObjectId()), lambda on_progress: {'request_id': request_id_var.get()})
+    finally:
+        request_id_var.reset(token)
+    queue.shutdown()
+
+    assert queue.get(str(job['_id']), job['user_id'])['result'] == {'request_id': 'req-1'}
+
+
+def test_claimed_slot_blocks_other_syncs_until_released():
+    queue = make_queue()
+    user_id = str(ObjectId())
+    ran = []
+
+    stream, created = queue.claim(user_id, params={'stream': True})
+    job, submitted = queue.submit(user_id, lambda on_progress: ran.append(1) or {})
+    second, claimed = queue.claim(user_id)
+
+    assert created and not submitted and not claimed
+    assert job['_id'] == stream['_id'] == second['_id']
+    queue.progress_callback(stream['_id'])(3, 3, 1)
+    queue.release(stream['_id'], result={'new_added': 1})
+    queue.release(stream['_id'], error='Stream closed before the sync finished')
+
+    finished = queue.get(str(stream['_id']), user_id)
+    assert (finished['status'], finished['processed'], finished['new']) == ('completed', 3, 1)
+    assert 'active' not in finished
+    assert queue.claim(user_id)[1]
+    queue.shutdown()
+    assert ran == []
+
+
+def test_concurrent_sync_for_same_user_is_deduplicated():
+    queue = make_queue()
+    user_id = str(ObjectId())
+    release = threading.Event()
+    runs = []
+
+    def run(on_progress):
+        runs.append(1)
+        release.wait(5)
+        return {'new_added': 0}
+
+    first, created_first = queue.submit(user_id, run)
+    second, created_second = queue.submit(user_id, run)
+    other, created_other = queue.submit(str(ObjectId()), lambda on_progress: {'new_added': 0})
+    release.set()
+    queue.shutdown()
+
+    assert created_first and not created_second and created_other
+    assert second['_id'] == first['_id']
+    assert len(runs) == 1
+
+    # Once finished, a new sync can start
+    queue = SyncJobQueue(queue.collection, progress_interval=0)
+    _, created = queue.submit(user_id, lambda on_progress: {'new_added': 0})
+    queue.shutdown()
+    assert created
+
+
+def test_failed_job_records_error():
+    queue = make_queue()
+    user_id = str(ObjectId())
+
+    def run(on_progress):
+        raise RuntimeError('Gmail not reachable')
+
+    job, _ = queue.submit(user_id, run)
+    queue.shutdown()
+
+    job = queue.get(str(job['_id']), user_id)
+    assert job['status'] == 'failed'
+    assert job['error'] == 'Gmail not reachable'
+    assert queue.active_job(user_id) is None
+
+
+def test_stale_job_is_taken_over():
+    queue = make_queue(stale_after=60)
+    user_id = ObjectId()
+    stale_id = ObjectId()
+    old = datetime.utcnow() - timedelta(minutes=5)
+    queue.collection.insert_one({
+        '_id': stale_id, 'user_id': user_id, 'status': 'running', 'active': True,
+        'created_at': old, 'updated_at': old
+    })
+
+    job, created = queue.submit(str(user_id), lambda on_progress: {'new_added': 0})
+    queue.shutdown()
+
+    assert created and job['_id'] != stale_id
+    stale = queue.collection.find_one({'_id': stale_id})
+    assert stale['status'] == 'failed' and 'active' not in stale
+
+
+def test_progress_writes_are_throttled():
+    queue = make_queue(progress_interval=60)
+    user_id = str(ObjectId())
+    writes = []
+    update = queue._update
+
+    def counting_update(job_id, fields):
+        writes.append(dict(fields))
+        return update(job_id, fields)
+
+    queue._update = counting_update
+
+    def run(on_progress):
+        for processed in range(1, 101):
+            on_progress(processed, 100, 0)
+        return {'new_added': 0}
+
+    job, _ = queue.submit(user_id, run)
+    queue.shutdown()
+
+    progress_writes = [fields for fields in writes if 'processed' in fields]
+    # The first update and the final one; everything in between is throttled
+    assert [fields['processed'] for fields in progress_writes] == [1, 100]
+
+
+def test_get_is_scoped_to_user():
+    queue = make_queue()
+    job, _ = queue.submit(str(ObjectId()), lambda on_progress: {'new_added': 0})
+    queue.shutdown()
+
+    assert queue.get(str(job['_id']), str(ObjectId())) is None
+    assert queue.get('not-an-id', str(ObjectId())) is None
@@ -0,0 +1,68 @@
+import mongomock
+import pytest
+from bson.objectid import ObjectId
+
+from user_cache import UserCache
+
+
+@pytest.fixture
+def make_cache(clock, counting_collection):
+    def make(**kwargs):
+        users = counting_collection(mongomock.MongoClient().resume_tracker.users)
+        user_id = users.insert_one({'username': 'ada', 'email': 'ada@example.com', 'password': 'hash'}).inserted_id
+        return UserCache(users, clock=clock, **kwargs), users, user_id
+    return make
+
+
+def test_user_is_loaded_once_without_password(make_cache):
+    cache, users, user_id = make_cache()
+
+    first = cache.get(str(user_id))
+    second = cache.get(str(user_id))
+
+    assert first == second == {'_id': user_id, 'username': 'ada', 'email': 'ada@example.com'}
+    assert users.count('find_one') == 1
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'entries': 1}
+
+
+def test_entries_expire_after_ttl(make_cache, clock):
+    cache, users, user_id = make_cache(ttl=60)
+    cache.get(user_id)
+
+    clock.now = 59
+    cache.get(user_id)
+    clock.now = 61
+    cache.get(user_id)
+
+    assert users.count('find_one') == 2
+
+
+def test_update_invalidates_cached_record(make_cache):
+    cache, users, user_id = make_cache()
+    cache.get(user_id)
+
+    cache.update(user_id, {'username': 'lovelace'})
+
+    assert cache.get(user_id)['username'] == 'lovelace'
+    assert users.count('find_one') == 2
+
+
+def test_unknown_users_are_not_cached(make_cache):
+    cache, users, _ = make_cache()
+    missing = ObjectId()
+
+    assert cache.get(missing) is None
+    users.insert_one({'_id': missing, 'username': 'new', 'email': 'new@example.com', 'password': 'hash'})
+
+    assert cache.get(missing)['username'] == 'new'
+
+
+def test_put_trims_record_and_cache_is_bounded(make_cache):
+    cache, users, user_id = make_cache(max_entries=2)
+    cache.put({'_id': user_id, 'username': 'ada', 'email': 'ada@example.com', 'password': 'hash'})
+    cache.put({'_id': ObjectId(), 'username': 'b', 'email': 'b@example.com'})
+    cache.put({'_id': ObjectId(), 'username': 'c', 'email': 'c@example.com'})
+
+    assert cache.stats()['entries'] == 2
+    assert 'password' not in cache.get(user_id)
+    assert users.count('find_one') == 1
@@ -0,0 +1,79 @@
+"""Cache of the user records Flask-Login loads on every request.
+
+Only what the API needs about the logged-in user (id, username, email) is
+read and kept; the password hash stays in MongoDB and is only fetched by
+login. Entries expire after USER_CACHE_TTL seconds so changes made by other
+processes show up eventually, and ``update``/``invalidate`` drop them at
+once for changes made here.
+"""
+from collections import OrderedDict
+import os
+import threading
+import time
+
+from bson.objectid import ObjectId
+
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '300'))
+
+# Fields of a users document that request handlers may use
+USER_FIELDS = {'username': 1, 'email': 1}
+
+
+class UserCache:
+    def __init__(self, collection, max_entries=USER_CACHE_SIZE, ttl=USER_CACHE_TTL, clock=time.monotonic):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """Return ``{'_id', 'username', 'email'}`` for a user, or None."""
+        user_id = str(user_id)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Unknown users aren't cached, so a new account is found straight away
+        record = self.collection.find_one({'_id': ObjectId(user_id)}, USER_FIELDS)
+        if record:
+            self.put(record)
+        return record
+
+    def put(self, record):
+        """Cache a user record, trimmed to USER_FIELDS."""
+        record = {'_id': record['_id'], **{field: record.get(field) for field in USER_FIELDS}}
+        with self._lock:
+            self._entries[str(record['_id'])] = (record, self._clock() + self.ttl)
+            self._entries.move_to_end(str(record['_id']))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def update(self, user_id, changes):
+        """Update a user document and drop the cached record."""
+        result = self.collection.update_one({'_id': ObjectId(user_id)}, {'$set': changes})
+        self.invalidate(user_id)
+        return result
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self._entries)
+            }